@@ -0,0 +1,189 @@
+"""Synthetic OBJ files of configurable size for the benchmarks.
+
+Every generator writes the file and returns the number of vertices and
+faces it contains. The shapes are chosen to exercise different parts of
+the loader and the renderer:
+
+uv_sphere -- a closed surface of quads with triangle fans at the poles,
+             optionally with texture coordinates and normals
+grid      -- an open height field made of quads only
+soup      -- unconnected triangles at random positions, i.e. no shared
+             vertices or edges at all
+slivers   -- unconnected long, thin triangles lying across the whole
+             model, whose bounding boxes are far larger than they are
+"""
+import math
+import random
+
+# Lines are written in batches of this many, to keep memory bounded
+# while generating large files.
+BATCH_LINES = 1 << 16
+
+
+def _write(target, lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= BATCH_LINES:
+            target.write('\n'.join(batch) + '\n')
+            batch = []
+    if batch:
+        target.write('\n'.join(batch) + '\n')
+
+
+def uv_sphere(filename, rings, segments, texcoords = False,
+              normals = False):
+    """Write a unit sphere with rings - 1 circles of latitude, each made
+    of segments vertices, plus the two poles. With texcoords and/or
+    normals, every vertex gets its own 'vt'/'vn' line and the faces
+    refer to them in the 'v/vt/vn' (or 'v//vn', 'v/vt') form.
+    """
+    points = [(0.0, 1.0, 0.0)]
+    uvs = [(0.5, 1.0)]
+    for ring in range(1, rings):
+        theta = math.pi * ring / rings
+        y = math.cos(theta)
+        radius = math.sin(theta)
+        for segment in range(segments):
+            phi = 2 * math.pi * segment / segments
+            points.append((radius * math.cos(phi), y,
+                           radius * math.sin(phi)))
+            uvs.append((float(segment) / segments, 1 - float(ring) / rings))
+    points.append((0.0, -1.0, 0.0))
+    uvs.append((0.5, 0.0))
+    bottom = len(points)
+
+    def corner(index):
+        if texcoords and normals:
+            return '%d/%d/%d' % (index, index, index)
+        if texcoords:
+            return '%d/%d' % (index, index)
+        if normals:
+            return '%d//%d' % (index, index)
+        return str(index)
+
+    def ring_vertex(ring, segment):
+        # One-based index of a vertex on one of the circles.
+        return 2 + (ring - 1) * segments + segment % segments
+
+    def faces():
+        for segment in range(segments):
+            yield 'f %s %s %s' % (corner(1),
+                                  corner(ring_vertex(1, segment + 1)),
+                                  corner(ring_vertex(1, segment)))
+        for ring in range(1, rings - 1):
+            for segment in range(segments):
+                yield 'f %s %s %s %s' % (
+                    corner(ring_vertex(ring, segment)),
+                    corner(ring_vertex(ring, segment + 1)),
+                    corner(ring_vertex(ring + 1, segment + 1)),
+                    corner(ring_vertex(ring + 1, segment)))
+        for segment in range(segments):
+            yield 'f %s %s %s' % (corner(bottom),
+                                  corner(ring_vertex(rings - 1, segment)),
+                                  corner(ring_vertex(rings - 1,
+                                                     segment + 1)))
+
+    with open(filename, 'w') as target:
+        target.write('# UV sphere, %d rings x %d segments\n'
+                     % (rings, segments))
+        _write(target, ('v %.6f %.6f %.6f' % point for point in points))
+        if texcoords:
+            _write(target, ('vt %.6f %.6f' % uv for uv in uvs))
+        if normals:
+            # The normals of a unit sphere are its points.
+            _write(target, ('vn %.6f %.6f %.6f' % point
+                            for point in points))
+        _write(target, faces())
+    return len(points), rings * segments
+
+
+def grid(filename, rows, columns):
+    """Write a rippled (rows x columns) grid of quads."""
+    def vertices():
+        for row in range(rows + 1):
+            for column in range(columns + 1):
+                x = float(column) / columns - 0.5
+                z = float(row) / rows - 0.5
+                yield 'v %.6f %.6f %.6f' % (x, 0.05 * math.sin(20 * x) *
+                                            math.cos(20 * z), z)
+
+    def faces():
+        for row in range(rows):
+            for column in range(columns):
+                first = row * (columns + 1) + column + 1
+                yield 'f %d %d %d %d' % (first, first + 1,
+                                         first + columns + 2,
+                                         first + columns + 1)
+
+    with open(filename, 'w') as target:
+        target.write('# grid, %d x %d quads\n' % (rows, columns))
+        _write(target, vertices())
+        _write(target, faces())
+    return (rows + 1) * (columns + 1), rows * columns
+
+
+def soup(filename, triangles, seed = 0):
+    """Write triangles with corners scattered at random in a unit cube;
+    the same seed always gives the same file.
+    """
+    generator = random.Random(seed)
+
+    def vertices():
+        for _ in range(3 * triangles):
+            yield 'v %.6f %.6f %.6f' % (generator.uniform(-1, 1),
+                                        generator.uniform(-1, 1),
+                                        generator.uniform(-1, 1))
+
+    with open(filename, 'w') as target:
+        target.write('# triangle soup, %d triangles\n' % triangles)
+        _write(target, vertices())
+        _write(target, ('f %d %d %d' % (i, i + 1, i + 2)
+                        for i in range(1, 3 * triangles, 3)))
+    return 3 * triangles, triangles
+
+
+def slivers(filename, triangles, seed = 0):
+    """Write thin triangles from one random corner region of a unit
+    cube to the opposite one; the same seed always gives the same file.
+    """
+    generator = random.Random(seed)
+
+    def vertices():
+        for _ in range(triangles):
+            start = [generator.uniform(-1, -0.5) for _ in range(3)]
+            end = [generator.uniform(0.5, 1) for _ in range(3)]
+            width = generator.uniform(0.005, 0.02)
+            yield 'v %.6f %.6f %.6f' % tuple(start)
+            yield 'v %.6f %.6f %.6f' % tuple(end)
+            yield 'v %.6f %.6f %.6f' % (end[0] + width, end[1] - width,
+                                        end[2])
+
+    with open(filename, 'w') as target:
+        target.write('# slivers, %d triangles\n' % triangles)
+        _write(target, vertices())
+        _write(target, ('f %d %d %d' % (i, i + 1, i + 2)
+                        for i in range(1, 3 * triangles, 3)))
+    return 3 * triangles, triangles
+
+
+def generate(kind, filename, vertices):
+    """Write a file of the given kind ('sphere', 'textured-sphere',
+    'grid', 'soup' or 'slivers') with roughly the given number of vertices.
+    """
+    if kind in ('sphere', 'textured-sphere'):
+        side = max(3, int(math.sqrt(vertices / 2.0)))
+        textured = kind == 'textured-sphere'
+        return uv_sphere(filename, side, 2 * side, texcoords = textured,
+                         normals = textured)
+    if kind == 'grid':
+        side = max(1, int(math.sqrt(vertices)) - 1)
+        return grid(filename, side, side)
+    if kind == 'soup':
+        return soup(filename, max(1, vertices // 3))
+    if kind == 'slivers':
+        return slivers(filename, max(1, vertices // 3))
+    raise ValueError('Unknown kind of mesh: %s' % kind)
+
+
+KINDS = ('sphere', 'textured-sphere', 'grid', 'soup', 'slivers')
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Microbenchmarks comparing the compact AffineMatrix with the generic
+list-based Matrix it replaced for the fixed 4x4 case.
+
+Run from the repository root:
+
+    python benchmarks/matrices.py [repeat]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from obj_viewer.matrices import (Matrix, Point, Rotation, Translation,
+                                 Scaling, OrthogonalProjection)
+from obj_viewer.transform import TRS
+
+
+def generic(matrix):
+    """Return a copy of a matrix using the generic implementation."""
+    return Matrix([list(row) for row in matrix])
+
+
+def main(repeat = 5):
+    rotation = Rotation('x')
+    translation = Translation('y')
+    scaling = Scaling(1.1)
+    view = OrthogonalProjection()
+    generic_rotation = generic(rotation)
+    generic_translation = generic(translation)
+    generic_scaling = generic(scaling)
+    generic_view = generic(view)
+    point = Point(1.0, 2.0, 3.0)
+    trs_rotation = TRS.from_matrix(rotation)
+    trs_scaling = TRS.from_matrix(scaling)
+    cases = [
+        ('compose (generic Matrix)',
+         lambda: generic_rotation * generic_translation * generic_scaling),
+        ('compose (AffineMatrix)',
+         lambda: rotation * translation * scaling),
+        ('compose (TRS)',
+         lambda: trs_rotation.then(translation).then(trs_scaling)),
+        ('point transform (generic Matrix)',
+         lambda: point * generic_rotation * generic_view),
+        ('point transform (AffineMatrix)',
+         lambda: view.transform_point(*rotation.transform_point(1.0, 2.0,
+                                                                  3.0))),
+    ]
+    number = 20000
+    for name, case in cases:
+        best = min(timeit.repeat(case, number = number, repeat = repeat))
+        print('%-34s %12.0f ops/s' % (name, number / best))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Benchmark suite timing the stages between an OBJ file and a picture
+of it on synthetic meshes (see generators.py):
+
+load        -- model.load_mesh (parsing and welding), with the cache
+               disabled
+load-cached -- the same, read back from a warm cache
+lod         -- building the levels of detail of the loaded mesh
+compose     -- composing a transformation matrix
+project     -- transforming all the vertices by the view matrix
+wireframe   -- building the 2D segments of the edges
+instances   -- building the segments of INSTANCES placements of the
+               mesh at once
+filled      -- building the shaded faces in back-to-front order, after
+               a small rotation (so re-sorting the previous order)
+scene       -- Model.render() into an offscreen QGraphicsScene
+paint       -- painting that scene into an image
+rasterize   -- the flat-shading software rasterizer
+
+Every stage reports the best time out of a few runs, its throughput
+and the peak memory allocated by a separate, traced run. The Qt stages
+are skipped if PySide is not installed and the rasterizer if NumPy
+isn't; nothing needs a display.
+
+Run from the repository root, e.g.:
+
+    python benchmarks/suite.py --vertices 10000 100000 --output now.json
+    python benchmarks/suite.py --compare now.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2.
+    tracemalloc = None
+
+import generators
+from obj_viewer import rasterizer
+from obj_viewer.lod import build_levels
+from obj_viewer.matrices import Rotation, Translation, Scaling
+from obj_viewer.model import Model, load_mesh
+from obj_viewer.pipeline import (filled, project_vertices, wireframe,
+                                 wireframe_instances)
+
+# The number of placements of the mesh in the instances stage.
+INSTANCES = 8
+
+
+class _Quiet(object):
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow whatever gets printed (e.g. by loading a model)."""
+    stdout = sys.stdout
+    sys.stdout = _Quiet()
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+
+def measure(function, repeat):
+    """Return the best time of repeat calls of the function and the
+    peak of the memory it allocates (None if that can't be traced).
+    """
+    with quiet():
+        best = min(_time(function) for _ in range(repeat))
+        peak = None
+        if tracemalloc is not None:
+            tracemalloc.start()
+            try:
+                function()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return best, peak
+
+
+def _time(function):
+    start = timeit.default_timer()
+    function()
+    return timeit.default_timer() - start
+
+
+def offscreen_application():
+    """Return a QApplication usable without a display, or None if
+    PySide is not available.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PySide import QtGui
+    except ImportError:
+        return None
+    application = QtGui.QApplication.instance()
+    if application is None:
+        # Without the GUI, Qt doesn't need to connect to a display;
+        # painting onto QImages still works.
+        application = QtGui.QApplication(sys.argv, False)
+    return application
+
+
+def stages(filename, application):
+    """Yield (stage, function, unit, amount) for every stage that can
+    be run here, where the throughput is amount units per second. The
+    cached loads use the cache in OBJ_VIEWER_CACHE_DIR.
+    """
+    with quiet():
+        model = Model(None, filename, use_cache = False)
+    mesh = model.mesh
+    matrix = model.current_mod * model.view_matrix
+    transformations = [Rotation('x'), Translation('y'), Scaling(1.1)]
+
+    def load():
+        load_mesh(filename, use_cache = False, verbose = False)
+
+    def load_cached():
+        load_mesh(filename, use_cache = True, verbose = False)
+
+    def compose():
+        current = model.current_mod
+        for transformation in transformations:
+            current = current * transformation
+        return current * model.view_matrix
+
+    yield 'load', load, 'bytes', os.path.getsize(filename)
+    # Files smaller than CACHE_MIN_FILE_SIZE are never cached, so for
+    # those this is just another parse.
+    load_cached()
+    yield 'load-cached', load_cached, 'bytes', os.path.getsize(filename)
+    yield ('lod', lambda: build_levels(mesh, model.triangle_budget),
+           'triangles', len(mesh.triangles) // 3)
+    yield 'compose', compose, 'matrices', len(transformations) + 1
+    yield ('project', lambda: project_vertices(mesh.coordinates, matrix),
+           'vertices', mesh.vertex_count)
+    yield ('wireframe', lambda: wireframe(mesh, matrix, False, model.viewport),
+           'edges', len(mesh.edges) // 2)
+    placements = [model.current_mod * Rotation('y', degrees = 10 * k) *
+                  model.view_matrix for k in range(INSTANCES)]
+    yield ('instances',
+           lambda: wireframe_instances(mesh, placements, False,
+                                       model.viewport),
+           'edges', INSTANCES * len(mesh.edges) // 2)
+    order = filled(mesh, model.current_mod, model.view_matrix)[-1]
+    rotated = model.current_mod * Rotation('y')
+    yield ('filled', lambda: filled(mesh, rotated, model.view_matrix,
+                                    False, order),
+           'faces', mesh.face_count)
+    if application is not None:
+        from PySide import QtGui
+        scene = QtGui.QGraphicsScene()
+        shown = Model(scene, mesh = mesh, levels = [])
+        image = QtGui.QImage(model.viewport[2], model.viewport[3],
+                             QtGui.QImage.Format_RGB32)
+
+        def paint():
+            image.fill(0xffffffff)
+            painter = QtGui.QPainter(image)
+            scene.render(painter)
+            painter.end()
+
+        yield 'scene', shown.render, 'edges', len(mesh.edges) // 2
+        yield 'paint', paint, 'edges', len(mesh.edges) // 2
+    if rasterizer.numpy is not None:
+        yield ('rasterize', model.rasterize, 'triangles',
+               len(mesh.triangles) // 3)
+
+
+def run(kinds, sizes, repeat, directory):
+    application = offscreen_application()
+    results = []
+    for kind in kinds:
+        for size in sizes:
+            filename = os.path.join(directory, '%s-%d.obj' % (kind, size))
+            vertices, faces = generators.generate(kind, filename, size)
+            cache_directory = os.path.join(directory, 'cache')
+            # Only for the cached loads of this mesh; the directory is
+            # gone afterwards.
+            previous = os.environ.get('OBJ_VIEWER_CACHE_DIR')
+            os.environ['OBJ_VIEWER_CACHE_DIR'] = cache_directory
+            try:
+                for stage, function, unit, amount in stages(filename,
+                                                            application):
+                    seconds, peak = measure(function, repeat)
+                    result = {'mesh': kind, 'vertices': vertices,
+                              'faces': faces, 'stage': stage,
+                              'seconds': seconds, 'unit': unit,
+                              'throughput': (amount / seconds if seconds
+                                             else None),
+                              'peak_bytes': peak}
+                    results.append(result)
+                    report(result)
+            finally:
+                if previous is None:
+                    del os.environ['OBJ_VIEWER_CACHE_DIR']
+                else:
+                    os.environ['OBJ_VIEWER_CACHE_DIR'] = previous
+                shutil.rmtree(cache_directory, ignore_errors = True)
+            os.remove(filename)
+    return results
+
+
+def report(result, baseline = None):
+    line = '%-16s %9d %-12s %10.4f s %14s %-9s' % (
+        result['mesh'], result['vertices'], result['stage'],
+        result['seconds'], _number(result['throughput']),
+        result['unit'] + '/s')
+    if result['peak_bytes'] is not None:
+        line += ' %10.1f MiB' % (result['peak_bytes'] / float(1 << 20))
+    if baseline is not None:
+        line += '  x%.2f' % (baseline['seconds'] / result['seconds'])
+    print(line)
+
+
+def _number(value):
+    return '-' if value is None else '%.0f' % value
+
+
+def _key(result):
+    return result['mesh'], result['vertices'], result['stage']
+
+
+def compare(results, filename):
+    """Print the results next to the speedups over those saved in the
+    given file (greater than 1 means faster now).
+    """
+    with open(filename) as source:
+        previous = dict((_key(result), result)
+                        for result in json.load(source)['results'])
+    print('Compared to %s:' % filename)
+    for result in results:
+        baseline = previous.get(_key(result))
+        if baseline is not None:
+            report(result, baseline)
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+    parser.add_argument('--kinds', nargs = '+', choices = generators.KINDS,
+                        default = list(generators.KINDS))
+    parser.add_argument('--vertices', nargs = '+', type = int,
+                        default = [10000, 100000],
+                        help = 'approximate sizes of the meshes')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--output', help = 'save the results as JSON')
+    parser.add_argument('--compare',
+                        help = 'JSON results of an earlier run to compare '
+                               'against')
+    options = parser.parse_args(arguments)
+    directory = tempfile.mkdtemp(prefix = 'obj_viewer_benchmark_')
+    try:
+        results = run(options.kinds, options.vertices, options.repeat,
+                      directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors = True)
+    if options.compare:
+        compare(results, options.compare)
+    if options.output:
+        with open(options.output, 'w') as target:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'numpy': rasterizer.numpy is not None,
+                       'results': results}, target, indent = 2)
+
+
+if __name__ == '__main__':
+    main()
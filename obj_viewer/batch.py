@@ -0,0 +1,306 @@
+"""Rendering of many OBJ files into PNG images without a display, e.g.
+to make thumbnails of a whole library of models:
+
+    main.py render -o thumbnails --transform "rotate x -30; rotate y 45"
+        models/*.obj
+
+Every file is loaded, transformed, fitted into the image and rendered
+by the software rasterizer (which needs NumPy) in a pool of processes,
+one file per process at a time. The images mirror the directories the
+files are found in. Per-file timings are printed as the files are
+done, and failures are reported without stopping the rest; the exit
+status is non-zero if any file failed.
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from obj_viewer.binary import SUFFIX
+from obj_viewer.constants import (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT,
+                                  THUMBNAIL_MARGIN, PARSE_WORKERS)
+from obj_viewer.errors import WrongFileFormatError
+from obj_viewer.matrices import (AffineMatrix, Identity, Rotation,
+                                 Translation, Scaling)
+from obj_viewer.model import load_mesh
+from obj_viewer.pipeline import project_vertices
+from obj_viewer.rasterizer import rasterize
+
+
+def parse_transform(spec):
+    """Turn a transform specification into a single matrix.
+
+    The specification is a sequence of steps separated by semicolons,
+    applied in the order given, each being one of
+
+        rotate AXIS DEGREES
+        translate AXIS DISTANCE
+        scale FACTOR
+
+    e.g. "rotate x -30; scale 2". Raise ValueError if it's malformed.
+    """
+    matrix = Identity()
+    for step in spec.split(';'):
+        words = step.split()
+        if not words:
+            continue
+        kind, arguments = words[0], words[1:]
+        try:
+            if kind == 'rotate' and len(arguments) == 2:
+                step_matrix = Rotation(_axis(arguments[0]),
+                                       degrees = float(arguments[1]))
+            elif kind == 'translate' and len(arguments) == 2:
+                step_matrix = Translation(_axis(arguments[0]),
+                                          float(arguments[1]))
+            elif kind == 'scale' and len(arguments) == 1:
+                step_matrix = Scaling(float(arguments[0]))
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError('Invalid transform step: %r' % step.strip())
+        matrix *= step_matrix
+    return matrix
+
+
+def _axis(name):
+    if name not in ('x', 'y', 'z'):
+        raise ValueError('Unknown axis: %r' % name)
+    return name
+
+
+def fit_view(mesh, transformation, width, height,
+             margin = THUMBNAIL_MARGIN):
+    """Return a view matrix projecting the mesh, transformed by the
+    transformation, onto the middle of an image of the given size,
+    as large as it fits with the given margin (a fraction of the
+    image) on each side.
+    """
+    projected = project_vertices(mesh.coordinates, transformation)
+    xs = projected[0::3]
+    ys = projected[1::3]
+    centre_x = centre_y = 0.0
+    scales = []
+    if xs:
+        low_x, high_x = min(xs), max(xs)
+        low_y, high_y = min(ys), max(ys)
+        centre_x = (low_x + high_x) / 2.0
+        centre_y = (low_y + high_y) / 2.0
+        usable = 1 - 2 * margin
+        if high_x > low_x:
+            scales.append(usable * width / (high_x - low_x))
+        if high_y > low_y:
+            scales.append(usable * height / (high_y - low_y))
+    scale = min(scales) if scales else 1.0
+    # Like OrthogonalProjection, the y axis points up.
+    return AffineMatrix((scale, 0, 0,
+                         0, -scale, 0,
+                         0, 0, 1,
+                         width / 2.0 - scale * centre_x,
+                         height / 2.0 + scale * centre_y, 0))
+
+
+def render_file(job):
+    """Render a single file in a worker process. Return a dictionary
+    describing the result; errors are reported in it rather than
+    raised, so that one broken file doesn't stop the others.
+    """
+    filename, output, transformation, width, height, use_cache, weld = job
+    result = {'file': filename, 'output': output}
+    start = time.time()
+    try:
+        # The pool already keeps all the cores busy.
+        mesh = load_mesh(filename, use_cache, workers = 1,
+                         verbose = False, weld = weld)
+        loaded = time.time()
+        view = fit_view(mesh, transformation, width, height)
+        frame = rasterize(mesh, transformation, view, width, height)
+        rendered = time.time()
+        frame.save_png(output)
+        result.update(load = loaded - start, render = rendered - loaded,
+                      write = time.time() - rendered,
+                      vertices = mesh.vertex_count, faces = mesh.face_count)
+    except (IOError, OSError, WrongFileFormatError, ImportError) as e:
+        result['error'] = str(e) or type(e).__name__
+    except Exception:
+        result['error'] = traceback.format_exc().strip().splitlines()[-1]
+    result['total'] = time.time() - start
+    return result
+
+
+def collect(patterns, listing = None):
+    """Return the files matching the patterns (which may be plain file
+    names, directories, searched for .obj and .mesh files, or glob
+    patterns) and those listed one per line in the listing file,
+    without duplicates.
+    """
+    names = []
+    if listing is not None:
+        with open(listing) as source:
+            names.extend(line.strip() for line in source if line.strip())
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, _, files in os.walk(pattern):
+                names.extend(os.path.join(directory, name)
+                             for name in sorted(files)
+                             if name.lower().endswith(('.obj', SUFFIX)))
+        elif glob.has_magic(pattern):
+            names.extend(sorted(glob.glob(pattern)))
+        else:
+            names.append(pattern)
+    seen = set()
+    return [name for name in names
+            if not (name in seen or seen.add(name))]
+
+
+def output_names(filenames, directory):
+    """Return the names of the PNG images the files are rendered into.
+
+    The directories of the files, relative to the one they all lie
+    in, are mirrored under directory, so that files of the same name
+    in different directories don't overwrite each other's images;
+    files differing only in their extension (e.g. chair.obj and
+    chair.mesh) keep it in the name of their image. Only the same file
+    listed more than once gets the same name more than once.
+    """
+    paths = [os.path.abspath(filename) for filename in filenames]
+    try:
+        base = os.path.commonpath([os.path.dirname(path) for path in paths])
+    except ValueError:
+        # No files, or files on different drives.
+        base = None
+    relatives = [os.path.relpath(path, base) if base is not None
+                 else os.path.basename(path) for path in paths]
+    stems = collections.Counter(os.path.splitext(relative)[0]
+                                for relative in set(relatives))
+    names = []
+    for relative in relatives:
+        stem = os.path.splitext(relative)[0]
+        names.append(os.path.join(directory, (stem if stems[stem] == 1
+                                              else relative) + '.png'))
+    return names
+
+
+def render_files(filenames, directory, transformation = None,
+                 width = THUMBNAIL_WIDTH, height = THUMBNAIL_HEIGHT,
+                 workers = None, use_cache = None, report = None,
+                 weld = None):
+    """Render the files into PNG images in the directory (see
+    output_names) with a pool of workers processes (all the cores by
+    default), calling report with the result of every file (see
+    render_file) as it's done. Meshes are welded as load_mesh does by
+    default unless weld says otherwise. A file whose image would
+    overwrite that of another one is not rendered but reported as a
+    failure. Return the list of all the results.
+    """
+    if transformation is None:
+        transformation = Identity()
+    results = []
+    jobs = []
+    owners = {}
+    for filename, output in zip(filenames,
+                                output_names(filenames, directory)):
+        key = os.path.normcase(output)
+        if key in owners:
+            result = {'file': filename, 'output': output,
+                      'error': 'the image would overwrite that of %s'
+                               % owners[key]}
+            results.append(result)
+            if report is not None:
+                report(result)
+            continue
+        owners[key] = filename
+        parent = os.path.dirname(output)
+        if parent and not os.path.isdir(parent):
+            os.makedirs(parent)
+        jobs.append((filename, output, transformation, width, height,
+                     use_cache, weld))
+    if workers is None:
+        workers = PARSE_WORKERS or multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        outcomes = map(render_file, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        # Big files take much longer than small ones, so take results
+        # in whatever order they come.
+        outcomes = pool.imap_unordered(render_file, jobs)
+    try:
+        for result in outcomes:
+            results.append(result)
+            if report is not None:
+                report(result)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return results
+
+
+def print_result(result):
+    if 'error' in result:
+        print('FAILED %s: %s' % (result['file'], result['error']),
+              file = sys.stderr)
+    else:
+        print('%-40s load %7.3f s  render %7.3f s  write %7.3f s  '
+              'total %7.3f s' % (result['file'], result['load'],
+                                 result['render'], result['write'],
+                                 result['total']))
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(
+        prog = 'main.py render',
+        description = 'Render OBJ files into PNG images without a display.')
+    parser.add_argument('files', nargs = '*',
+                        help = 'OBJ files, directories or glob patterns')
+    parser.add_argument('-l', '--list', dest = 'listing',
+                        help = 'a file listing the OBJ files, one per line')
+    parser.add_argument('-o', '--output', default = '.',
+                        help = 'directory to write the images to')
+    parser.add_argument('-t', '--transform', default = '',
+                        help = 'e.g. "rotate x -30; translate y 0.5; '
+                               'scale 2"')
+    parser.add_argument('--size', nargs = 2, type = int,
+                        default = [THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT],
+                        metavar = ('WIDTH', 'HEIGHT'))
+    parser.add_argument('-j', '--workers', type = int,
+                        help = 'number of processes (all the cores by '
+                               'default)')
+    parser.add_argument('--no-cache', action = 'store_true',
+                        help = 'neither read nor write the mesh cache')
+    parser.add_argument('--weld', action = 'store_true', default = None,
+                        help = 'merge duplicated vertices after loading')
+    parser.add_argument('--report',
+                        help = 'write the results of all files as JSON')
+    options = parser.parse_args(arguments)
+    try:
+        transformation = parse_transform(options.transform)
+    except ValueError as e:
+        parser.error(str(e))
+    filenames = collect(options.files, options.listing)
+    if not filenames:
+        parser.error('no files to render')
+    start = time.time()
+    results = render_files(filenames, options.output, transformation,
+                           options.size[0], options.size[1],
+                           options.workers,
+                           False if options.no_cache else None,
+                           print_result, options.weld)
+    failed = [result for result in results if 'error' in result]
+    print('Rendered %d of %d files in %.1f s.'
+          % (len(results) - len(failed), len(results), time.time() - start))
+    if options.report:
+        with open(options.report, 'w') as target:
+            json.dump(results, target, indent = 2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
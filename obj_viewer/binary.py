@@ -0,0 +1,144 @@
+"""Compact binary representation of a Mesh.
+
+The file starts with a fixed-size header followed by the raw contents
+of the mesh arrays, each section aligned to 8 bytes. Reading a mesh
+thus only takes a bulk read of every array straight from the file,
+without any parsing:
+
+    magic       8 bytes, MAGIC
+    version     uint32, VERSION
+    byte order  uint32, 0 for little endian, 1 for big endian
+    counts      7 x uint64: vertices, texture coordinates, normals,
+                faces, face indices, edges and reserved (0)
+    coordinates 3 x vertices doubles
+    texcoords   2 x texture coordinates doubles
+    normals     3 x normals doubles
+    offsets     faces + 1 int32s; the face i consists of the indices
+                between offsets[i] and offsets[i + 1]
+    indices     face indices int32s
+    edges       2 x edges int32s
+"""
+import struct
+import sys
+from array import array
+
+from obj_viewer.constants import EXPORT_CHUNK_SIZE
+from obj_viewer.errors import WrongFileFormatError
+from obj_viewer.mesh import Mesh
+from obj_viewer.pipeline import transformed_chunks
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'OBJVMESH'
+VERSION = 1
+HEADER = struct.Struct('<8sII7Q')
+SUFFIX = '.mesh'
+
+
+def write_mesh(filename, mesh, transformation = None,
+               chunk = EXPORT_CHUNK_SIZE):
+    """Store the mesh in a binary file. If a transformation is given,
+    the mesh is stored as transformed by it: its vertices and normals
+    are transformed and written chunk vertices at a time, so that no
+    transformed copy of the whole mesh is ever made.
+    """
+    offsets = mesh.face_offsets
+    indices = mesh.face_indices
+    coordinates = mesh.coordinates
+    normals = mesh.normals
+    if transformation is not None:
+        coordinates = transformed_chunks(coordinates, transformation, chunk)
+        normals = transformed_chunks(normals, transformation, chunk,
+                                     vectors = True)
+    sections = [coordinates, mesh.texcoords, normals, offsets, indices,
+                mesh.edges]
+    with open(filename, 'wb') as target:
+        target.write(HEADER.pack(MAGIC, VERSION,
+                                 0 if sys.byteorder == 'little' else 1,
+                                 mesh.vertex_count,
+                                 len(mesh.texcoords) // 2,
+                                 len(mesh.normals) // 3,
+                                 mesh.face_count, len(indices),
+                                 len(mesh.edges) // 2, 0))
+        for section in sections:
+            if isinstance(section, array):
+                section.tofile(target)
+                size = len(section) * section.itemsize
+            else:
+                size = 0
+                for block in section:
+                    data = block.tobytes()
+                    target.write(data)
+                    size += len(data)
+            target.write(b'\0' * _padding(size))
+
+
+def read_mesh(filename):
+    """Load a mesh stored by write_mesh. Raise WrongFileFormatError if
+    the file is not a binary mesh of a version we understand.
+    """
+    with open(filename, 'rb') as source:
+        header = source.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise WrongFileFormatError('Invalid input file - unexpected '
+                                       'file format.')
+        (magic, version, byteorder, vertices, texcoords, normals, faces,
+         indices, edges, _) = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise WrongFileFormatError('Invalid input file - unexpected '
+                                       'file format or version.')
+        swap = byteorder != (0 if sys.byteorder == 'little' else 1)
+        sections = []
+        for typecode, length in (('d', 3 * vertices), ('d', 2 * texcoords),
+                                 ('d', 3 * normals), ('i', faces + 1),
+                                 ('i', indices), ('i', 2 * edges)):
+            section = array(typecode)
+            try:
+                section.fromfile(source, length)
+            except (EOFError, ValueError):
+                # ValueError if it ends in the middle of a number.
+                raise WrongFileFormatError('Invalid input file - the file '
+                                           'is truncated.')
+            if swap:
+                section.byteswap()
+            sections.append(section)
+            source.seek(_padding(length * section.itemsize), 1)
+    coordinates, texcoords, normals, offsets, indices, edges = sections
+    if (offsets[0] != 0 or offsets[-1] != len(indices) or
+            not _never_decrease(offsets)):
+        raise WrongFileFormatError('Invalid input file - the faces are '
+                                   'corrupted.')
+    if indices and not _in_range(indices, vertices):
+        raise WrongFileFormatError('Invalid input file - face refers to '
+                                   'a nonexistent vertex.')
+    if edges and not _in_range(edges, vertices):
+        raise WrongFileFormatError('Invalid input file - edge refers to '
+                                   'a nonexistent vertex.')
+    return Mesh(coordinates, texcoords = texcoords, normals = normals,
+                edges = edges, face_offsets = offsets,
+                face_indices = indices)
+
+
+def _in_range(indices, count):
+    """Tell whether all the indices lie in range(count)."""
+    if numpy is not None:
+        values = numpy.frombuffer(indices, dtype = numpy.intc)
+        return values.min() >= 0 and values.max() < count
+    return min(indices) >= 0 and max(indices) < count
+
+
+def _never_decrease(values):
+    """Tell whether every value is at least as large as the previous
+    one.
+    """
+    if numpy is not None:
+        steps = numpy.diff(numpy.frombuffer(values, dtype = numpy.intc))
+        return bool((steps >= 0).all())
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+def _padding(size):
+    return -size % 8
@@ -0,0 +1,135 @@
+"""On-disk cache of parsed models.
+
+Parsing a large OBJ file takes a long time, so the resulting Mesh is
+stored in the binary format of obj_viewer.binary and read back the
+next time the same file is opened. Entries are keyed by the absolute
+path, size and modification time of the source file, so editing the
+file invalidates its entry. Once the cache grows over its size limit,
+the least recently used entries are removed.
+
+The cache can be disabled altogether by setting CACHE_ENABLED to
+False or by defining the OBJ_VIEWER_NO_CACHE environment variable; its
+location can be overridden by OBJ_VIEWER_CACHE_DIR.
+"""
+import hashlib
+import os
+
+from obj_viewer.binary import read_mesh, write_mesh, SUFFIX, VERSION
+from obj_viewer.constants import (CACHE_ENABLED, CACHE_MIN_FILE_SIZE,
+                                  CACHE_MAX_BYTES)
+from obj_viewer.errors import WrongFileFormatError
+
+
+def cache_enabled():
+    return CACHE_ENABLED and 'OBJ_VIEWER_NO_CACHE' not in os.environ
+
+
+def default_directory():
+    directory = os.environ.get('OBJ_VIEWER_CACHE_DIR')
+    if directory:
+        return directory
+    base = (os.environ.get('XDG_CACHE_HOME') or
+            os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'obj_viewer')
+
+
+class MeshCache(object):
+    """A directory of binary meshes named after the identity of the
+    files they have been parsed from.
+
+    Failing to read or write the cache is never fatal; the file is
+    simply parsed again.
+    """
+
+    def __init__(self, directory = None, max_bytes = CACHE_MAX_BYTES,
+                 min_file_size = CACHE_MIN_FILE_SIZE):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.min_file_size = min_file_size
+
+    def path(self, filename, variant = ''):
+        """Return the path of the cache entry for the given file or
+        None if the file is too small to be worth caching. Different
+        variants of the mesh of the same file (e.g. welded or not) are
+        kept in separate entries.
+        """
+        stat = os.stat(filename)
+        if stat.st_size < self.min_file_size:
+            return None
+        identity = '%s|%d|%d|%d' % (os.path.abspath(filename), stat.st_size,
+                                    stat.st_mtime_ns, VERSION)
+        if variant:
+            identity += '|' + variant
+        digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + SUFFIX)
+
+    def load(self, filename, variant = ''):
+        """Return the cached Mesh of the file or None on a miss."""
+        try:
+            path = self.path(filename, variant)
+            if path is None or not os.path.exists(path):
+                return None
+            mesh = read_mesh(path)
+            # Keep track of the last use for the eviction.
+            os.utime(path, None)
+            return mesh
+        except (IOError, OSError, WrongFileFormatError):
+            return None
+
+    def store(self, filename, mesh, variant = ''):
+        temporary = None
+        try:
+            path = self.path(filename, variant)
+            if path is None:
+                return
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # Write to a temporary file first so that other viewers
+            # never see a partially written entry.
+            temporary = '%s.%d.tmp' % (path, os.getpid())
+            write_mesh(temporary, mesh)
+            os.replace(temporary, path)
+            temporary = None
+            self.evict()
+        except (IOError, OSError):
+            # evict only sees complete entries, so whatever has been
+            # written would never be removed otherwise.
+            if temporary is not None:
+                try:
+                    os.remove(temporary)
+                except OSError:
+                    pass
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits
+        in max_bytes.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        max_bytes = self.max_bytes
+        self.max_bytes = 0
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
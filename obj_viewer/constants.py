@@ -11,3 +11,58 @@ DEGREES = 5
 DISTANCE = 0.1
 FACTOR_PLUS = 1.1
 FACTOR_MINUS = 0.9
+
+PARSE_BLOCK_SIZE = 1 << 22
+PARSE_WORKERS = None
+PARALLEL_PARSE_THRESHOLD = 1 << 26
+
+CACHE_ENABLED = True
+CACHE_MIN_FILE_SIZE = 1 << 20
+CACHE_MAX_BYTES = 1 << 30
+
+WELD_VERTICES = False
+WELD_TOLERANCE = 1e-6
+
+BACKGROUND_COLOR = (255, 255, 255)
+MODEL_COLOR = (70, 130, 180)
+LIGHT_DIRECTION = (0, 0, 1)
+AMBIENT_LIGHT = 0.2
+RASTER_BATCH_FRAGMENTS = 1 << 21
+
+BACKFACE_CULLING = False
+FILLED_FACES = False
+SHADE_LEVELS = 64
+VIEWPORT_CLIPPING = True
+
+LOD_ENABLED = True
+LOD_TRIANGLE_BUDGET = 50000
+LOD_IDLE_MS = 300
+
+MAX_FRAME_RATE = 30
+
+PREVIEW_FACES = 20000
+PREVIEW_INTERVAL = 0.5
+
+PROFILING_ENABLED = False
+PROFILE_WINDOW = 120
+PROFILE_MAX_EVENTS = 100000
+STATS_INTERVAL_MS = 1000
+
+TRS_RENORMALIZE_INTERVAL = 64
+TRS_TOLERANCE = 1e-6
+
+PICK_LEAF_SIZE = 32
+PICK_RADIUS = 6
+PICK_INTERVAL_MS = 15
+HIGHLIGHT_COLOR = (220, 60, 30)
+HIGHLIGHT_VERTEX_SIZE = 4
+
+THUMBNAIL_WIDTH = 256
+THUMBNAIL_HEIGHT = 256
+THUMBNAIL_MARGIN = 0.05
+
+EXPORT_CHUNK_SIZE = 1 << 16
+
+INSTANCE_OFFSET = 1.0
+INACTIVE_COLOR = (150, 150, 150)
+INACTIVE_OPACITY = 0.5
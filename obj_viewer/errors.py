@@ -10,3 +10,15 @@ class IncompatibleMatricesError(Exception):
     incompatible dimensions).
     """
     pass
+
+class LoadCancelledError(Exception):
+    """Raised to abort loading a model, e.g. when the user cancels it
+    while it's being loaded in the background.
+    """
+    pass
+
+class IncompatibleTransformationError(Exception):
+    """Raised when a transformation can't be represented in the form
+    required, e.g. a shear or non-uniform scaling as a TRS.
+    """
+    pass
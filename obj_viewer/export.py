@@ -0,0 +1,72 @@
+"""Saving a model as it is currently transformed, either as a Wavefront
+OBJ file or in the binary format of obj_viewer.binary (which is picked
+by the .mesh extension and can be opened again much faster).
+
+The mesh is transformed and written a chunk of EXPORT_CHUNK_SIZE
+vertices (or faces) at a time, so exporting takes little memory beyond
+that of the mesh itself however big it is.
+"""
+import itertools
+
+from obj_viewer.binary import write_mesh, SUFFIX
+from obj_viewer.constants import APP_NAME, EOL, EXPORT_CHUNK_SIZE
+from obj_viewer.pipeline import transformed_chunks
+
+
+def export_mesh(filename, mesh, transformation, chunk = EXPORT_CHUNK_SIZE):
+    """Write the mesh transformed by the transformation into the file,
+    as a binary mesh if its name ends with .mesh and as OBJ otherwise.
+    """
+    if filename.lower().endswith(SUFFIX):
+        write_mesh(filename, mesh, transformation, chunk)
+    else:
+        write_obj(filename, mesh, transformation, chunk)
+
+
+def write_obj(filename, mesh, transformation, chunk = EXPORT_CHUNK_SIZE):
+    """Write the mesh transformed by the transformation into an OBJ
+    file. Texture coordinates and normals are written as well, although
+    faces don't refer to them, as they don't when read by the parser.
+    """
+    with open(filename, 'w') as target:
+        target.write('# Exported by %s%s' % (APP_NAME, EOL))
+        target.write('# %d vertices, %d faces%s' % (mesh.vertex_count,
+                                                     mesh.face_count, EOL))
+        for block in transformed_chunks(mesh.coordinates, transformation,
+                                        chunk):
+            _write_records(target, 'v', 3, block.tolist())
+        texcoords = mesh.texcoords
+        for start in range(0, len(texcoords), 2 * chunk):
+            _write_records(target, 'vt', 2,
+                           texcoords[start:start + 2 * chunk].tolist())
+        for block in transformed_chunks(mesh.normals, transformation, chunk,
+                                        vectors = True):
+            _write_records(target, 'vn', 3, block.tolist())
+        _write_faces(target, mesh.face_offsets, mesh.face_indices, chunk)
+
+
+def _write_records(target, keyword, size, values):
+    # A single formatting operation for the whole chunk is much faster
+    # than formatting the lines one by one. Seventeen significant digits
+    # are enough for every double to be read back exactly.
+    line = keyword + ' %.17g' * size + EOL
+    target.write(line * (len(values) // size) % tuple(values))
+
+
+def _write_faces(target, offsets, indices, chunk):
+    count = len(offsets) - 1
+    for first in range(0, count, chunk):
+        last = min(first + chunk, count)
+        start = offsets[first]
+        # OBJ indices start at 1.
+        values = [v + 1 for v in indices[start:offsets[last]]]
+        sizes = [offsets[f + 1] - offsets[f] for f in range(first, last)]
+        position = 0
+        # Faces usually come in long runs of the same size, each of
+        # which is written at once.
+        for size, run in itertools.groupby(sizes):
+            length = size * len(list(run))
+            line = 'f' + ' %d' * size + EOL
+            target.write(line * (length // size) %
+                         tuple(values[position:position + length]))
+            position += length
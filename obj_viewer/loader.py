@@ -0,0 +1,131 @@
+"""Loading of models in the background, so that the window stays
+responsive while a big file is being parsed.
+"""
+import time
+
+from PySide import QtCore
+
+from obj_viewer.constants import (LOD_ENABLED, LOD_TRIANGLE_BUDGET,
+                                  PREVIEW_INTERVAL)
+from obj_viewer.errors import WrongFileFormatError, LoadCancelledError
+from obj_viewer.export import export_mesh
+from obj_viewer.lod import build_levels
+from obj_viewer.model import load_mesh
+from obj_viewer.picking import Picker
+
+
+class ModelLoader(QtCore.QThread):
+    """Thread loading the mesh of a model (and building its levels of
+    detail). The results are delivered through signals, which Qt
+    queues to the thread the loader has been created in:
+
+    progressed -- (done, total) bytes of the file parsed so far
+    previewed  -- a Mesh of a sample of the faces parsed so far, sent
+                  at most once every PREVIEW_INTERVAL seconds
+    loaded     -- (mesh, levels) once the whole file has been loaded
+    failed     -- the error message if the file couldn't be loaded
+    """
+
+    progressed = QtCore.Signal(object, object)
+    previewed = QtCore.Signal(object)
+    loaded = QtCore.Signal(object, object)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, filename, parent = None):
+        super(ModelLoader, self).__init__(parent)
+        self.filename = filename
+        self.cancelled = False
+        self.last_preview = None
+
+    def cancel(self):
+        """Ask the loader to stop; it will finish without emitting
+        either loaded or failed.
+        """
+        self.cancelled = True
+
+    def run(self):
+        self.last_preview = time.time()
+        try:
+            mesh = load_mesh(self.filename, progress = self.report)
+            if self.cancelled:
+                return
+            levels = (build_levels(mesh, LOD_TRIANGLE_BUDGET)
+                      if LOD_ENABLED else [])
+            # Computed once here rather than on the first filled frame.
+            for detail in [mesh] + levels:
+                detail.face_normals
+        except LoadCancelledError:
+            return
+        except (IOError, WrongFileFormatError) as e:
+            self.failed.emit(str(e))
+            return
+        except Exception as e:
+            # Anything else would end the thread without a word, leaving
+            # the progress bar up for good.
+            if not self.cancelled:
+                self.failed.emit('There was a problem loading %s: %s'
+                                 % (self.filename, e))
+            return
+        if not self.cancelled:
+            self.loaded.emit(mesh, levels)
+
+    def report(self, done, total, preview):
+        if self.cancelled:
+            raise LoadCancelledError('Loading of %s has been cancelled.'
+                                     % self.filename)
+        self.progressed.emit(done, total)
+        now = time.time()
+        if done < total and now - self.last_preview >= PREVIEW_INTERVAL:
+            self.last_preview = now
+            self.previewed.emit(preview())
+
+
+class PickerBuilder(QtCore.QThread):
+    """Thread building the Picker of a mesh (see obj_viewer.picking),
+    delivered as (mesh, picker) through the built signal, or failed
+    with the error message.
+    """
+
+    built = QtCore.Signal(object, object)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, mesh, parent = None):
+        super(PickerBuilder, self).__init__(parent)
+        self.mesh = mesh
+
+    def run(self):
+        try:
+            picker = Picker(self.mesh)
+        except Exception as e:
+            self.failed.emit('There was a problem preparing the model for '
+                             'picking: %s' % e)
+            return
+        self.built.emit(self.mesh, picker)
+
+
+class ModelExporter(QtCore.QThread):
+    """Thread writing a mesh, transformed by a matrix, into a file (see
+    obj_viewer.export). The mesh is never modified, so the model may go
+    on being transformed meanwhile. Once done, either exported is
+    emitted with the file name or failed with the error message.
+    """
+
+    exported = QtCore.Signal(str)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, mesh, transformation, filename, parent = None):
+        super(ModelExporter, self).__init__(parent)
+        self.mesh = mesh
+        self.transformation = transformation
+        self.filename = filename
+
+    def run(self):
+        try:
+            export_mesh(self.filename, self.mesh, self.transformation)
+        except Exception as e:
+            # Not only IOError: anything else would end the thread
+            # without a word.
+            self.failed.emit('There was a problem writing %s: %s'
+                             % (self.filename, e))
+            return
+        self.exported.emit(self.filename)
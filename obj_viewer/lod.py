@@ -0,0 +1,135 @@
+"""Simplified versions of meshes, used to keep the viewer responsive
+while the model is being transformed.
+
+Meshes are simplified by vertex clustering: space is divided into
+a regular grid, all the vertices within a cell are merged into one
+placed at their average, and triangles which collapse as a result are
+dropped. It's crude, but fast and independent of the mesh topology.
+"""
+from array import array
+
+from obj_viewer.mesh import Mesh
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def build_levels(mesh, budget):
+    """Return simplified versions of the mesh ordered from the coarsest
+    to the finest, the coarsest having at most budget triangles and
+    each next one roughly four times as many. Meshes within the budget
+    get no levels at all.
+    """
+    levels = []
+    target = budget
+    total = len(mesh.triangles) // 3
+    resolution = None
+    while target < total:
+        level, resolution = simplify_to(mesh, target, resolution)
+        if level is None:
+            break
+        if not levels or level.face_count > levels[-1].face_count:
+            levels.append(level)
+        target *= 4
+        resolution *= 2
+    return levels
+
+
+def simplify_to(mesh, budget, resolution = None):
+    """Cluster the mesh on successively coarser grids until it has at
+    most budget triangles. Return the simplified mesh and the number
+    of grid cells along the longest side of the bounding box used, or
+    (None, None) if there's nothing to simplify.
+    """
+    if resolution is None:
+        # The number of triangles grows with the area of the surface,
+        # i.e. with the square of the resolution.
+        resolution = max(2, int(budget ** 0.5))
+    while resolution >= 2:
+        coordinates, triangles = cluster(mesh, resolution)
+        count = len(triangles) // 3
+        if count <= budget:
+            return _mesh(coordinates, triangles), resolution
+        resolution = min(int(resolution * 0.9 * (float(budget) / count)
+                             ** 0.5), resolution - 1)
+    return None, None
+
+
+def cluster(mesh, resolution):
+    """Cluster the vertices of the mesh on a grid with the given number
+    of cells along the longest side of its bounding box. Return the
+    coordinates of the clusters and the triangles which haven't
+    collapsed, as flat arrays.
+    """
+    if numpy is not None:
+        return _cluster_numpy(mesh, resolution)
+    coordinates = mesh.coordinates
+    lows = [min(coordinates[i::3]) for i in range(3)]
+    highs = [max(coordinates[i::3]) for i in range(3)]
+    size = max(high - low for low, high in zip(lows, highs)) / resolution
+    if size == 0:
+        size = 1.0
+    clusters = {}
+    sums = []
+    remap = array('i', [0]) * mesh.vertex_count
+    for v in range(mesh.vertex_count):
+        x, y, z = coordinates[3 * v:3 * v + 3]
+        key = (int((x - lows[0]) / size), int((y - lows[1]) / size),
+               int((z - lows[2]) / size))
+        cluster = clusters.get(key)
+        if cluster is None:
+            cluster = clusters[key] = len(sums)
+            sums.append([0.0, 0.0, 0.0, 0])
+        total = sums[cluster]
+        total[0] += x
+        total[1] += y
+        total[2] += z
+        total[3] += 1
+        remap[v] = cluster
+    clustered = array('d')
+    for x, y, z, count in sums:
+        clustered.extend((x / count, y / count, z / count))
+    triangles = mesh.triangles
+    kept = array('i')
+    for t in range(0, len(triangles), 3):
+        a = remap[triangles[t]]
+        b = remap[triangles[t + 1]]
+        c = remap[triangles[t + 2]]
+        if a != b and b != c and a != c:
+            kept.extend((a, b, c))
+    return clustered, kept
+
+
+def _cluster_numpy(mesh, resolution):
+    points = numpy.frombuffer(mesh.coordinates, dtype = float).reshape(-1, 3)
+    low = points.min(axis = 0)
+    size = (points.max(axis = 0) - low).max() / resolution
+    if size == 0:
+        size = 1.0
+    cells = ((points - low) / size).astype(numpy.int64)
+    keys = ((cells[:, 0] * (resolution + 1) + cells[:, 1]) *
+            (resolution + 1) + cells[:, 2])
+    _, remap, counts = numpy.unique(keys, return_inverse = True,
+                                    return_counts = True)
+    remap = remap.ravel()
+    clustered = numpy.empty((len(counts), 3))
+    for i in range(3):
+        clustered[:, i] = (numpy.bincount(remap, weights = points[:, i]) /
+                           counts)
+    triangles = remap[numpy.frombuffer(mesh.triangles,
+                                       dtype = numpy.intc).reshape(-1, 3)]
+    kept = ((triangles[:, 0] != triangles[:, 1]) &
+            (triangles[:, 1] != triangles[:, 2]) &
+            (triangles[:, 0] != triangles[:, 2]))
+    coordinates = array('d')
+    coordinates.frombytes(clustered.tobytes())
+    indices = array('i')
+    indices.frombytes(triangles[kept].astype(numpy.intc).tobytes())
+    return coordinates, indices
+
+
+def _mesh(coordinates, triangles):
+    return Mesh(coordinates, face_offsets = array('i', range(
+        0, len(triangles) + 1, 3)), face_indices = triangles)
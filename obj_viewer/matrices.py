@@ -62,6 +62,10 @@ class Point(Matrix):
         taking into account any transformation that has been applied
         to the model (stored in transformation_matrix).
         """
+        if (isinstance(transformation_matrix, AffineMatrix) and
+                isinstance(view_matrix, AffineMatrix)):
+            return view_matrix.transform_point(
+                *transformation_matrix.transform_point(*self[0][:3]))
         new_coordinates = self * transformation_matrix * view_matrix
         return (new_coordinates[0][0], new_coordinates[0][1],
                 new_coordinates[0][2])
@@ -95,102 +99,202 @@ class Vector(Matrix):
         return self[0][2]
 
 
-class Identity(Matrix):
+class AffineMatrix(object):
+    """Compact representation of the 4x4 matrices of affine
+    transformations. Since the last column of such a matrix is always
+    (0, 0, 0, 1), only the remaining 12 cells are stored, row by row,
+    in a flat tuple.
+
+    Multiplying two affine matrices is unrolled by hand and yields
+    another AffineMatrix; anything else falls back to the generic
+    Matrix implementation.
+    """
+
+    __slots__ = ('cells',)
+
+    rows = DIMENSIONS + 1
+    cols = DIMENSIONS + 1
+
+    def __init__(self, cells):
+        self.cells = tuple(cells)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, r):
+        if r < 0:
+            r += self.rows
+        if not 0 <= r < self.rows:
+            raise IndexError('AffineMatrix row index out of range.')
+        return self.cells[3 * r:3 * r + 3] + ((1,) if r == DIMENSIONS
+                                              else (0,))
+
+    def __iter__(self):
+        for r in range(self.rows):
+            yield self[r]
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.cells)
+
+    def __mul__(self, matrix):
+        if not isinstance(matrix, AffineMatrix):
+            return Matrix([list(row) for row in self]) * matrix
+        a, b, c, d, e, f, g, h, i, j, k, l = self.cells
+        A, B, C, D, E, F, G, H, I, J, K, L = matrix.cells
+        return AffineMatrix((a * A + b * D + c * G,
+                             a * B + b * E + c * H,
+                             a * C + b * F + c * I,
+                             d * A + e * D + f * G,
+                             d * B + e * E + f * H,
+                             d * C + e * F + f * I,
+                             g * A + h * D + i * G,
+                             g * B + h * E + i * H,
+                             g * C + h * F + i * I,
+                             j * A + k * D + l * G + J,
+                             j * B + k * E + l * H + K,
+                             j * C + k * F + l * I + L))
+
+    def transposed(self):
+        return Matrix([[row[i] for row in self] for i
+                       in range(self.rows)])
+
+    def inverse(self):
+        """Return the inverse matrix; raise IncompatibleMatricesError
+        if the matrix is singular.
+        """
+        a, b, c, d, e, f, g, h, i, j, k, l = self.cells
+        A = e * i - f * h
+        B = c * h - b * i
+        C = b * f - c * e
+        determinant = a * A + d * B + g * C
+        if determinant == 0:
+            raise IncompatibleMatricesError('A singular matrix cannot be '
+                                            'inverted.')
+        r = 1.0 / determinant
+        linear = (A * r, B * r, C * r,
+                  (f * g - d * i) * r, (a * i - c * g) * r,
+                  (c * d - a * f) * r,
+                  (d * h - e * g) * r, (b * g - a * h) * r,
+                  (a * e - b * d) * r)
+        return AffineMatrix(linear + (
+            -(j * linear[0] + k * linear[3] + l * linear[6]),
+            -(j * linear[1] + k * linear[4] + l * linear[7]),
+            -(j * linear[2] + k * linear[5] + l * linear[8])))
+
+    def transform_point(self, x, y, z):
+        """Return the x-y-z coordinates of the point (x, y, z, 1)
+        multiplied by this matrix, without building a Point.
+        """
+        a, b, c, d, e, f, g, h, i, j, k, l = self.cells
+        return (x * a + y * d + z * g + j,
+                x * b + y * e + z * h + k,
+                x * c + y * f + z * i + l)
+
+
+class Identity(AffineMatrix):
     """Class representing identity matrices; that is, square
     matrices containing ones on the main diagonal and zeros everywhere
     else.
     """
 
+    __slots__ = ()
+
     def __init__(self):
-        Matrix.__init__(self, rows = DIMENSIONS + 1,
-                        cols = DIMENSIONS + 1)
-        for i in range(DIMENSIONS + 1):
-            self[i][i] = 1
+        AffineMatrix.__init__(self, (1, 0, 0,
+                                     0, 1, 0,
+                                     0, 0, 1,
+                                     0, 0, 0))
 
 
-class Rotation(Matrix):
+class Rotation(AffineMatrix):
     """Class capable of creating matrices for rotation around a given
     axis by a specified angle (given in radians or degrees).
     """
 
+    __slots__ = ('angle',)
+
     def __init__(self, axis, radians = None, degrees = DEGREES):
-        Matrix.__init__(self, rows = DIMENSIONS + 1,
-                        cols = DIMENSIONS + 1)
-        for i in range(DIMENSIONS + 1):
-            self[i][i] = 1
         if radians is not None:
             self.angle = radians
         else:
             self.angle = math.radians(degrees)
         if axis == 'x':
-            self.rotating_around_x()
+            cells = self.rotating_around_x()
         elif axis == 'y':
-            self.rotating_around_y()
+            cells = self.rotating_around_y()
         elif axis == 'z':
-            self.rotating_around_z()
+            cells = self.rotating_around_z()
+        else:
+            cells = Identity().cells
+        AffineMatrix.__init__(self, cells)
 
     def rotating_around_x(self):
         sin = math.sin(self.angle)
         cos = math.cos(self.angle)
-        self[1][1] = cos
-        self[1][2] = -sin
-        self[2][1] = sin
-        self[2][2] = cos
+        return (1, 0,    0,
+                0, cos,  -sin,
+                0, sin,  cos,
+                0, 0,    0)
 
     def rotating_around_y(self):
         sin = math.sin(self.angle)
         cos = math.cos(self.angle)
-        self[0][0] = cos
-        self[0][2] = sin
-        self[2][0] = -sin
-        self[2][2] = cos
+        return (cos,  0, sin,
+                0,    1, 0,
+                -sin, 0, cos,
+                0,    0, 0)
 
     def rotating_around_z(self):
         sin = math.sin(self.angle)
         cos = math.cos(self.angle)
-        self[0][0] = cos
-        self[0][1] = sin
-        self[1][0] = -sin
-        self[1][1] = cos
+        return (cos,  sin, 0,
+                -sin, cos, 0,
+                0,    0,   1,
+                0,    0,   0)
 
 
-class Translation(Matrix):
+class Translation(AffineMatrix):
     """Class responsible for translation matrices."""
 
+    __slots__ = ()
+
     def __init__(self, axis, dist = DISTANCE):
-        Matrix.__init__(self, rows = DIMENSIONS + 1,
-                        cols = DIMENSIONS + 1)
-        for i in range(DIMENSIONS + 1):
-            self[i][i] = 1
+        offset = [0, 0, 0]
         if axis == 'x':
-            self[DIMENSIONS][0] = dist
+            offset[0] = dist
         elif axis == 'y':
-            self[DIMENSIONS][1] = dist
+            offset[1] = dist
         elif axis == 'z':
-            self[DIMENSIONS][2] = dist
+            offset[2] = dist
+        AffineMatrix.__init__(self, (1, 0, 0,
+                                     0, 1, 0,
+                                     0, 0, 1) + tuple(offset))
 
 
-class Scaling(Matrix):
+class Scaling(AffineMatrix):
     """Class handling scaling matrices."""
 
+    __slots__ = ()
+
     def __init__(self, factor):
-        Matrix.__init__(self, rows = DIMENSIONS + 1,
-                        cols = DIMENSIONS + 1)
-        self[0][0] = factor
-        self[1][1] = factor
-        self[2][2] = factor
-        self[3][3] = 1
+        AffineMatrix.__init__(self, (factor, 0,      0,
+                                     0,      factor, 0,
+                                     0,      0,      factor,
+                                     0,      0,      0))
 
 
-class OrthogonalProjection(Matrix):
+class OrthogonalProjection(AffineMatrix):
     """Class handling the creation of a viewport transformation
     matrix, that is, a matrix which scales objects to be visible in
     the viewport and moves the origin to the viewport center.
     """
 
-    def __init__(self):
-        this = [[VIEW_SCALE,      0,                0, 0],
-                [0,               -VIEW_SCALE,      0, 0],
-                [0,               0,                1, 0],
-                [VIEW_WIDTH // 2, VIEW_HEIGHT // 2, 0, 1]]
-        Matrix.__init__(self, this)
+    __slots__ = ()
+
+    def __init__(self, width = VIEW_WIDTH, height = VIEW_HEIGHT,
+                 scale = VIEW_SCALE):
+        this = (scale,      0,           0,
+                0,          -scale,      0,
+                0,          0,           1,
+                width // 2, height // 2, 0)
+        AffineMatrix.__init__(self, this)
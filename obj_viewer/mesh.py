@@ -0,0 +1,358 @@
+"""Geometry of a model and helpers deriving additional connectivity
+information from its faces.
+"""
+import itertools
+from array import array
+
+from obj_viewer.face import Face
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Mesh(object):
+    """The geometry of a model, kept in compact numeric arrays rather
+    than as individual Python objects.
+
+    Key attributes:
+    coordinates  -- the x-y-z coordinates of all the vertices packed
+                    into a single flat array('d'), so that the vertex i
+                    starts at index 3 * i and the whole model can be
+                    projected in one batch
+    face_indices -- the vertex indices (starting at 0) of all the
+                    faces one after another, as a flat array('i')
+    face_offsets -- the positions in face_indices at which the
+                    individual faces start, followed by the total
+                    number of indices; e.g. offsets [0, 3, 7] and
+                    indices [0, 3, 5, 1, 2, 6, 8] mean that there are 2
+                    faces: one is triangular (with edges between
+                    vertices indexed 0-3, 3-5, 5-0), the latter
+                    consists of four edges connecting 1 and 2, 2 and
+                    6, 6 and 8, 8 and 1
+    faces        -- a read-only view of the faces as a sequence of
+                    Faces (tuples), built from the arrays on access
+    texcoords    -- u-v pairs of the texture coordinates ('vt'), if any
+    normals      -- x-y-z triples of the vertex normals ('vn'), if any
+    edges        -- every edge of the model exactly once, as a flat
+                    array of sorted vertex index pairs, so that edges
+                    shared by two faces are only projected and drawn
+                    once (see unique_edges)
+    triangles    -- the faces split into triangles, as a flat array of
+                    vertex index triples; computed when first needed,
+                    along with triangle_faces, the index of the face
+                    each of the triangles belongs to
+    edge_faces   -- the (up to) two faces sharing each of the edges, as
+                    a flat array of pairs with -1 standing for a missing
+                    face; computed when first needed
+    face_normals -- the unit normals of the faces, as a flat array('d')
+                    of x-y-z triples (zero for degenerate faces);
+                    computed when first needed
+    """
+
+    def __init__(self, coordinates, faces = None, texcoords = None,
+                 normals = None, edges = None, face_offsets = None,
+                 face_indices = None):
+        """Create a mesh with the faces given either as a sequence of
+        Faces or, without any conversion, as face_offsets and
+        face_indices.
+        """
+        self.coordinates = coordinates
+        if face_offsets is None:
+            face_offsets, face_indices = faces_to_csr(faces or [])
+        self.face_offsets = face_offsets
+        self.face_indices = face_indices
+        self.texcoords = texcoords if texcoords is not None else array('d')
+        self.normals = normals if normals is not None else array('d')
+        if edges is None:
+            edges = unique_edges(face_offsets, face_indices,
+                                 self.vertex_count)
+        self.edges = edges
+        self._triangles = None
+        self._triangle_faces = None
+        self._edge_faces = None
+        self._face_normals = None
+
+    @property
+    def vertex_count(self):
+        return len(self.coordinates) // 3
+
+    @property
+    def face_count(self):
+        return len(self.face_offsets) - 1
+
+    @property
+    def faces(self):
+        return FaceView(self.face_offsets, self.face_indices)
+
+    @property
+    def triangles(self):
+        if self._triangles is None:
+            self._triangles, self._triangle_faces = triangulate(
+                self.face_offsets, self.face_indices)
+        return self._triangles
+
+    @property
+    def triangle_faces(self):
+        if self._triangle_faces is None:
+            self._triangles, self._triangle_faces = triangulate(
+                self.face_offsets, self.face_indices)
+        return self._triangle_faces
+
+    @property
+    def edge_faces(self):
+        if self._edge_faces is None:
+            self._edge_faces = edge_faces(self.face_offsets,
+                                          self.face_indices, self.edges,
+                                          self.vertex_count)
+        return self._edge_faces
+
+    @property
+    def face_normals(self):
+        if self._face_normals is None:
+            self._face_normals = face_normals(self.coordinates,
+                                              self.triangles,
+                                              self.triangle_faces,
+                                              self.face_count)
+        return self._face_normals
+
+
+class FaceView(object):
+    """Read-only sequence of the faces stored in CSR arrays (see
+    Mesh.face_offsets); the Faces are only built when accessed.
+    """
+
+    __slots__ = ('offsets', 'indices')
+
+    def __init__(self, offsets, indices):
+        self.offsets = offsets
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('Face index out of range.')
+        return Face(self.indices[self.offsets[i]:self.offsets[i + 1]])
+
+    def __iter__(self):
+        return iter_faces(self.offsets, self.indices)
+
+
+def uniform_size(offsets):
+    """Return the number of vertices of every face if all of them have
+    the same, None otherwise.
+    """
+    count = len(offsets) - 1
+    if count < 1:
+        return None
+    size = offsets[1]
+    if size > 0 and offsets[-1] == count * size:
+        if offsets == array('i', range(0, count * size + 1, size)):
+            return size
+    return None
+
+
+def iter_faces(offsets, indices):
+    """Iterate over the faces stored in CSR arrays as Faces."""
+    size = uniform_size(offsets)
+    if size is not None:
+        return map(Face, zip(*[iter(indices)] * size))
+    return (Face(indices[start:end])
+            for start, end in zip(offsets, itertools.islice(offsets, 1,
+                                                             None)))
+
+
+def unique_edges(offsets, indices, vertex_count):
+    """Return every edge of the faces (given as CSR arrays, see
+    Mesh.face_offsets) exactly once.
+
+    An edge shared by two faces (which is the case for every interior
+    edge of a closed mesh) only appears in the result once. The edges
+    are returned as a flat array of sorted vertex index pairs, ordered
+    by the first and then by the second index; e.g. array('i', [0, 1,
+    0, 3, 1, 3]) describes the edges 0-1, 0-3 and 1-3.
+    """
+    if numpy is not None:
+        return _unique_edges_numpy(offsets, indices, vertex_count)
+    # Encoding the pair as a single integer keeps the set small and
+    # cheap to hash compared to tuples.
+    keys = set()
+    add = keys.add
+    for face in iter_faces(offsets, indices):
+        previous = face[-1]
+        for v in face:
+            if previous < v:
+                add(previous * vertex_count + v)
+            elif v < previous:
+                add(v * vertex_count + previous)
+            previous = v
+    edges = array('i')
+    for key in sorted(keys):
+        edges.extend(divmod(key, vertex_count))
+    return edges
+
+
+def _unique_edges_numpy(offsets, indices, vertex_count):
+    if not indices:
+        return array('i')
+    starts = numpy.frombuffer(offsets, dtype = numpy.intc)
+    corners = numpy.frombuffer(indices, dtype = numpy.intc)
+    # The position of the next corner of the same face; the last
+    # corner of a face is followed by its first one.
+    following = numpy.arange(1, len(corners) + 1)
+    nonempty = starts[1:] > starts[:-1]
+    following[starts[1:][nonempty] - 1] = starts[:-1][nonempty]
+    low = numpy.minimum(corners, corners[following])
+    high = numpy.maximum(corners, corners[following])
+    kept = low != high
+    keys = numpy.unique(low[kept].astype(numpy.int64) * vertex_count +
+                        high[kept])
+    edges = array('i')
+    edges.frombytes(numpy.column_stack((keys // vertex_count,
+                                        keys % vertex_count))
+                    .astype(numpy.intc).tobytes())
+    return edges
+
+
+def triangulate(offsets, indices):
+    """Split the faces (given as CSR arrays) into triangles fanning out
+    from their first vertex. Return them as a flat array of vertex
+    index triples along with an array of the indices of the faces they
+    come from. Faces of fewer than three vertices are left out.
+    """
+    count = len(offsets) - 1
+    if uniform_size(offsets) == 3:
+        # The faces are the triangles; share the array.
+        return indices, array('i', range(count))
+    if numpy is not None:
+        return _triangulate_numpy(offsets, indices)
+    triangles = array('i')
+    owners = array('i')
+    for number in range(count):
+        start = offsets[number]
+        first = indices[start]
+        for i in range(start + 1, offsets[number + 1] - 1):
+            triangles.extend((first, indices[i], indices[i + 1]))
+            owners.append(number)
+    return triangles, owners
+
+
+def _triangulate_numpy(offsets, indices):
+    starts = numpy.frombuffer(offsets, dtype = numpy.intc)
+    corners = numpy.frombuffer(indices, dtype = numpy.intc)
+    counts = numpy.maximum(numpy.diff(starts) - 2, 0)
+    owners = numpy.repeat(numpy.arange(len(counts), dtype = numpy.intc),
+                          counts)
+    first = starts[:-1][owners]
+    # The number of every triangle within its face.
+    steps = (numpy.arange(len(owners)) -
+             numpy.repeat(numpy.cumsum(counts) - counts, counts))
+    triangles = numpy.column_stack((corners[first],
+                                    corners[first + steps + 1],
+                                    corners[first + steps + 2]))
+    result = array('i')
+    result.frombytes(triangles.astype(numpy.intc).tobytes())
+    owner_array = array('i')
+    owner_array.frombytes(owners.tobytes())
+    return result, owner_array
+
+
+def edge_faces(offsets, indices, edges, vertex_count):
+    """Return the faces adjacent to each of the edges (as returned by
+    unique_edges) as a flat array of face index pairs, -1 meaning
+    there's no such face. Only the first two faces of edges shared by
+    more of them are recorded.
+    """
+    positions = dict((edges[e] * vertex_count + edges[e + 1], e)
+                     for e in range(0, len(edges), 2))
+    adjacent = array('i', [-1]) * len(edges)
+    for number, face in enumerate(iter_faces(offsets, indices)):
+        previous = face[-1]
+        for v in face:
+            if previous != v:
+                if previous < v:
+                    slot = positions[previous * vertex_count + v]
+                else:
+                    slot = positions[v * vertex_count + previous]
+                if adjacent[slot] == -1:
+                    adjacent[slot] = number
+                elif adjacent[slot + 1] == -1 and adjacent[slot] != number:
+                    adjacent[slot + 1] = number
+            previous = v
+    return adjacent
+
+
+def face_normals(coordinates, triangles, triangle_faces, face_count):
+    """Return the unit normals of the faces, given the triangles they
+    are split into (see triangulate), as a flat array('d'). The normals
+    of the triangles of a face are added up weighted by their areas,
+    which also copes with faces that are not quite planar.
+    """
+    if numpy is not None:
+        return _face_normals_numpy(coordinates, triangles, triangle_faces,
+                                   face_count)
+    sums = [0.0] * (3 * face_count)
+    for t in range(0, len(triangles), 3):
+        a, b, c = [3 * v for v in triangles[t:t + 3]]
+        ux = coordinates[b] - coordinates[a]
+        uy = coordinates[b + 1] - coordinates[a + 1]
+        uz = coordinates[b + 2] - coordinates[a + 2]
+        vx = coordinates[c] - coordinates[a]
+        vy = coordinates[c + 1] - coordinates[a + 1]
+        vz = coordinates[c + 2] - coordinates[a + 2]
+        f = 3 * triangle_faces[t // 3]
+        sums[f] += uy * vz - uz * vy
+        sums[f + 1] += uz * vx - ux * vz
+        sums[f + 2] += ux * vy - uy * vx
+    normals = array('d', sums)
+    for f in range(0, len(sums), 3):
+        length = (sums[f] ** 2 + sums[f + 1] ** 2 + sums[f + 2] ** 2) ** 0.5
+        if length:
+            normals[f] /= length
+            normals[f + 1] /= length
+            normals[f + 2] /= length
+    return normals
+
+
+def _face_normals_numpy(coordinates, triangles, triangle_faces,
+                        face_count):
+    points = numpy.frombuffer(coordinates, dtype = float).reshape(-1, 3)
+    corners = numpy.frombuffer(triangles, dtype = numpy.intc).reshape(-1, 3)
+    a = points[corners[:, 0]]
+    crosses = numpy.cross(points[corners[:, 1]] - a,
+                          points[corners[:, 2]] - a)
+    owners = numpy.frombuffer(triangle_faces, dtype = numpy.intc)
+    sums = numpy.column_stack([numpy.bincount(owners,
+                                              weights = crosses[:, i],
+                                              minlength = face_count)
+                               for i in range(3)])
+    lengths = numpy.sqrt((sums * sums).sum(axis = 1))
+    lengths[lengths == 0] = 1
+    normals = array('d')
+    normals.frombytes((sums / lengths[:, None]).tobytes())
+    return normals
+
+
+def faces_to_csr(faces):
+    """Pack a list of faces into two flat arrays: the offsets at which
+    the individual faces start (followed by the total number of
+    indices) and the vertex indices of all the faces one after another.
+    """
+    offsets = array('i', [0])
+    indices = array('i')
+    for face in faces:
+        indices.extend(face)
+        offsets.append(len(indices))
+    return offsets, indices
+
+
+def faces_from_csr(offsets, indices):
+    """Inverse of faces_to_csr."""
+    return list(iter_faces(offsets, indices))
@@ -1,102 +1,369 @@
-import itertools
+import collections
+import sys
 
-from obj_viewer.errors import WrongFileFormatError
-from obj_viewer.matrices import (Matrix, OrthogonalProjection, Point,
-                                 Identity, Rotation)
-from obj_viewer.face import Face
+from obj_viewer.binary import read_mesh, SUFFIX
+from obj_viewer.cache import MeshCache, cache_enabled
+from obj_viewer.constants import (VIEW_WIDTH, VIEW_HEIGHT, VIEW_SCALE,
+                                  BACKFACE_CULLING, FILLED_FACES,
+                                  VIEWPORT_CLIPPING,
+                                  LOD_ENABLED, LOD_TRIANGLE_BUDGET,
+                                  WELD_VERTICES, WELD_TOLERANCE,
+                                  INACTIVE_COLOR, INACTIVE_OPACITY)
+from obj_viewer.lod import build_levels
+from obj_viewer.matrices import OrthogonalProjection
+from obj_viewer.parser import parse_obj
+from obj_viewer.pipeline import (filled, transform_normals, wireframe,
+                                 wireframe_instances)
+from obj_viewer.profiling import profiler
+from obj_viewer.rasterizer import rasterize
+from obj_viewer.transform import TRS
+from obj_viewer.weld import weld_vertices, WELD_REVISION
 
+try:
+    from obj_viewer.scene import FacesItem, WireframeItem, prepare_frame
+except ImportError:
+    # PySide is not available, e.g. when rendering without a display.
+    FacesItem = WireframeItem = prepare_frame = None
 
-class Model():
+
+def load_mesh(filename, use_cache = None, progress = None,
+              workers = None, verbose = True, weld = None):
+    """Load the geometry stored in an .obj file, see obj_viewer.parser
+    for details (and for the meaning of progress and workers), or in
+    a binary .mesh file (see obj_viewer.binary), whose arrays are read
+    in bulk rather than parsed. OBJ files that have been loaded before
+    are read back from the cache, if enabled. If weld is true (by
+    default if WELD_VERTICES is), duplicated and unused vertices are
+    removed (see obj_viewer.weld). Unless verbose is false, the size of
+    the mesh is printed.
+
+    If any error occurs (IOError while opening the file, wrong
+    file format), propagate it so that it can be taken care of in
+    the right context.
+    """
+    if use_cache is None:
+        use_cache = cache_enabled()
+    if weld is None:
+        weld = WELD_VERTICES
+    binary = filename.lower().endswith(SUFFIX)
+    cache = MeshCache() if use_cache and not binary else None
+    variant = ('weld %d %r' % (WELD_REVISION, WELD_TOLERANCE) if weld
+               else '')
+    mesh = None
+    # The number of vertices before welding, if it's been done now.
+    original = None
+    try:
+        if cache is not None:
+            with profiler.stage('cache-read'):
+                mesh = cache.load(filename, variant)
+        if mesh is None:
+            with profiler.stage('load'):
+                if binary:
+                    mesh = read_mesh(filename)
+                else:
+                    mesh = parse_obj(filename, workers, progress)
+            if weld:
+                original = mesh.vertex_count
+                with profiler.stage('weld'):
+                    mesh = weld_vertices(mesh)
+            if cache is not None:
+                with profiler.stage('cache-write'):
+                    cache.store(filename, mesh, variant)
+    except IOError:
+        sys.stderr.write('There was a problem opening the input file.')
+        raise
+    if verbose:
+        if original is not None:
+            print('A total of %d vertices (%d before welding) and %d faces '
+                  'has been loaded.' % (mesh.vertex_count, original,
+                                        mesh.face_count))
+        else:
+            print('A total of %d vertices and %d faces has been loaded.'
+                  % (mesh.vertex_count, mesh.face_count))
+    return mesh
+
+
+class Model(object):
     """Main class handling object creation and manipulation.
 
     Key attributes:
     canvas      -- the scene the model is painted on
-    vertices    -- model's vertices are recorded in this list as
-                   instances of the Point class; their order is
-                   significant (see below)
-    faces       -- a list containing Faces (tuples) of vertex indices
-                   (starting at 0) joined by edges, e.g. [[0, 3, 5],
-                   [1, 2, 6, 8]] means that there are 2 faces: one
-                   is triangular (with edges between vertices indexed
-                   0-3, 3-5, 5-0), the latter consists of four edges
-                   connecting 1 and 2, 2 and 6, 6 and 8, 8 and 1
-    current_mod -- a single matrix reflecting all transformations that
-                   have been applied to the model since it was first
-                   displayed; initialized to identity at the beginning
+    item        -- the scene item painting the edges of the model;
+                   created once the model is loaded and only updated
+                   afterwards
+    faces_item  -- the same for the faces, in the filled mode
+    mesh        -- the geometry of the model (vertex coordinates,
+                   faces and edges), see the Mesh class; never
+                   modified, so several models may share it (see
+                   obj_viewer.registry)
+    levels      -- simplified versions of the mesh, from the coarsest
+                   to the finest, drawn instead of the full mesh while
+                   the model is being transformed interactively
+    triangle_budget -- the largest number of triangles an interactive
+                   frame may draw (see levels)
+    placement   -- all the transformations that have been applied to
+                   the model since it was first displayed, composed
+                   into a single TRS (see obj_viewer.transform);
+                   initialized to identity at the beginning
+    current_mod -- the same as a matrix, computed when asked for
+    use_cache   -- whether the parsed mesh is stored in and looked up
+                   from the on-disk cache (see obj_viewer.cache);
+                   enabled unless turned off in the configuration
+    culling     -- whether edges of faces turned away from the viewer
+                   are left out
+    filled      -- whether the faces are painted as shaded polygons
+                   (see pipeline.filled) rather than the edges
+    face_orders -- the back-to-front order of the faces of the mesh and
+                   its levels in the last filled frame of each, which
+                   the next one starts sorting from
+    normal_cache -- the current normals of the faces of the mesh and its
+                   levels (see pipeline.transform_normals), along with
+                   the rotation they have been computed for; since
+                   translations and scalings leave the rotation as it
+                   is, only rotations make them be computed again
+    viewport    -- the visible (x, y, width, height) rectangle edges
+                   are clipped to, or None to disable clipping
+    picker      -- finds what is under a point of the screen (see
+                   obj_viewer.picking); built on demand, as it takes
+                   a while for big meshes
     """
 
-    def __init__(self, canvas, filename):
+    def __init__(self, canvas, filename = None, use_cache = None,
+                 mesh = None, levels = None):
+        """Create a model either by loading it from a file or from an
+        already loaded mesh (and its levels of detail, which are built
+        unless given).
+        """
         self.canvas = canvas
         self.view_matrix = OrthogonalProjection()
-        self.vertices = []
-        self.faces = []
-        self.current_mod = Identity()
-        self.load_from_file(filename)
+        self.mesh = None
+        self.levels = []
+        self.triangle_budget = LOD_TRIANGLE_BUDGET
+        if use_cache is None:
+            use_cache = cache_enabled()
+        self.use_cache = use_cache
+        self.placement = TRS()
+        self.culling = BACKFACE_CULLING
+        self.filled = FILLED_FACES
+        self.face_orders = {}
+        self.normal_cache = {}
+        self.viewport = ((0, 0, VIEW_WIDTH, VIEW_HEIGHT)
+                         if VIEWPORT_CLIPPING else None)
+        self.item = None
+        self.faces_item = None
+        self.picker = None
+        if mesh is None:
+            self.load_from_file(filename)
+        else:
+            self.mesh = mesh
+            self.levels = levels
+            if levels is None:
+                self.levels = (build_levels(mesh, self.triangle_budget)
+                               if LOD_ENABLED else [])
+        if WireframeItem is not None and canvas is not None:
+            self.item = WireframeItem()
+            canvas.addItem(self.item)
+            self.faces_item = FacesItem()
+            canvas.addItem(self.faces_item)
 
     def __str__(self):
         pass
 
+    @property
+    def current_mod(self):
+        return self.placement.matrix()
+
+    @current_mod.setter
+    def current_mod(self, matrix):
+        self.placement = TRS.from_matrix(matrix)
+
     def load_from_file(self, filename):
-        """Load the object from an .obj file. Only examine vertices
-        ('v') and faces ('f'). Reindex the vertices in faces so that
-        they start at 0, not at 1.
+        """Load the object from an .obj file, see load_mesh."""
+        self.mesh = load_mesh(filename, self.use_cache)
+        if LOD_ENABLED:
+            self.levels = build_levels(self.mesh, self.triangle_budget)
 
-        If any error occurs (IOError while opening the file, wrong
-        file format), propagate it so that it can be taken care of in
-        the right context.
+    def transform(self, transformation, interactive = False,
+                  render = True):
+        """Apply the transformation to the model and render it (unless
+        the caller renders it itself, e.g. through frame). Unless told
+        otherwise, the caller is expected to render the model in full
+        detail once it stops transforming it interactively.
         """
+        with profiler.stage('compose'):
+            self.placement = self.placement.then(transformation)
+        if render:
+            self.render(interactive)
+
+    def reset(self, render = True):
+        self.placement = TRS()
+        if render:
+            self.render()
+
+    def remove(self):
+        """Take the model off its canvas."""
+        if self.item is not None:
+            self.canvas.removeItem(self.item)
+            self.canvas.removeItem(self.faces_item)
+            self.item = self.faces_item = None
+
+    def set_active(self, active):
+        """Paint the model as the one being transformed or, when there
+        are several of them, as one of the others, which are dimmed.
+        """
+        if self.item is not None:
+            self.item.set_color((0, 0, 0) if active else INACTIVE_COLOR)
+            self.faces_item.setOpacity(1.0 if active else INACTIVE_OPACITY)
+
+    def pick(self, x, y):
+        """Return what is under the screen point (x, y) as a Pick, or
+        None if there's nothing (or no picker yet).
+        """
+        if self.picker is None:
+            return None
+        return self.picker.pick(self.current_mod * self.view_matrix, x, y)
+
+    def screen_point(self, vertex):
+        """Return the x-y screen coordinates of the vertex."""
+        coordinates = self.mesh.coordinates[3 * vertex:3 * vertex + 3]
+        matrix = self.current_mod * self.view_matrix
+        return matrix.transform_point(*coordinates)[:2]
 
-        try:
-            source = open(filename)
-        except IOError:
-            sys.stderr.write('There was a problem opening the input file.')
-            raise
-        for line in source:
-            # Load all the vertices:
-            if line.startswith('v'):
-                try:
-                    self.vertices.append(Point(*[float(coordinate) for
-                                                 coordinate in
-                                                 line[2:].rstrip('\n').split()]))
-                except TypeError:
-                    raise WrongFileFormatError('Invalid input file - '
-                                               'unexpected file '
-                                               'format.')
-            # Load the faces:
-            elif line.startswith('f'):
-                try:
-                    self.faces.append(Face([int(vertex) - 1 for
-                                            vertex in
-                                            line[2:].rstrip('\n').split()]))
-                except IndexError:
-                    raise WrongFileFormatError('Invalid input file - '
-                                               'face defined before '
-                                               'all of its vertices.')
-                except TypeError:
-                    raise WrongFileFormatError('Invalid input file - '
-                                               'unexpected file '
-                                               'format.')
-
-        print('A total of %d vertices and %d faces has been loaded.'
-              % (len(self.vertices), len(self.faces)))
-
-    def transform(self, transformation):
-        self.current_mod *= transformation
-        self.render()
-
-    def reset(self):
-        self.current_mod = Identity()
-        self.render()
-
-    def render(self):
+    def detail_for_budget(self):
+        """Return the most detailed version of the mesh that fits in
+        the triangle budget (or the coarsest one if none does).
+        """
+        budget = self.triangle_budget
+        if not self.levels or len(self.mesh.triangles) // 3 <= budget:
+            return self.mesh
+        chosen = self.levels[0]
+        for level in self.levels[1:]:
+            if len(level.triangles) // 3 <= budget:
+                chosen = level
+        return chosen
+
+    def frame(self, interactive = False):
+        """Return a function computing the model as it is transformed
+        now, as a (kind, data) pair: either 'lines' and a flat list of
+        the x1, y1, x2, y2 of its segments (see pipeline.wireframe) or,
+        in the filled mode, 'faces' and the coordinates, sizes and
+        shades of its faces (see pipeline.filled). It only holds on to
+        a snapshot of the state of the model, so it may be called on
+        another thread while the model goes on being transformed.
+
+        Interactive frames may use a simplified version of the mesh to
+        keep within the triangle budget.
+        """
+        mesh = self.detail_for_budget() if interactive else self.mesh
+        transformation = self.current_mod
+        view_matrix = self.view_matrix
+        culling = self.culling
+        if self.filled:
+            orders = self.face_orders
+            cache = self.normal_cache
+            rotation = self.placement.rotation
+
+            def job():
+                cached = cache.get(mesh)
+                if cached is not None and cached[0] == rotation:
+                    normals = cached[1]
+                else:
+                    with profiler.stage('normals'):
+                        normals = transform_normals(mesh.face_normals,
+                                                    transformation)
+                    cache[mesh] = (rotation, normals)
+                with profiler.stage('project'):
+                    coordinates, sizes, shades, order = filled(
+                        mesh, transformation, view_matrix, culling,
+                        orders.get(mesh), normals)
+                # Frames are computed one at a time, so the order is
+                # never updated by two of them at once.
+                orders[mesh] = order
+                return 'faces', (coordinates, sizes, shades)
+            return job
+        matrix = transformation * view_matrix
+        viewport = self.viewport
+
+        def job():
+            with profiler.stage('project'):
+                return 'lines', wireframe(mesh, matrix, culling, viewport)
+        return job
+
+    def present(self, geometry):
+        """Swap in a frame prepared by scene.prepare_frame."""
+        if self.item is None:
+            return
+        kind, prepared = geometry
+        with profiler.stage('swap'):
+            if kind == 'faces':
+                self.faces_item.set_geometry(*prepared)
+                self.item.set_lines([])
+            else:
+                self.item.set_geometry(*prepared)
+                self.faces_item.clear()
+
+    def render(self, interactive = False):
+        """Paint the model right away, see frame."""
+        frame = self.frame(interactive)()
+        if self.item is not None:
+            self.present(prepare_frame(frame))
+            return
         self.canvas.clear()
-        for face in self.faces:
-            circle = itertools.cycle(face)
-            v = next(circle)
-            for i in range(len(face)):
-                x1, y1, z1 = self.vertices[v].get_view_coordinates(self.current_mod,
-                                                                   self.view_matrix)
-                v = next(circle)
-                x2, y2, z2 = self.vertices[v].get_view_coordinates(self.current_mod,
-                                                                   self.view_matrix)
-                self.canvas.addLine(x1, y1, x2, y2)
+        kind, data = frame
+        if kind == 'faces':
+            # Only the outlines of the faces without a scene item.
+            coordinates, sizes, _ = data
+            start = 0
+            for size in sizes:
+                corners = coordinates[start:start + 2 * size]
+                start += 2 * size
+                for i in range(0, len(corners), 2):
+                    self.canvas.addLine(*(corners[i:i + 2] +
+                                          corners[i - 2:i or None]))
+        else:
+            for i in range(0, len(data), 4):
+                self.canvas.addLine(*data[i:i + 4])
+
+    def rasterize(self, width = VIEW_WIDTH, height = VIEW_HEIGHT):
+        """Render a flat-shaded image of the model as it is currently
+        transformed and return it as a FrameBuffer (see
+        obj_viewer.rasterizer); the view is scaled to fit the size.
+        """
+        scale = VIEW_SCALE * min(float(width) / VIEW_WIDTH,
+                                 float(height) / VIEW_HEIGHT)
+        with profiler.stage('rasterize'):
+            return rasterize(self.mesh, self.current_mod,
+                             OrthogonalProjection(width, height, scale),
+                             width, height)
+
+
+def frames(models, interactive = False):
+    """Return a function computing the frames of all the models (see
+    Model.frame) as a list in the same order. The edges of models that
+    are instances of the same mesh (see obj_viewer.registry) are
+    projected together by pipeline.wireframe_instances; filled models
+    are computed one by one.
+    """
+    singles = []
+    groups = collections.OrderedDict()
+    for position, model in enumerate(models):
+        if model.filled:
+            singles.append((position, model.frame(interactive)))
+            continue
+        mesh = model.detail_for_budget() if interactive else model.mesh
+        groups.setdefault((mesh, model.culling, model.viewport), []).append(
+            (position, model.current_mod * model.view_matrix))
+
+    def job():
+        results = [None] * len(models)
+        for position, single in singles:
+            results[position] = single()
+        for (mesh, culling, viewport), members in groups.items():
+            with profiler.stage('project'):
+                parts = wireframe_instances(
+                    mesh, [matrix for _, matrix in members], culling,
+                    viewport)
+            for (position, _), lines in zip(members, parts):
+                results[position] = ('lines', lines)
+        return results
+    return job
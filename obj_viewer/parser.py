@@ -0,0 +1,392 @@
+"""Loader of Wavefront OBJ files.
+
+The file is read in large binary blocks, split into lines and the
+numbers are converted straight into compact arrays. Consecutive lines
+of the same kind are even converted in batches, since a single float()
+or int() over a long list of tokens is much cheaper than handling each
+line on its own; faces are batched whatever their numbers of corners.
+
+Only vertices ('v'), texture coordinates ('vt'), vertex normals ('vn')
+and faces ('f') are examined. Face corners may be given in any of the
+forms 'v', 'v/vt', 'v/vt/vn' or 'v//vn', and indices may be negative
+(relative to the last vertex defined so far); only the vertex index of
+each corner is kept. Comments may follow the corners of a face.
+
+Files larger than PARALLEL_PARSE_THRESHOLD are split into ranges of
+whole lines which are parsed by a pool of processes and stitched back
+together afterwards.
+"""
+import itertools
+import multiprocessing
+import os
+from array import array
+
+from obj_viewer.constants import (PARSE_BLOCK_SIZE, PARSE_WORKERS,
+                                  PARALLEL_PARSE_THRESHOLD, PREVIEW_FACES)
+from obj_viewer.errors import WrongFileFormatError
+from obj_viewer.mesh import Mesh
+from obj_viewer.profiling import profiler
+
+
+def parse_obj(filename, workers = None, progress = None):
+    """Load the geometry stored in an OBJ file and return it as a
+    Mesh, with the vertex indices in faces starting at 0.
+
+    Large files are parsed by the given number of processes (all the
+    available cores by default); small ones, or any file if workers is
+    1, are parsed in this process.
+
+    If given, progress(done, total, preview) is called after every
+    parsed block of the file: done and total are byte counts and
+    preview a function returning a Mesh made of a sample of the faces
+    parsed so far. Any exception raised by progress (such as
+    LoadCancelledError) aborts the parsing.
+
+    IOError is propagated; WrongFileFormatError is raised if the file
+    doesn't look like a valid OBJ.
+    """
+    size = os.path.getsize(filename)
+    if workers is None:
+        workers = PARSE_WORKERS or multiprocessing.cpu_count()
+    if workers > 1 and size >= PARALLEL_PARSE_THRESHOLD:
+        return _parse_parallel(filename, size, workers, progress)
+    parser = _Parser()
+    report = None
+    if progress is not None:
+        preview = lambda: _preview(parser.coordinates, parser.offsets,
+                                   parser.indices)
+        report = lambda done: progress(done, size, preview)
+    _parse_range(filename, 0, size, parser, report)
+    return parser.mesh()
+
+
+def _preview(coordinates, offsets, indices):
+    """Return a Mesh of (at most PREVIEW_FACES) faces sampled evenly
+    from the given ones (as CSR arrays, see Mesh.face_offsets), leaving
+    out any which refer to vertices that haven't been parsed yet.
+    """
+    count = len(coordinates) // 3
+    step = max(1, -(-(len(offsets) - 1) // PREVIEW_FACES))
+    sample = []
+    for number in range(0, len(offsets) - 1, step):
+        face = indices[offsets[number]:offsets[number + 1]]
+        if max(face) < count:
+            sample.append(face)
+    return Mesh(array('d', coordinates), sample)
+
+
+def _parse_range(filename, start, end, parser, report = None):
+    """Feed the lines between the given byte offsets to the parser,
+    calling report with the number of bytes done after every block.
+    """
+    with open(filename, 'rb') as source:
+        source.seek(start)
+        remaining = end - start
+        remainder = b''
+        while remaining > 0:
+            with profiler.stage('read'):
+                block = source.read(min(PARSE_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            with profiler.stage('parse'):
+                lines = (remainder + block).split(b'\n')
+                remainder = lines.pop()
+                parser.feed(lines)
+            if report is not None:
+                report(end - start - remaining)
+        parser.feed([remainder])
+
+
+def _line_boundaries(filename, size, count):
+    """Split the file into (at most) count ranges of whole lines of
+    roughly the same size.
+    """
+    boundaries = [0]
+    with open(filename, 'rb') as source:
+        for i in range(1, count):
+            position = max(size * i // count, boundaries[-1])
+            source.seek(position)
+            source.readline()
+            position = source.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+    return boundaries
+
+
+def _parse_chunk(job):
+    """Parse a range of lines in a worker process.
+
+    Negative indices can point into the preceding ranges, so they are
+    resolved against the vertices of this range only and reported
+    separately, to be shifted once the number of the preceding
+    vertices is known.
+    """
+    filename, start, end = job
+    parser = _Parser(standalone = False)
+    _parse_range(filename, start, end, parser)
+    return (parser.coordinates, parser.texcoords, parser.normals,
+            parser.offsets, parser.indices, parser.largest_index,
+            parser.relative)
+
+
+def _parse_parallel(filename, size, workers, progress = None):
+    boundaries = _line_boundaries(filename, size, 4 * workers)
+    jobs = [(filename, start, end) for start, end
+            in zip(boundaries, boundaries[1:])]
+    coordinates = array('d')
+    texcoords = array('d')
+    normals = array('d')
+    offsets = array('i', [0])
+    indices = array('i')
+    largest_index = -1
+    pool = multiprocessing.Pool(workers)
+    try:
+        for job, result in zip(jobs, pool.imap(_parse_chunk, jobs)):
+            (chunk_coordinates, chunk_texcoords, chunk_normals,
+             chunk_offsets, chunk_indices, chunk_largest,
+             relative) = result
+            base = len(coordinates) // 3
+            for position in relative:
+                chunk_indices[position] += base
+                if chunk_indices[position] < 0:
+                    raise WrongFileFormatError('Invalid input file - face '
+                                               'refers to a nonexistent '
+                                               'vertex.')
+            shift = len(indices)
+            offsets.extend([offset + shift for offset
+                            in itertools.islice(chunk_offsets, 1, None)])
+            coordinates.extend(chunk_coordinates)
+            texcoords.extend(chunk_texcoords)
+            normals.extend(chunk_normals)
+            indices.extend(chunk_indices)
+            largest_index = max(largest_index, chunk_largest)
+            if progress is not None:
+                progress(job[2], size,
+                         lambda: _preview(coordinates, offsets, indices))
+    finally:
+        pool.terminate()
+    if largest_index >= len(coordinates) // 3:
+        raise WrongFileFormatError('Invalid input file - face defined '
+                                   'before all of its vertices.')
+    return Mesh(coordinates, texcoords = texcoords, normals = normals,
+                face_offsets = offsets, face_indices = indices)
+
+
+class _Parser(object):
+    """Accumulates the contents of an OBJ file fed to it line by line
+    (or rather, list of lines by list of lines).
+
+    The faces are collected straight into CSR arrays, offsets and
+    indices (see Mesh.face_offsets).
+
+    A parser which is not standalone only sees a part of the file; see
+    _parse_chunk for how it treats negative indices: the positions in
+    indices of the ones it has resolved are kept in relative.
+    """
+
+    def __init__(self, standalone = True):
+        self.coordinates = array('d')
+        self.texcoords = array('d')
+        self.normals = array('d')
+        self.offsets = array('i', [0])
+        self.indices = array('i')
+        self.largest_index = -1
+        self.standalone = standalone
+        self.relative = []
+
+    def mesh(self):
+        if self.largest_index >= len(self.coordinates) // 3:
+            raise WrongFileFormatError('Invalid input file - face '
+                                       'defined before all of its '
+                                       'vertices.')
+        return Mesh(self.coordinates, texcoords = self.texcoords,
+                    normals = self.normals, face_offsets = self.offsets,
+                    face_indices = self.indices)
+
+    def feed(self, lines):
+        # Consecutive lines of the same kind are only collected here and
+        # converted in one go once a line of another kind comes up.
+        converters = {b'v ': self.add_vertices, b'f ': self.add_faces,
+                      b'vt': self.add_texcoords, b'vn': self.add_normals}
+        run = []
+        kind = None
+        try:
+            for line in lines:
+                keyword = line[:2]
+                if keyword != b'v ' and keyword != b'f ':
+                    line = line.lstrip()
+                    keyword = line[:2].replace(b'\t', b' ')
+                    if keyword not in converters:
+                        continue
+                if keyword != kind:
+                    if run:
+                        converters[kind](run)
+                    run = []
+                    kind = keyword
+                run.append(line)
+            if run:
+                converters[kind](run)
+        except ValueError:
+            raise WrongFileFormatError('Invalid input file - '
+                                       'unexpected file format.')
+
+    def add_vertices(self, lines):
+        if not lines:
+            return
+        tokens = b' '.join(lines).split()
+        if (len(tokens) == 4 * len(lines) and
+                tokens[0::4].count(b'v') == len(lines)):
+            del tokens[0::4]
+            self.coordinates.extend(map(float, tokens))
+            return
+        # Some of the vertices carry an optional w coordinate or
+        # a colour; only keep x, y and z.
+        for line in lines:
+            coordinates = line.split()[1:4]
+            if len(coordinates) != 3:
+                raise ValueError('A vertex needs three coordinates.')
+            self.coordinates.extend(map(float, coordinates))
+
+    def add_faces(self, lines):
+        """Add faces given by a run of consecutive face lines, i.e. no
+        vertices are defined in between them.
+
+        The faces are converted in bulk; only those with relative
+        indices are resolved one by one.
+        """
+        if not lines:
+            return
+        joined = b' '.join(lines)
+        if b'#' in joined:
+            lines = [line.partition(b'#')[0] for line in lines]
+            joined = b' '.join(lines)
+        if b'-' in joined:
+            vertex_count = len(self.coordinates) // 3
+            start = 0
+            for number, line in enumerate(lines):
+                if b'-' in line:
+                    self.add_absolute_faces(lines[start:number])
+                    self.add_face(line, vertex_count)
+                    start = number + 1
+            self.add_absolute_faces(lines[start:])
+        else:
+            self.add_absolute_faces(lines, joined)
+
+    def add_absolute_faces(self, lines, joined = None):
+        """Add faces none of which has relative indices, converting the
+        indices of all of them at once whatever their numbers of
+        corners.
+        """
+        if not lines:
+            return
+        if joined is None:
+            joined = b' '.join(lines)
+        tokens = joined.split()
+        count = len(lines)
+        size = len(tokens) // count
+        if (len(tokens) == size * count and
+                tokens[0::size].count(b'f') == count):
+            # All the faces have the same number of corners.
+            del tokens[0::size]
+            sizes = None
+            smallest = size - 1
+        else:
+            sizes = [len(words) - 1 for words in map(bytes.split, lines)]
+            smallest = min(sizes)
+            # Drop the keywords; any other 'f' would be a malformed index.
+            tokens = [token for token in tokens if token != b'f']
+            if len(tokens) != sum(sizes):
+                raise ValueError('Malformed face.')
+        if smallest < 1:
+            raise ValueError('A face needs at least one vertex.')
+        if b'/' in joined:
+            tokens = [token.partition(b'/')[0] for token in tokens]
+        indices = list(map(int, tokens))
+        if min(indices) < 1:
+            raise WrongFileFormatError('Invalid input file - face refers '
+                                       'to a nonexistent vertex.')
+        largest = max(indices) - 1
+        if largest > self.largest_index:
+            self.largest_index = largest
+        end = len(self.indices)
+        self.indices.extend([index - 1 for index in indices])
+        if sizes is None:
+            self.offsets.extend(range(end + size - 1, len(self.indices) + 1,
+                                      size - 1))
+            return
+        offsets = []
+        for size in sizes:
+            end += size
+            offsets.append(end)
+        self.offsets.extend(offsets)
+
+    def add_texcoords(self, lines):
+        tokens = b' '.join(lines).split()
+        if (len(tokens) == 3 * len(lines) and
+                tokens[0::3].count(b'vt') == len(lines)):
+            del tokens[0::3]
+            self.texcoords.extend(map(float, tokens))
+            return
+        for line in lines:
+            self.add_texcoord(line)
+
+    def add_normals(self, lines):
+        tokens = b' '.join(lines).split()
+        if (len(tokens) == 4 * len(lines) and
+                tokens[0::4].count(b'vn') == len(lines)):
+            del tokens[0::4]
+            self.normals.extend(map(float, tokens))
+            return
+        for line in lines:
+            self.add_normal(line)
+
+    def add_texcoord(self, line):
+        tokens = line.split()
+        if tokens[0] != b'vt' or len(tokens) < 2:
+            raise ValueError('Malformed texture coordinates.')
+        self.texcoords.append(float(tokens[1]))
+        self.texcoords.append(float(tokens[2]) if len(tokens) > 2 else 0.0)
+
+    def add_normal(self, line):
+        tokens = line.split()
+        if tokens[0] != b'vn' or len(tokens) < 4:
+            raise ValueError('Malformed vertex normal.')
+        self.normals.extend(map(float, tokens[1:4]))
+
+    def add_face(self, line, vertex_count):
+        tokens = line.split()
+        del tokens[0]
+        if not tokens:
+            raise ValueError('A face needs at least one vertex.')
+        if b'/' in line:
+            indices = [int(token.split(b'/', 1)[0]) for token in tokens]
+        else:
+            indices = [int(token) for token in tokens]
+        if min(indices) > 0:
+            face = [index - 1 for index in indices]
+        else:
+            face = [index - 1 if index > 0 else vertex_count + index
+                    for index in indices]
+            if 0 in indices or (self.standalone and min(face) < 0):
+                raise WrongFileFormatError('Invalid input file - face '
+                                           'refers to a nonexistent '
+                                           'vertex.')
+            if not self.standalone:
+                start = len(self.indices)
+                self.relative.extend(start + i for i, index
+                                     in enumerate(indices) if index < 0)
+        if self.standalone or min(indices) > 0:
+            largest = max(face)
+        else:
+            # Only the absolute indices can point past the vertices.
+            largest = max([index - 1 for index in indices if index > 0]
+                          or [-1])
+        if largest > self.largest_index:
+            self.largest_index = largest
+        self.indices.extend(face)
+        self.offsets.append(len(self.indices))
+
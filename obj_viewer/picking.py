@@ -0,0 +1,329 @@
+"""Finding the face and the vertex of a model under the cursor.
+
+The triangles of the mesh are organized into a bounding volume
+hierarchy (BVH) in model space, where they never move, so the tree is
+built once per mesh and never needs to be updated: the point under the
+cursor is turned into a line in model space by the inverse of the
+current transformation instead. A query only examines the few nodes
+the line passes through, so it takes time logarithmic rather than
+linear in the number of faces.
+"""
+import math
+
+from obj_viewer.constants import PICK_LEAF_SIZE, PICK_RADIUS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Pick(object):
+    """What has been found under the cursor.
+
+    face   -- index of the face hit, or None if there's none
+    vertex -- index of the vertex closest to the cursor (a corner of
+              the face hit, or a vertex within the pick radius if no
+              face has been hit), or None
+    point  -- the x-y-z coordinates of the hit in model space, or None
+    """
+
+    def __init__(self, face = None, vertex = None, point = None):
+        self.face = face
+        self.vertex = vertex
+        self.point = point
+
+
+class BVH(object):
+    """Bounding volume hierarchy over the triangles of a mesh.
+
+    Nodes are stored in flat lists indexed by node number, the root
+    being 0: lows and highs hold the corners of their bounding boxes,
+    left the number of the first child (the second one follows right
+    after it) or -1 for leaves, whose triangles are order[start:end].
+    """
+
+    def __init__(self, coordinates, triangles, leaf_size = PICK_LEAF_SIZE):
+        self.coordinates = coordinates
+        self.triangles = triangles
+        self.lows = []
+        self.highs = []
+        self.left = []
+        self.start = []
+        self.end = []
+        if numpy is not None:
+            self._build_numpy(leaf_size)
+        else:
+            self._build(leaf_size)
+
+    def _add(self, low, high, start, end):
+        self.lows.append(tuple(low))
+        self.highs.append(tuple(high))
+        self.left.append(-1)
+        self.start.append(start)
+        self.end.append(end)
+        return len(self.lows) - 1
+
+    def _build(self, leaf_size):
+        coordinates = self.coordinates
+        triangles = self.triangles
+        count = len(triangles) // 3
+        low = []
+        high = []
+        centre = []
+        for t in range(count):
+            corners = [coordinates[3 * v:3 * v + 3]
+                       for v in triangles[3 * t:3 * t + 3]]
+            low.append(tuple(map(min, zip(*corners))))
+            high.append(tuple(map(max, zip(*corners))))
+            centre.append(tuple((a + b) / 2 for a, b in zip(low[-1],
+                                                            high[-1])))
+        self.order = order = list(range(count))
+
+        def bounds(start, end):
+            members = order[start:end]
+            return ([min(low[t][i] for t in members) for i in range(3)],
+                    [max(high[t][i] for t in members) for i in range(3)])
+
+        if not count:
+            return
+        stack = [self._add(*bounds(0, count) + (0, count))]
+        while stack:
+            node = stack.pop()
+            start, end = self.start[node], self.end[node]
+            if end - start <= leaf_size:
+                continue
+            members = order[start:end]
+            spans = [max(centre[t][i] for t in members) -
+                     min(centre[t][i] for t in members) for i in range(3)]
+            axis = spans.index(max(spans))
+            members.sort(key = lambda t: centre[t][axis])
+            order[start:end] = members
+            middle = (start + end) // 2
+            self.left[node] = len(self.lows)
+            stack.append(self._add(*bounds(start, middle) + (start, middle)))
+            stack.append(self._add(*bounds(middle, end) + (middle, end)))
+
+    def _build_numpy(self, leaf_size):
+        points = numpy.frombuffer(self.coordinates,
+                                  dtype = float).reshape(-1, 3)
+        corners = points[numpy.frombuffer(self.triangles,
+                                          dtype = numpy.intc).reshape(-1, 3)]
+        low = corners.min(axis = 1)
+        high = corners.max(axis = 1)
+        centre = (low + high) / 2
+        count = len(centre)
+        order = numpy.arange(count)
+        if not count:
+            self.order = []
+            return
+        stack = [self._add(low.min(axis = 0), high.max(axis = 0), 0, count)]
+        while stack:
+            node = stack.pop()
+            start, end = self.start[node], self.end[node]
+            if end - start <= leaf_size:
+                continue
+            members = order[start:end]
+            centres = centre[members]
+            spans = centres.max(axis = 0) - centres.min(axis = 0)
+            axis = int(spans.argmax())
+            middle = (end - start) // 2
+            members[:] = members[numpy.argpartition(centres[:, axis],
+                                                    middle)]
+            self.left[node] = len(self.lows)
+            for first, last in ((start, start + middle),
+                                (start + middle, end)):
+                chosen = order[first:last]
+                stack.append(self._add(low[chosen].min(axis = 0),
+                                       high[chosen].max(axis = 0),
+                                       first, last))
+        self.order = order.tolist()
+
+    def _visit(self, origin, direction, radius = 0.0):
+        """Yield (node, entry) for the leaves whose boxes, grown by
+        radius, the line origin + t * direction passes through, entry
+        being the smallest t at which it enters the box. Nodes are
+        visited roughly in the order of entry; the caller may send a
+        new bound on entry, beyond which nodes are skipped.
+        """
+        if not self.lows:
+            return
+        bound = float('inf')
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            entry = _slab(origin, direction, self.lows[node],
+                          self.highs[node], radius)
+            if entry is None or entry > bound:
+                continue
+            first = self.left[node]
+            if first == -1:
+                limit = yield node, entry
+                if limit is not None:
+                    bound = limit
+                continue
+            # Push the farther child first so that the nearer one is
+            # examined first.
+            entries = [_slab(origin, direction, self.lows[child],
+                             self.highs[child], radius)
+                       for child in (first, first + 1)]
+            if entries[0] is not None and (entries[1] is None or
+                                           entries[0] <= entries[1]):
+                stack.extend((first + 1, first))
+            else:
+                stack.extend((first, first + 1))
+
+    def intersect(self, origin, direction):
+        """Return (triangle, t) of the first triangle the line origin +
+        t * direction hits, i.e. the one with the smallest t (which
+        may be negative), or None if it hits none.
+        """
+        best = None
+        visits = self._visit(origin, direction)
+        limit = None
+        try:
+            while True:
+                node, _ = visits.send(limit)
+                for triangle in self.order[self.start[node]:self.end[node]]:
+                    t = self._hit(triangle, origin, direction)
+                    if t is not None and (best is None or t < best[1]):
+                        best = (triangle, t)
+                limit = best[1] if best is not None else None
+        except StopIteration:
+            pass
+        return best
+
+    def nearest_vertex(self, origin, direction, radius):
+        """Return the vertex closest to the line origin + t * direction
+        within the radius, or None if there's none.
+        """
+        coordinates = self.coordinates
+        best = None
+        best_distance = radius
+        seen = set()
+        for node, _ in self._visit(origin, direction, radius):
+            for triangle in self.order[self.start[node]:self.end[node]]:
+                for v in self.triangles[3 * triangle:3 * triangle + 3]:
+                    if v in seen:
+                        continue
+                    seen.add(v)
+                    distance = _distance(coordinates[3 * v:3 * v + 3],
+                                         origin, direction)
+                    if distance <= best_distance:
+                        best = v
+                        best_distance = distance
+        return best
+
+    def _hit(self, triangle, origin, direction):
+        # Moller-Trumbore, for the whole line rather than a ray.
+        coordinates = self.coordinates
+        a, b, c = self.triangles[3 * triangle:3 * triangle + 3]
+        ax, ay, az = coordinates[3 * a:3 * a + 3]
+        e1 = (coordinates[3 * b] - ax, coordinates[3 * b + 1] - ay,
+              coordinates[3 * b + 2] - az)
+        e2 = (coordinates[3 * c] - ax, coordinates[3 * c + 1] - ay,
+              coordinates[3 * c + 2] - az)
+        p = _cross(direction, e2)
+        determinant = _dot(e1, p)
+        if determinant == 0:
+            return None
+        inverse = 1.0 / determinant
+        s = (origin[0] - ax, origin[1] - ay, origin[2] - az)
+        u = _dot(s, p) * inverse
+        if u < 0 or u > 1:
+            return None
+        q = _cross(s, e1)
+        v = _dot(direction, q) * inverse
+        if v < 0 or u + v > 1:
+            return None
+        return _dot(e2, q) * inverse
+
+
+class Picker(object):
+    """Answers what is under a point of the screen for a mesh.
+
+    Building the BVH takes a while for big meshes, so it is done in
+    the constructor, which may run on a worker thread; queries are
+    cheap.
+    """
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.bvh = BVH(mesh.coordinates, mesh.triangles)
+
+    def pick(self, matrix, x, y, radius = PICK_RADIUS):
+        """Return a Pick for the screen point (x, y), the mesh being
+        projected onto the screen by matrix (model to screen; the
+        viewer looks down its z axis). The radius, in screen units,
+        is how far from the cursor vertices are looked for.
+        """
+        inverse = matrix.inverse()
+        origin = inverse.transform_point(x, y, 0)
+        # Into the screen, away from the viewer.
+        cells = inverse.cells
+        direction = (-cells[6], -cells[7], -cells[8])
+        hit = self.bvh.intersect(origin, direction)
+        coordinates = self.mesh.coordinates
+        if hit is None:
+            # The distance from the line in model space is proportional
+            # to the distance on the screen.
+            scale = math.sqrt(cells[0] ** 2 + cells[1] ** 2 + cells[2] ** 2)
+            vertex = self.bvh.nearest_vertex(origin, direction,
+                                             radius * scale)
+            return Pick(vertex = vertex) if vertex is not None else None
+        triangle, t = hit
+        face = self.mesh.triangle_faces[triangle]
+        offsets = self.mesh.face_offsets
+        corners = self.mesh.face_indices[offsets[face]:offsets[face + 1]]
+
+        def distance(v):
+            sx, sy, _ = matrix.transform_point(*coordinates[3 * v:3 * v + 3])
+            return (sx - x) ** 2 + (sy - y) ** 2
+
+        return Pick(face, min(corners, key = distance),
+                    tuple(o + t * d for o, d in zip(origin, direction)))
+
+
+def _slab(origin, direction, low, high, radius):
+    """Return the t at which the line enters the box grown by radius
+    (the slab test), or None if it misses it.
+    """
+    entry = -float('inf')
+    leave = float('inf')
+    for i in range(3):
+        o = origin[i]
+        d = direction[i]
+        lo = low[i] - radius
+        hi = high[i] + radius
+        if d == 0:
+            if o < lo or o > hi:
+                return None
+            continue
+        t1 = (lo - o) / d
+        t2 = (hi - o) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > entry:
+            entry = t1
+        if t2 < leave:
+            leave = t2
+        if entry > leave:
+            return None
+    return entry
+
+
+def _distance(point, origin, direction):
+    offset = (point[0] - origin[0], point[1] - origin[1],
+              point[2] - origin[2])
+    cross = _cross(offset, direction)
+    return math.sqrt(_dot(cross, cross) / _dot(direction, direction))
+
+
+def _dot(u, v):
+    return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+
+
+def _cross(u, v):
+    return (u[1] * v[2] - u[2] * v[1],
+            u[2] * v[0] - u[0] * v[2],
+            u[0] * v[1] - u[1] * v[0])
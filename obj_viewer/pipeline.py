@@ -0,0 +1,394 @@
+"""Stages of the rendering pipeline that operate on the whole model at
+once rather than on individual points.
+
+NumPy is used whenever it is available; otherwise every stage falls
+back to plain Python working on flat lists.
+"""
+from array import array
+
+from obj_viewer.constants import LIGHT_DIRECTION, AMBIENT_LIGHT
+from obj_viewer.mesh import iter_faces
+from obj_viewer.profiling import profiler
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def flatten(matrix):
+    """Return the cells of a 4x4 matrix as a flat tuple, row by row."""
+    return tuple(cell for row in matrix for cell in row)
+
+
+def project_vertices(coordinates, matrix):
+    """Transform all the vertices of a model by a single 4x4 matrix.
+
+    coordinates -- a flat buffer (e.g. array('d')) of x-y-z triples
+    matrix      -- the combined transformation, in the same row-vector
+                   convention as Point * Matrix
+
+    Return a flat list of the transformed x-y-z triples, so that the
+    coordinates of the vertex i start at index 3 * i.
+    """
+    if not coordinates:
+        return []
+    cells = flatten(matrix)
+    if numpy is not None:
+        points = numpy.frombuffer(coordinates, dtype = float).reshape(-1, 3)
+        affine = numpy.array(cells, dtype = float).reshape(4, 4)
+        return (points.dot(affine[:3, :3]) + affine[3, :3]).ravel().tolist()
+    a, b, c, _, d, e, f, _, g, h, i, _, j, k, l, _ = cells
+    xs = coordinates[0::3]
+    ys = coordinates[1::3]
+    zs = coordinates[2::3]
+    projected = [0.0] * len(coordinates)
+    projected[0::3] = [x * a + y * d + z * g + j
+                        for x, y, z in zip(xs, ys, zs)]
+    projected[1::3] = [x * b + y * e + z * h + k
+                        for x, y, z in zip(xs, ys, zs)]
+    projected[2::3] = [x * c + y * f + z * i + l
+                        for x, y, z in zip(xs, ys, zs)]
+    return projected
+
+
+def transformed_chunks(values, matrix, size, vectors = False):
+    """Yield the x-y-z triples stored in the flat buffer values
+    transformed by the matrix, size triples at a time, each chunk as
+    a flat array of doubles (array('d') or a NumPy array), so that
+    a whole model can be transformed without making a second copy of
+    it. If vectors is true, the triples are unit vectors such as
+    normals, which are only rotated (see transform_normals).
+    """
+    for start in range(0, len(values), 3 * size):
+        block = values[start:start + 3 * size]
+        if vectors:
+            result = transform_normals(block, matrix)
+        elif numpy is not None:
+            points = numpy.frombuffer(block, dtype = float).reshape(-1, 3)
+            affine = numpy.array(flatten(matrix), dtype = float).reshape(4, 4)
+            result = points.dot(affine[:3, :3]) + affine[3, :3]
+        else:
+            result = project_vertices(block, matrix)
+        if numpy is not None:
+            yield result.ravel()
+        else:
+            yield array('d', result)
+
+
+def wireframe(mesh, matrix, culling = False, viewport = None):
+    """Transform all the vertices of a mesh by a 4x4 matrix and return
+    the 2D line segments of its edges (see Mesh.edges) as a flat list
+    of x1, y1, x2, y2 quadruples.
+
+    culling  -- if true, only keep the edges of faces facing the viewer
+                (see front_faces)
+    viewport -- an (x, y, width, height) rectangle; segments entirely
+                outside of it are dropped, the rest is clipped to it
+    """
+    if not mesh.edges:
+        return []
+    if numpy is not None:
+        points = numpy.frombuffer(mesh.coordinates,
+                                  dtype = float).reshape(-1, 3)
+        affine = numpy.array(flatten(matrix), dtype = float).reshape(4, 4)
+        projected = points.dot(affine[:3, :2]) + affine[3, :2]
+        pairs = numpy.frombuffer(mesh.edges, dtype = numpy.intc)
+        if culling:
+            # Edges without a second face point at the sentinel at the
+            # end, which is never visible.
+            front = numpy.append(_front_faces_numpy(mesh, projected), False)
+            adjacent = numpy.frombuffer(mesh.edge_faces,
+                                        dtype = numpy.intc).reshape(-1, 2)
+            pairs = pairs.reshape(-1, 2)[front[adjacent].any(axis = 1)]
+        segments = projected[pairs].reshape(-1, 4)
+        if viewport is not None:
+            segments = _clip_numpy(segments, viewport)
+        return segments.ravel().tolist()
+    projected = project_vertices(mesh.coordinates, matrix)
+    xs = projected[0::3]
+    ys = projected[1::3]
+    starts = mesh.edges[0::2]
+    ends = mesh.edges[1::2]
+    if culling:
+        front = front_faces(mesh, projected) + [False]
+        adjacent = mesh.edge_faces
+        visible = [front[f] or front[g] for f, g
+                   in zip(adjacent[0::2], adjacent[1::2])]
+        starts = [v for v, keep in zip(starts, visible) if keep]
+        ends = [v for v, keep in zip(ends, visible) if keep]
+    lines = [0.0] * (4 * len(starts))
+    lines[0::4] = [xs[v] for v in starts]
+    lines[1::4] = [ys[v] for v in starts]
+    lines[2::4] = [xs[v] for v in ends]
+    lines[3::4] = [ys[v] for v in ends]
+    if viewport is not None:
+        lines = _clip(lines, viewport)
+    return lines
+
+
+def transform_normals(normals, transformation):
+    """Turn the unit normals of the faces of a mesh (see
+    Mesh.face_normals) into those of the mesh transformed by the
+    transformation, which may only rotate, scale uniformly and
+    translate it (see obj_viewer.transform): only the rotation affects
+    them, so this is a single 3x3 multiplication of all of them.
+
+    Return them as an n x 3 array, or a flat list without NumPy.
+    """
+    cells = flatten(transformation)
+    linear = [cells[0:3], cells[4:7], cells[8:11]]
+    # The rows of the linear part are all as long as the scaling factor.
+    scale = sum(c * c for c in linear[0]) ** 0.5 or 1.0
+    if numpy is not None:
+        rotation = numpy.array(linear, dtype = float) / scale
+        return numpy.frombuffer(normals, dtype = float).reshape(-1, 3).dot(
+            rotation)
+    (a, b, c), (d, e, f), (g, h, i) = [[x / scale for x in row]
+                                       for row in linear]
+    xs = normals[0::3]
+    ys = normals[1::3]
+    zs = normals[2::3]
+    rotated = [0.0] * len(normals)
+    rotated[0::3] = [x * a + y * d + z * g for x, y, z in zip(xs, ys, zs)]
+    rotated[1::3] = [x * b + y * e + z * h for x, y, z in zip(xs, ys, zs)]
+    rotated[2::3] = [x * c + y * f + z * i for x, y, z in zip(xs, ys, zs)]
+    return rotated
+
+
+def filled(mesh, transformation, view_matrix, culling = False,
+           order = None, normals = None):
+    """Return the faces of a mesh, transformed by the transformation
+    and projected by the view matrix, as filled polygons in the order
+    the painter's algorithm draws them: from the farthest to the
+    closest (the viewer looks down the z axis, see rasterizer).
+
+    Return (coordinates, sizes, shades, order): the flat list of the
+    x-y screen coordinates of the corners of the faces drawn, one face
+    after another; the number of corners of each; their Lambertian
+    intensity (lit like in the rasterizer); and the back-to-front
+    order of all the faces, to be passed back in for the next frame.
+
+    Since a frame usually differs only slightly from the previous one,
+    the previous order is nearly sorted by the new depths, and it is
+    re-sorted rather than sorting the faces from scratch: Timsort (both
+    Python's and NumPy's stable sort) takes little more than linear
+    time on such input.
+
+    culling -- if true, faces turned away from the viewer (see
+               front_faces) are left out; they are still sorted
+    normals -- the normals of the transformed faces as returned by
+               transform_normals, which only change with the rotation
+               and may be reused from an earlier frame; computed if
+               not given
+    """
+    if not mesh.face_count:
+        return [], [], [], order
+    if normals is None:
+        normals = transform_normals(mesh.face_normals, transformation)
+    if numpy is not None:
+        return _filled_numpy(mesh, transformation, view_matrix, culling,
+                             order, normals)
+    screen = project_vertices(mesh.coordinates,
+                              transformation * view_matrix)
+    xs = screen[0::3]
+    ys = screen[1::3]
+    zs = screen[2::3]
+    depths = [sum(zs[v] for v in face) / len(face)
+              for face in iter_faces(mesh.face_offsets, mesh.face_indices)]
+    lx, ly, lz = _light()
+    with profiler.stage('sort'):
+        if order is None or len(order) != len(depths):
+            order = range(len(depths))
+        order = sorted(order, key = depths.__getitem__)
+    drawn = order
+    if culling:
+        front = front_faces(mesh, screen)
+        drawn = [f for f in order if front[f]]
+    offsets = mesh.face_offsets
+    indices = mesh.face_indices
+    coordinates = []
+    sizes = []
+    shades = []
+    for f in drawn:
+        corners = indices[offsets[f]:offsets[f + 1]]
+        sizes.append(len(corners))
+        for v in corners:
+            coordinates.append(xs[v])
+            coordinates.append(ys[v])
+        cosine = abs(normals[3 * f] * lx + normals[3 * f + 1] * ly +
+                     normals[3 * f + 2] * lz)
+        shades.append(AMBIENT_LIGHT + (1 - AMBIENT_LIGHT) * cosine)
+    return coordinates, sizes, shades, order
+
+
+def _filled_numpy(mesh, transformation, view_matrix, culling, order,
+                  normals):
+    points = numpy.frombuffer(mesh.coordinates, dtype = float).reshape(-1, 3)
+    matrix = transformation * view_matrix
+    affine = numpy.array(flatten(matrix), dtype = float).reshape(4, 4)
+    screen = points.dot(affine[:3, :3]) + affine[3, :3]
+    offsets = numpy.frombuffer(mesh.face_offsets, dtype = numpy.intc)
+    indices = numpy.frombuffer(mesh.face_indices, dtype = numpy.intc)
+    starts = offsets[:-1]
+    sizes = numpy.diff(offsets)
+    depths = numpy.add.reduceat(screen[indices, 2], starts) / sizes
+    count = mesh.face_count
+    with profiler.stage('sort'):
+        if order is None or len(order) != count:
+            order = numpy.argsort(depths, kind = 'stable')
+        else:
+            order = order[numpy.argsort(depths[order], kind = 'stable')]
+    drawn = order
+    if culling:
+        drawn = order[_front_faces_numpy(mesh, screen[:, :2])[order]]
+    counts = sizes[drawn]
+    # The positions in indices of the corners of the drawn faces: runs
+    # of consecutive numbers starting at their offsets.
+    ends = numpy.cumsum(counts)
+    positions = (numpy.repeat(starts[drawn] - (ends - counts), counts) +
+                 numpy.arange(ends[-1] if len(ends) else 0))
+    coordinates = screen[indices[positions], :2]
+    shades = (AMBIENT_LIGHT + (1 - AMBIENT_LIGHT) *
+              numpy.abs(normals[drawn].dot(_light())))
+    return (coordinates.ravel().tolist(), counts.tolist(), shades.tolist(),
+            order)
+
+
+def _light():
+    x, y, z = LIGHT_DIRECTION
+    length = (x * x + y * y + z * z) ** 0.5
+    if numpy is not None:
+        return numpy.array((x, y, z), dtype = float) / length
+    return (x / length, y / length, z / length)
+
+
+def wireframe_instances(mesh, matrices, culling = False, viewport = None):
+    """Return the segments of several instances of the same mesh, each
+    transformed by its own matrix, as a list of flat lists of x1, y1,
+    x2, y2 quadruples (see wireframe), one for each of the matrices.
+
+    With NumPy, the vertices of all the instances are transformed by
+    a single matrix product; the segments are then built and clipped
+    one instance at a time, which keeps the temporary arrays small.
+    """
+    if numpy is None or not mesh.edges or len(matrices) < 2:
+        return [wireframe(mesh, matrix, culling, viewport)
+                for matrix in matrices]
+    points = numpy.frombuffer(mesh.coordinates, dtype = float).reshape(-1, 3)
+    affines = numpy.array([flatten(matrix) for matrix in matrices],
+                          dtype = float).reshape(-1, 4, 4)
+    # The row of a vertex holds its x-y coordinates in each of the
+    # instances, one after another.
+    linear = affines[:, :3, :2].transpose(1, 0, 2).reshape(3, -1)
+    projected = points.dot(linear) + affines[:, 3, :2].ravel()
+    pairs = numpy.frombuffer(mesh.edges, dtype = numpy.intc).reshape(-1, 2)
+    if culling:
+        adjacent = numpy.frombuffer(mesh.edge_faces,
+                                    dtype = numpy.intc).reshape(-1, 2)
+    results = []
+    for k in range(len(affines)):
+        instance = numpy.ascontiguousarray(projected[:, 2 * k:2 * k + 2])
+        chosen = pairs
+        if culling:
+            front = numpy.append(_front_faces_numpy(mesh, instance), False)
+            chosen = pairs[front[adjacent].any(axis = 1)]
+        segments = instance[chosen].reshape(-1, 4)
+        if viewport is not None:
+            segments = _clip_numpy(segments, viewport)
+        results.append(segments.ravel().tolist())
+    return results
+
+
+def front_faces(mesh, projected):
+    """Return a list of booleans telling which faces of the mesh face
+    the viewer, given the flat list of its projected vertices (as
+    returned by project_vertices).
+
+    The projection flips the y axis, so faces wound counterclockwise
+    when looked at from the viewer have a negative signed area on the
+    screen. Faces seen exactly edge-on count as facing away.
+    """
+    xs = projected[0::3]
+    ys = projected[1::3]
+    front = []
+    for face in mesh.faces:
+        previous = face[-1]
+        area = 0.0
+        for v in face:
+            area += xs[previous] * ys[v] - xs[v] * ys[previous]
+            previous = v
+        front.append(area < 0)
+    return front
+
+
+def _front_faces_numpy(mesh, projected):
+    triangles = numpy.frombuffer(mesh.triangles,
+                                 dtype = numpy.intc).reshape(-1, 3)
+    a = projected[triangles[:, 0]]
+    b = projected[triangles[:, 1]] - a
+    c = projected[triangles[:, 2]] - a
+    areas = b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0]
+    owners = numpy.frombuffer(mesh.triangle_faces, dtype = numpy.intc)
+    return numpy.bincount(owners, weights = areas,
+                          minlength = mesh.face_count) < 0
+
+
+def _clip_numpy(segments, viewport):
+    """Clip segments (an n x 4 array) to the viewport using the
+    Liang-Barsky algorithm; drop the ones that miss it completely.
+    """
+    left, top, width, height = viewport
+    x0, y0 = segments[:, 0], segments[:, 1]
+    dx = segments[:, 2] - x0
+    dy = segments[:, 3] - y0
+    start = numpy.zeros(len(segments))
+    end = numpy.ones(len(segments))
+    keep = numpy.ones(len(segments), dtype = bool)
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        for p, q in ((-dx, x0 - left), (dx, left + width - x0),
+                     (-dy, y0 - top), (dy, top + height - y0)):
+            ratio = q / p
+            keep &= (p != 0) | (q >= 0)
+            entering = p < 0
+            start = numpy.where(entering, numpy.maximum(start, ratio), start)
+            end = numpy.where(p > 0, numpy.minimum(end, ratio), end)
+    keep &= start <= end
+    start = start[keep, None]
+    end = end[keep, None]
+    first = segments[keep, :2]
+    delta = segments[keep, 2:] - first
+    return numpy.hstack((first + start * delta, first + end * delta))
+
+
+def _clip(lines, viewport):
+    """Pure Python counterpart of _clip_numpy working on flat lists."""
+    left, top, width, height = viewport
+    right = left + width
+    bottom = top + height
+    clipped = []
+    for i in range(0, len(lines), 4):
+        x0, y0, x1, y1 = lines[i:i + 4]
+        if ((x0 < left and x1 < left) or (x0 > right and x1 > right) or
+                (y0 < top and y1 < top) or (y0 > bottom and y1 > bottom)):
+            continue
+        if (left <= min(x0, x1) and max(x0, x1) <= right and
+                top <= min(y0, y1) and max(y0, y1) <= bottom):
+            clipped.extend((x0, y0, x1, y1))
+            continue
+        dx = x1 - x0
+        dy = y1 - y0
+        start, end = 0.0, 1.0
+        for p, q in ((-dx, x0 - left), (dx, right - x0),
+                     (-dy, y0 - top), (dy, bottom - y0)):
+            if p == 0:
+                if q < 0:
+                    start, end = 1.0, 0.0
+            elif p < 0:
+                start = max(start, q / p)
+            else:
+                end = min(end, q / p)
+        if start <= end:
+            clipped.extend((x0 + start * dx, y0 + start * dy,
+                            x0 + end * dx, y0 + end * dy))
+    return clipped
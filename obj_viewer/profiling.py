@@ -0,0 +1,168 @@
+"""Timing of the stages between loading a file and painting a frame.
+
+Code to be measured is wrapped in a stage:
+
+    with profiler.stage('project'):
+        ...
+
+While the profiler is disabled (the default), stage only returns
+a shared object whose __enter__ and __exit__ do nothing, so the
+instrumentation can stay in place for good. Once enabled, every stage
+is kept both as an event (for a timeline of what happened, see dump)
+and in a rolling window of the latest durations of stages of the same
+name (for statistics, see summary).
+
+Setting the OBJ_VIEWER_PROFILE environment variable to a filename
+enables the profiler and dumps everything it has gathered into that
+file when the application exits.
+"""
+import atexit
+import collections
+import json
+import math
+import os
+import threading
+import time
+
+from obj_viewer.constants import (PROFILING_ENABLED, PROFILE_WINDOW,
+                                  PROFILE_MAX_EVENTS)
+
+# The best clock available on both Python 2 and 3.
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class _Disabled(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+class _Stage(object):
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.record(self.name, self.start, clock() - self.start)
+        return False
+
+
+class Profiler(object):
+    """Collector of stage timings; safe to use from several threads.
+
+    enabled -- whether stages are being recorded
+    window  -- the number of the latest durations of each stage the
+               statistics are computed from
+    """
+
+    def __init__(self, enabled = PROFILING_ENABLED, window = PROFILE_WINDOW,
+                 max_events = PROFILE_MAX_EVENTS):
+        self.enabled = enabled
+        self.window = window
+        self.origin = clock()
+        self.lock = threading.Lock()
+        self.durations = {}
+        # Only the latest events are kept, so that a long session
+        # doesn't grow without bounds.
+        self.events = collections.deque(maxlen = max_events)
+
+    def stage(self, name):
+        """Return a context manager timing the code it wraps."""
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self, name)
+
+    def record(self, name, start, duration):
+        """Record a stage which started at the given time (as returned
+        by clock) and took duration seconds.
+        """
+        if not self.enabled:
+            return
+        thread = threading.current_thread().name
+        with self.lock:
+            durations = self.durations.get(name)
+            if durations is None:
+                durations = self.durations[name] = collections.deque(
+                    maxlen = self.window)
+            durations.append(duration)
+            self.events.append((name, start, duration, thread))
+
+    def reset(self):
+        with self.lock:
+            self.origin = clock()
+            self.durations.clear()
+            self.events.clear()
+
+    def statistics(self, name):
+        """Return the count, median, 95th percentile and maximum of the
+        latest durations of the stage (in seconds) as a dictionary, or
+        None if it hasn't been recorded yet.
+        """
+        with self.lock:
+            durations = sorted(self.durations.get(name, ()))
+        if not durations:
+            return None
+        return {'count': len(durations),
+                'p50': _percentile(durations, 0.5),
+                'p95': _percentile(durations, 0.95),
+                'max': durations[-1]}
+
+    def summary(self):
+        """Return the statistics of all the stages recorded so far."""
+        with self.lock:
+            names = sorted(self.durations)
+        return dict((name, self.statistics(name)) for name in names)
+
+    def dump(self, filename):
+        """Write everything gathered so far into a JSON file. Files
+        named *.trace get the Trace Event Format instead, which can be
+        opened in chrome://tracing or Perfetto.
+        """
+        with self.lock:
+            events = list(self.events)
+            origin = self.origin
+        if filename.endswith('.trace'):
+            threads = {}
+            content = {'traceEvents': [
+                {'name': name, 'ph': 'X', 'pid': os.getpid(),
+                 'tid': threads.setdefault(thread, len(threads)),
+                 'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+                for name, start, duration, thread in events]}
+            content['traceEvents'].extend(
+                {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                 'tid': tid, 'args': {'name': thread}}
+                for thread, tid in threads.items())
+        else:
+            content = {'summary': self.summary(),
+                       'events': [{'name': name, 'start': start - origin,
+                                   'duration': duration, 'thread': thread}
+                                  for name, start, duration, thread
+                                  in events]}
+        with open(filename, 'w') as target:
+            json.dump(content, target)
+
+
+def _percentile(values, fraction):
+    # Nearest-rank percentile of sorted values.
+    return values[max(0, int(math.ceil(fraction * len(values))) - 1)]
+
+
+profiler = Profiler()
+
+_dump_to = os.environ.get('OBJ_VIEWER_PROFILE')
+if _dump_to:
+    profiler.enabled = True
+    atexit.register(profiler.dump, _dump_to)
@@ -0,0 +1,237 @@
+"""Software rasterizer rendering flat-shaded models into an in-memory
+colour and depth buffer, without any need for a display.
+
+All the work is done by NumPy on whole batches of triangles: every row
+of the bounding box of a triangle is cut down to the span of pixels
+between its edges, the pixels of all the spans are tested at once and
+the resulting fragments are depth-tested together. There are no
+per-pixel (or even per-triangle) Python loops, and the work follows the
+area the triangles cover rather than that of their boxes.
+
+Depth is taken from the z coordinate after the transformation; the
+viewer looks down the z axis from its positive end, so fragments with
+larger z are closer.
+"""
+import struct
+import zlib
+
+from obj_viewer.constants import (VIEW_WIDTH, VIEW_HEIGHT,
+                                  BACKGROUND_COLOR, MODEL_COLOR,
+                                  LIGHT_DIRECTION, AMBIENT_LIGHT,
+                                  RASTER_BATCH_FRAGMENTS)
+from obj_viewer.pipeline import flatten
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class FrameBuffer(object):
+    """The result of rasterizing a model.
+
+    color -- height x width x 3 array of RGB bytes
+    depth -- height x width array of the depth of the closest fragment
+             in every pixel (-inf where nothing has been drawn)
+    """
+
+    def __init__(self, width, height, background = BACKGROUND_COLOR):
+        self.width = width
+        self.height = height
+        self.color = numpy.empty((height, width, 3), dtype = numpy.uint8)
+        self.color[...] = background
+        self.depth = numpy.full((height, width), -numpy.inf)
+
+    def save_png(self, filename):
+        """Write the colour buffer into a PNG file."""
+        rows = numpy.empty((self.height, 1 + 3 * self.width),
+                           dtype = numpy.uint8)
+        # Every scanline starts with its filter type; 0 is none.
+        rows[:, 0] = 0
+        rows[:, 1:] = self.color.reshape(self.height, -1)
+        with open(filename, 'wb') as target:
+            target.write(b'\x89PNG\r\n\x1a\n')
+            _write_chunk(target, b'IHDR',
+                         struct.pack('>IIBBBBB', self.width, self.height,
+                                     8, 2, 0, 0, 0))
+            _write_chunk(target, b'IDAT', zlib.compress(rows.tobytes(), 6))
+            _write_chunk(target, b'IEND', b'')
+
+    def to_qimage(self):
+        """Return the colour buffer as a QImage (PySide is only needed
+        if this method gets called).
+        """
+        from PySide import QtGui
+        image = QtGui.QImage(self.color.tobytes(), self.width, self.height,
+                             3 * self.width, QtGui.QImage.Format_RGB888)
+        # The QImage doesn't own the data it's been given.
+        return image.copy()
+
+
+def rasterize(mesh, transformation, view_matrix, width = VIEW_WIDTH,
+              height = VIEW_HEIGHT, color = MODEL_COLOR):
+    """Render the mesh transformed by the transformation matrix and
+    projected by the view matrix into a new FrameBuffer, using flat
+    shading with a single directional light (see LIGHT_DIRECTION).
+    """
+    if numpy is None:
+        raise ImportError('The software rasterizer requires NumPy.')
+    frame = FrameBuffer(width, height)
+    triangles = numpy.frombuffer(mesh.triangles,
+                                 dtype = numpy.intc).reshape(-1, 3)
+    if not len(triangles):
+        return frame
+    points = numpy.frombuffer(mesh.coordinates,
+                              dtype = float).reshape(-1, 3)
+    world = _apply(points, transformation)
+    screen = _apply(world, view_matrix)
+    shade = _shade(world[triangles])
+    colors = (numpy.outer(shade, color) + 0.5).astype(numpy.uint8)
+    _draw(frame, screen[triangles], colors)
+    return frame
+
+
+def _apply(points, matrix):
+    affine = numpy.array(flatten(matrix), dtype = float).reshape(4, 4)
+    return points.dot(affine[:3, :3]) + affine[3, :3]
+
+
+def _shade(corners):
+    """Return the Lambertian intensity of every triangle, given by its
+    corners in world space. Both sides of a triangle are lit, since
+    the winding of faces in OBJ files is not always consistent.
+    """
+    normals = numpy.cross(corners[:, 1] - corners[:, 0],
+                          corners[:, 2] - corners[:, 0])
+    lengths = numpy.sqrt((normals * normals).sum(axis = 1))
+    light = numpy.array(LIGHT_DIRECTION, dtype = float)
+    light /= numpy.sqrt(light.dot(light))
+    with numpy.errstate(invalid = 'ignore', divide = 'ignore'):
+        cosines = numpy.abs(normals.dot(light)) / lengths
+    cosines = numpy.nan_to_num(cosines)
+    return AMBIENT_LIGHT + (1 - AMBIENT_LIGHT) * cosines
+
+
+def _draw(frame, corners, colors):
+    """Rasterize triangles given by their corners in screen space."""
+    xs = corners[:, :, 0]
+    ys = corners[:, :, 1]
+    zs = corners[:, :, 2]
+    # Pixel centres lie at half-integer coordinates.
+    left = numpy.maximum(numpy.ceil(xs.min(axis = 1) - 0.5), 0)
+    right = numpy.minimum(numpy.floor(xs.max(axis = 1) - 0.5),
+                          frame.width - 1)
+    top = numpy.maximum(numpy.ceil(ys.min(axis = 1) - 0.5), 0)
+    bottom = numpy.minimum(numpy.floor(ys.max(axis = 1) - 0.5),
+                           frame.height - 1)
+    area = ((xs[:, 1] - xs[:, 0]) * (ys[:, 2] - ys[:, 0]) -
+            (xs[:, 2] - xs[:, 0]) * (ys[:, 1] - ys[:, 0]))
+    visible = (left <= right) & (top <= bottom) & (area != 0)
+    if not visible.any():
+        return
+    xs, ys, zs, area, colors = (xs[visible], ys[visible], zs[visible],
+                                area[visible], colors[visible])
+    left = left[visible].astype(numpy.intp)
+    top = top[visible].astype(numpy.intp)
+    width = right[visible].astype(numpy.intp) - left + 1
+    height = bottom[visible].astype(numpy.intp) - top + 1
+
+    # Barycentric coordinates as linear functions of the pixel centre,
+    # l_i = a_i * x + b_i * y + c_i, and depth interpolated from them.
+    a = numpy.empty_like(xs)
+    b = numpy.empty_like(xs)
+    c = numpy.empty_like(xs)
+    for i in range(3):
+        j, k = (i + 1) % 3, (i + 2) % 3
+        a[:, i] = ys[:, j] - ys[:, k]
+        b[:, i] = xs[:, k] - xs[:, j]
+        c[:, i] = xs[:, j] * ys[:, k] - xs[:, k] * ys[:, j]
+    a /= area[:, None]
+    b /= area[:, None]
+    c /= area[:, None]
+    depth_a = (a * zs).sum(axis = 1)
+    depth_b = (b * zs).sum(axis = 1)
+    depth_c = (c * zs).sum(axis = 1)
+
+    # Every row of a bounding box is cut down to the span of pixels
+    # the edge functions may be positive on, so the fragments tested
+    # follow the area of the triangles rather than that of their boxes
+    # (long, thin ones cover only a sliver of theirs). The rows are
+    # taken in batches of triangles covering a bounded number of
+    # pixels of their boxes.
+    totals = numpy.cumsum(width * height)
+    batches = numpy.searchsorted(
+        totals, numpy.arange(RASTER_BATCH_FRAGMENTS, totals[-1],
+                             RASTER_BATCH_FRAGMENTS), side = 'right')
+    for chosen in numpy.split(numpy.arange(len(xs)), batches):
+        if not len(chosen):
+            continue
+        triangle, y = _ranges(chosen, top[chosen], height[chosen])
+        cy = y + 0.5
+        low = left[triangle].astype(float)
+        high = (left + width - 1)[triangle].astype(float)
+        for i in range(3):
+            # a * (x + 0.5) + b * cy + c >= 0, solved for x; widened by
+            # a pixel on either side against rounding, since the exact
+            # test below has the last word.
+            ai = a[triangle, i]
+            rest = b[triangle, i] * cy + c[triangle, i]
+            with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+                bound = -rest / ai - 0.5
+            low = numpy.where(ai > 0, numpy.maximum(low,
+                                                    numpy.ceil(bound) - 1),
+                              low)
+            high = numpy.where(ai < 0, numpy.minimum(high,
+                                                     numpy.floor(bound) + 1),
+                               high)
+            high = numpy.where((ai == 0) & (rest < 0), low - 1, high)
+        counts = numpy.maximum(high - low + 1, 0).astype(numpy.intp)
+        row, x = _ranges(numpy.arange(len(triangle)),
+                         low.astype(numpy.intp), counts)
+        triangle = triangle[row]
+        y = y[row]
+        cx = x + 0.5
+        cy = y + 0.5
+        inside = numpy.ones(len(x), dtype = bool)
+        for i in range(3):
+            inside &= (a[triangle, i] * cx + b[triangle, i] * cy +
+                       c[triangle, i]) >= 0
+        triangle, x, y = triangle[inside], x[inside], y[inside]
+        if not len(triangle):
+            continue
+        depth = (depth_a[triangle] * (x + 0.5) +
+                 depth_b[triangle] * (y + 0.5) + depth_c[triangle])
+        _resolve(frame, y * frame.width + x, depth, colors[triangle])
+
+
+def _ranges(owners, starts, counts):
+    """Return the owner and the value of every element of the ranges
+    starts[i] .. starts[i] + counts[i] - 1, owned by owners[i].
+    """
+    total = int(counts.sum())
+    repeated = numpy.repeat(numpy.arange(len(counts)), counts)
+    steps = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts,
+                                               counts)
+    return owners[repeated], starts[repeated] + steps
+
+
+def _resolve(frame, pixels, depth, colors):
+    """Depth-test a batch of fragments, keeping the closest fragment of
+    every pixel, and write the winners into the frame.
+    """
+    flat_depth = frame.depth.reshape(-1)
+    previous = flat_depth[pixels]
+    numpy.maximum.at(flat_depth, pixels, depth)
+    # The fragments that are both the closest in their pixel and closer
+    # than what was there; of those tying for a pixel, the first wins.
+    won = numpy.flatnonzero((depth > previous) &
+                            (depth == flat_depth[pixels]))
+    pixels, first = numpy.unique(pixels[won], return_index = True)
+    frame.color.reshape(-1, 3)[pixels] = colors[won[first]]
+
+
+def _write_chunk(target, kind, data):
+    target.write(struct.pack('>I', len(data)))
+    target.write(kind)
+    target.write(data)
+    target.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
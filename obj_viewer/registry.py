@@ -0,0 +1,54 @@
+"""Sharing of loaded geometry between the models of a scene.
+
+Several models may show the same file, e.g. to compare different
+placements of one part. They are instances of one geometry: a Mesh and
+its levels of detail are never modified once loaded, so all of them
+refer to the same ones and only carry their own transformation. The
+memory used thus grows with the number of distinct files rather than
+with the number of models.
+"""
+import os
+import weakref
+
+
+class MeshRegistry(object):
+    """The meshes (and their levels of detail) loaded from files, looked
+    up by the identity of the file: its absolute path, size and
+    modification time, so that a file changed on disk is loaded again.
+
+    Only weak references are kept: a mesh is dropped from the registry
+    as soon as no model uses it any more.
+    """
+
+    def __init__(self):
+        self.meshes = weakref.WeakValueDictionary()
+        self.levels = weakref.WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self.meshes)
+
+    def get(self, filename):
+        """Return the (mesh, levels) loaded from the file before, or
+        None if it hasn't been or no model uses it any more.
+        """
+        try:
+            mesh = self.meshes.get(_identity(filename))
+        except OSError:
+            return None
+        if mesh is None:
+            return None
+        return mesh, self.levels.get(mesh, [])
+
+    def add(self, filename, mesh, levels):
+        """Remember the mesh and levels loaded from the file."""
+        try:
+            identity = _identity(filename)
+        except OSError:
+            return
+        self.meshes[identity] = mesh
+        self.levels[mesh] = levels
+
+
+def _identity(filename):
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime
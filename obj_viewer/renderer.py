@@ -0,0 +1,68 @@
+"""Preparation of frames in the background, so that the window keeps
+handling input while a heavy frame is being projected.
+
+The GUI thread only asks for frames and swaps in the ones that come
+back; transforming the vertices and building what is painted
+is left to a worker thread.
+"""
+import sys
+import threading
+import traceback
+
+from PySide import QtCore
+
+from obj_viewer.scene import prepare_frame
+
+
+class FrameWorker(QtCore.QThread):
+    """Thread computing the frames requested through submit.
+
+    Only the latest request is kept: one that comes while the worker
+    is busy replaces any other still waiting, so a slow frame never
+    makes the requests pile up. Finished frames are delivered through
+    the ready signal as (frame id, target, geometries), where
+    geometries are the results of scene.prepare_frame; frames may
+    still arrive out of date, so the receiver should drop any older
+    than the last one it has shown.
+    """
+
+    ready = QtCore.Signal(object, object, object)
+
+    def __init__(self, parent = None):
+        super(FrameWorker, self).__init__(parent)
+        self.condition = threading.Condition()
+        self.pending = None
+        self.stopped = False
+
+    def submit(self, frame_id, target, job):
+        """Ask for a frame; job is a function returning a list of
+        frames to paint (see model.frames) and must not touch any Qt
+        objects.
+        """
+        with self.condition:
+            self.pending = (frame_id, target, job)
+            self.condition.notify()
+
+    def stop(self):
+        """Ask the worker to finish, dropping any waiting request."""
+        with self.condition:
+            self.stopped = True
+            self.pending = None
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                frame_id, target, job = self.pending
+                self.pending = None
+            try:
+                geometries = [prepare_frame(frame) for frame in job()]
+            except Exception:
+                # A broken frame must not take the worker down with it.
+                traceback.print_exc(file = sys.stderr)
+                continue
+            self.ready.emit(frame_id, target, geometries)
@@ -0,0 +1,195 @@
+"""Custom items for the QGraphicsScene the models are painted on."""
+from PySide import QtCore, QtGui
+
+from obj_viewer.constants import (HIGHLIGHT_COLOR, HIGHLIGHT_VERTEX_SIZE,
+                                  MODEL_COLOR, SHADE_LEVELS)
+from obj_viewer.profiling import profiler
+
+
+def prepare_lines(lines):
+    """Turn a flat sequence of x1, y1, x2, y2 quadruples into the
+    segments and bounding rectangle a WireframeItem paints. Neither is
+    tied to the scene, so this can be done on a worker thread.
+    """
+    with profiler.stage('scene'):
+        QLineF = QtCore.QLineF
+        segments = [QLineF(*lines[i:i + 4])
+                    for i in range(0, len(lines), 4)]
+        if lines:
+            xs = lines[0::2]
+            ys = lines[1::2]
+            bounds = QtCore.QRectF(QtCore.QPointF(min(xs), min(ys)),
+                                   QtCore.QPointF(max(xs), max(ys)))
+        else:
+            bounds = QtCore.QRectF()
+    return segments, bounds
+
+
+def prepare_faces(coordinates, sizes, shades, color = MODEL_COLOR):
+    """Turn filled faces, as returned by pipeline.filled, into the
+    polygons, brushes and bounding rectangle a FacesItem paints. Like
+    prepare_lines, this can be done on a worker thread.
+
+    Shades are rounded to one of SHADE_LEVELS brushes, so that faces
+    next to each other usually share one.
+    """
+    with profiler.stage('scene'):
+        QPointF = QtCore.QPointF
+        brushes = [QtGui.QBrush(QtGui.QColor(
+            *[int(c * level / (SHADE_LEVELS - 1.0) + 0.5) for c in color]))
+            for level in range(SHADE_LEVELS)]
+        polygons = []
+        start = 0
+        for size in sizes:
+            end = start + 2 * size
+            polygons.append(QtGui.QPolygonF(
+                [QPointF(coordinates[i], coordinates[i + 1])
+                 for i in range(start, end, 2)]))
+            start = end
+        face_brushes = [brushes[int(shade * (SHADE_LEVELS - 1) + 0.5)]
+                        for shade in shades]
+        if coordinates:
+            xs = coordinates[0::2]
+            ys = coordinates[1::2]
+            bounds = QtCore.QRectF(QtCore.QPointF(min(xs), min(ys)),
+                                   QtCore.QPointF(max(xs), max(ys)))
+        else:
+            bounds = QtCore.QRectF()
+    return polygons, face_brushes, bounds
+
+
+def prepare_frame(frame):
+    """Prepare a frame computed by Model.frame, a (kind, data) pair,
+    for the item painting frames of that kind (see Model.present).
+    """
+    kind, data = frame
+    if kind == 'faces':
+        return kind, prepare_faces(*data)
+    return kind, prepare_lines(data)
+
+
+class WireframeItem(QtGui.QGraphicsItem):
+    """A single scene item painting all the edges of a model.
+
+    Adding one QGraphicsLineItem per edge makes both the memory used by
+    the scene and the time it takes to repaint it grow with a large
+    constant; this item only keeps the segments in a list and draws
+    them with a single QPainter.drawLines call.
+    """
+
+    def __init__(self, parent = None):
+        super(WireframeItem, self).__init__(parent)
+        self.pen = QtGui.QPen()
+        self.lines = []
+        self.bounds = QtCore.QRectF()
+
+    def set_color(self, color):
+        """Paint the segments in the given RGB colour."""
+        self.pen = QtGui.QPen(QtGui.QColor(*color))
+        self.update()
+
+    def set_lines(self, lines):
+        """Replace the painted segments by new ones, given as a flat
+        sequence of x1, y1, x2, y2 quadruples.
+        """
+        self.set_geometry(*prepare_lines(lines))
+
+    def set_geometry(self, segments, bounds):
+        """Replace the painted segments by ones already prepared by
+        prepare_lines; this is all that's left for the GUI thread.
+        """
+        self.prepareGeometryChange()
+        self.lines = segments
+        self.bounds = bounds
+        self.update()
+
+    def boundingRect(self):
+        # Leave some room for the width of the pen.
+        return self.bounds.adjusted(-1, -1, 1, 1)
+
+    def paint(self, painter, option, widget = None):
+        with profiler.stage('paint'):
+            painter.setPen(self.pen)
+            painter.drawLines(self.lines)
+
+
+class FacesItem(QtGui.QGraphicsItem):
+    """A single scene item painting the faces of a model as filled
+    polygons, one after another in the order they are given, so that
+    the closer ones cover the farther ones (the painter's algorithm).
+    """
+
+    def __init__(self, parent = None):
+        super(FacesItem, self).__init__(parent)
+        self.polygons = []
+        self.brushes = []
+        self.bounds = QtCore.QRectF()
+
+    def set_geometry(self, polygons, brushes, bounds):
+        """Replace the painted faces by ones already prepared by
+        prepare_faces.
+        """
+        self.prepareGeometryChange()
+        self.polygons = polygons
+        self.brushes = brushes
+        self.bounds = bounds
+        self.update()
+
+    def clear(self):
+        self.set_geometry([], [], QtCore.QRectF())
+
+    def boundingRect(self):
+        return self.bounds
+
+    def paint(self, painter, option, widget = None):
+        with profiler.stage('paint'):
+            painter.setPen(QtCore.Qt.NoPen)
+            current = None
+            for polygon, brush in zip(self.polygons, self.brushes):
+                if brush is not current:
+                    painter.setBrush(brush)
+                    current = brush
+                painter.drawPolygon(polygon)
+
+
+class HighlightItem(QtGui.QGraphicsItem):
+    """Item marking the face and the vertex under the cursor (see
+    obj_viewer.picking) on top of the model.
+    """
+
+    def __init__(self, parent = None):
+        super(HighlightItem, self).__init__(parent)
+        self.pen = QtGui.QPen(QtGui.QColor(*HIGHLIGHT_COLOR), 2)
+        self.face = QtGui.QPolygonF()
+        self.vertex = None
+        self.bounds = QtCore.QRectF()
+        self.setZValue(1)
+
+    def set_highlight(self, face = None, vertex = None):
+        """Mark the face given by the screen coordinates of its corners
+        and the vertex given by its own; None stands for nothing.
+        """
+        self.prepareGeometryChange()
+        self.face = QtGui.QPolygonF([QtCore.QPointF(x, y)
+                                     for x, y in face or []])
+        self.vertex = (QtCore.QPointF(*vertex) if vertex is not None
+                       else None)
+        self.bounds = self.face.boundingRect()
+        if self.vertex is not None:
+            marker = QtCore.QRectF(self.vertex, self.vertex).adjusted(
+                -HIGHLIGHT_VERTEX_SIZE, -HIGHLIGHT_VERTEX_SIZE,
+                HIGHLIGHT_VERTEX_SIZE, HIGHLIGHT_VERTEX_SIZE)
+            self.bounds = (self.bounds.united(marker) if face
+                           else marker)
+        self.update()
+
+    def boundingRect(self):
+        return self.bounds.adjusted(-2, -2, 2, 2)
+
+    def paint(self, painter, option, widget = None):
+        painter.setPen(self.pen)
+        if len(self.face):
+            painter.drawPolygon(self.face)
+        if self.vertex is not None:
+            painter.drawEllipse(self.vertex, HIGHLIGHT_VERTEX_SIZE,
+                                HIGHLIGHT_VERTEX_SIZE)
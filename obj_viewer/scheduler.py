@@ -0,0 +1,54 @@
+"""Coalescing of transformations requested faster than they can be
+rendered.
+"""
+import time
+
+from obj_viewer.constants import MAX_FRAME_RATE
+
+
+class TransformQueue(object):
+    """Collects the transformations requested since the last frame and
+    composes them into a single matrix, so that a burst of button
+    presses (or a held-down key) results in one render instead of one
+    per press.
+
+    The queue doesn't render anything itself; it only tells its owner
+    when the next frame may be drawn, so that at most MAX_FRAME_RATE
+    frames are drawn per second.
+    """
+
+    def __init__(self, max_frame_rate = MAX_FRAME_RATE, clock = time.time):
+        self.min_interval = 1.0 / max_frame_rate
+        self.clock = clock
+        self.pending = None
+        self.last_frame = None
+
+    def __len__(self):
+        return 0 if self.pending is None else 1
+
+    def push(self, transformation):
+        if self.pending is None:
+            self.pending = transformation
+        else:
+            self.pending = self.pending * transformation
+
+    def clear(self):
+        self.pending = None
+
+    def delay(self):
+        """Return the number of milliseconds to wait before the next
+        frame may be drawn.
+        """
+        if self.last_frame is None:
+            return 0
+        remaining = self.last_frame + self.min_interval - self.clock()
+        return max(0, int(remaining * 1000))
+
+    def take(self):
+        """Return the composed pending transformation (or None) and
+        empty the queue; the caller is expected to render a frame.
+        """
+        transformation = self.pending
+        self.pending = None
+        self.last_frame = self.clock()
+        return transformation
@@ -0,0 +1,193 @@
+"""A compact representation of the transformations applied to a model.
+
+Every combination of rotations, translations and uniform scalings maps
+a point p to
+
+    s * R(p) + t
+
+where R is a rotation, kept as a unit quaternion, s a positive factor
+and t a translation. Composing two such transformations is a few dozen
+multiplications instead of a full 4x4 matrix product. Unlike a product
+of rotation matrices, which slowly stops being orthogonal as rounding
+errors pile up, a quaternion is easily brought back to unit length;
+this is done every TRS_RENORMALIZE_INTERVAL compositions.
+"""
+import math
+
+from obj_viewer.constants import TRS_RENORMALIZE_INTERVAL, TRS_TOLERANCE
+from obj_viewer.errors import IncompatibleTransformationError
+from obj_viewer.matrices import AffineMatrix, Translation, Scaling
+
+
+class TRS(object):
+    """An immutable rotation, uniform scaling and translation, applied
+    in this order.
+
+    rotation    -- the (w, x, y, z) unit quaternion of the rotation
+    scale       -- the scaling factor (positive)
+    translation -- the (x, y, z) offset
+    """
+
+    __slots__ = ('rotation', 'scale', 'translation', 'compositions')
+
+    def __init__(self, rotation = (1.0, 0.0, 0.0, 0.0), scale = 1.0,
+                 translation = (0.0, 0.0, 0.0), compositions = 0):
+        self.rotation = rotation
+        self.scale = scale
+        self.translation = translation
+        # The number of compositions since the quaternion has last been
+        # normalized.
+        self.compositions = compositions
+
+    def __repr__(self):
+        return 'TRS(%r, %r, %r)' % (self.rotation, self.scale,
+                                    self.translation)
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """Decompose an affine matrix (in the row-vector convention of
+        AffineMatrix) made of rotations, translations and uniform
+        scalings; raise IncompatibleTransformationError for anything
+        else, such as a shear or a mirroring.
+        """
+        if isinstance(matrix, Translation):
+            return cls(translation = matrix.cells[9:])
+        if isinstance(matrix, Scaling):
+            if matrix.cells[0] <= 0:
+                raise IncompatibleTransformationError(
+                    'A TRS can only scale by a positive factor.')
+            return cls(scale = matrix.cells[0])
+        if not isinstance(matrix, AffineMatrix):
+            matrix = AffineMatrix([cell for row in matrix[:3]
+                                   for cell in row[:3]] +
+                                  list(matrix[3][:3]))
+        cells = matrix.cells
+        # The rows of the linear part are the images of the axes, i.e.
+        # the columns of s * R.
+        columns = (cells[0:3], cells[3:6], cells[6:9])
+        determinant = _dot(columns[0], _cross(columns[1], columns[2]))
+        if determinant <= 0:
+            raise IncompatibleTransformationError(
+                'The transformation is not a rotation, translation or '
+                'uniform scaling.')
+        scale = determinant ** (1.0 / 3)
+        rotation = [[columns[c][r] / scale for c in range(3)]
+                    for r in range(3)]
+        for i in range(3):
+            for j in range(3):
+                product = sum(rotation[k][i] * rotation[k][j]
+                              for k in range(3))
+                if abs(product - (i == j)) > TRS_TOLERANCE:
+                    raise IncompatibleTransformationError(
+                        'The transformation is not a rotation, '
+                        'translation or uniform scaling.')
+        return cls(_quaternion(rotation), scale, cells[9:12])
+
+    def then(self, other):
+        """Return the transformation applying this one and then other,
+        which is either a TRS or an affine matrix (see from_matrix).
+        The equivalent of multiplying the matrices, self * other.
+        """
+        if isinstance(other, Translation):
+            x, y, z = self.translation
+            dx, dy, dz = other.cells[9:]
+            return TRS(self.rotation, self.scale, (x + dx, y + dy, z + dz),
+                       self.compositions)
+        if isinstance(other, Scaling) and other.cells[0] > 0:
+            # Leaves the rotation (and so the normals) exactly as it is.
+            factor = other.cells[0]
+            x, y, z = self.translation
+            return TRS(self.rotation, self.scale * factor,
+                       (factor * x, factor * y, factor * z),
+                       self.compositions)
+        if not isinstance(other, TRS):
+            other = TRS.from_matrix(other)
+        w1, x1, y1, z1 = self.rotation
+        w2, x2, y2, z2 = other.rotation
+        rotation = (w2 * w1 - x2 * x1 - y2 * y1 - z2 * z1,
+                    w2 * x1 + x2 * w1 + y2 * z1 - z2 * y1,
+                    w2 * y1 - x2 * z1 + y2 * w1 + z2 * x1,
+                    w2 * z1 + x2 * y1 - y2 * x1 + z2 * w1)
+        compositions = self.compositions + 1
+        if compositions >= TRS_RENORMALIZE_INTERVAL:
+            rotation = _normalized(rotation)
+            compositions = 0
+        x, y, z = other.rotate(*self.translation)
+        dx, dy, dz = other.translation
+        scale = other.scale
+        return TRS(rotation, self.scale * scale,
+                   (scale * x + dx, scale * y + dy, scale * z + dz),
+                   compositions)
+
+    def rotate(self, x, y, z):
+        """Return the vector (x, y, z) rotated by the rotation."""
+        (a, b, c), (d, e, f), (g, h, i) = _rotation_matrix(self.rotation)
+        return (a * x + b * y + c * z,
+                d * x + e * y + f * z,
+                g * x + h * y + i * z)
+
+    def normalized(self):
+        """Return the same transformation with a unit quaternion."""
+        return TRS(_normalized(self.rotation), self.scale,
+                   self.translation)
+
+    def matrix(self):
+        """Return the transformation as an AffineMatrix."""
+        rotation = _rotation_matrix(self.rotation)
+        s = self.scale
+        return AffineMatrix([s * rotation[r][c] for c in range(3)
+                             for r in range(3)] + list(self.translation))
+
+
+def _dot(u, v):
+    return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+
+
+def _cross(u, v):
+    return (u[1] * v[2] - u[2] * v[1],
+            u[2] * v[0] - u[0] * v[2],
+            u[0] * v[1] - u[1] * v[0])
+
+
+def _normalized(quaternion):
+    w, x, y, z = quaternion
+    length = math.sqrt(w * w + x * x + y * y + z * z)
+    return (w / length, x / length, y / length, z / length)
+
+
+def _rotation_matrix(quaternion):
+    """Return the rotation matrix (acting on column vectors) of a unit
+    quaternion as a tuple of rows.
+    """
+    w, x, y, z = quaternion
+    return ((1 - 2 * (y * y + z * z), 2 * (x * y - w * z),
+             2 * (x * z + w * y)),
+            (2 * (x * y + w * z), 1 - 2 * (x * x + z * z),
+             2 * (y * z - w * x)),
+            (2 * (x * z - w * y), 2 * (y * z + w * x),
+             1 - 2 * (x * x + y * y)))
+
+
+def _quaternion(m):
+    """Return the unit quaternion of a rotation matrix acting on column
+    vectors, choosing the largest of the four possible divisors for
+    numerical stability.
+    """
+    trace = m[0][0] + m[1][1] + m[2][2]
+    if trace > 0:
+        s = 2 * math.sqrt(trace + 1)
+        quaternion = (s / 4, (m[2][1] - m[1][2]) / s,
+                      (m[0][2] - m[2][0]) / s, (m[1][0] - m[0][1]) / s)
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+        s = 2 * math.sqrt(1 + m[0][0] - m[1][1] - m[2][2])
+        quaternion = ((m[2][1] - m[1][2]) / s, s / 4,
+                      (m[0][1] + m[1][0]) / s, (m[0][2] + m[2][0]) / s)
+    elif m[1][1] > m[2][2]:
+        s = 2 * math.sqrt(1 + m[1][1] - m[0][0] - m[2][2])
+        quaternion = ((m[0][2] - m[2][0]) / s, (m[0][1] + m[1][0]) / s,
+                      s / 4, (m[1][2] + m[2][1]) / s)
+    else:
+        s = 2 * math.sqrt(1 + m[2][2] - m[0][0] - m[1][1])
+        quaternion = ((m[1][0] - m[0][1]) / s, (m[0][2] + m[2][0]) / s,
+                      (m[1][2] + m[2][1]) / s, s / 4)
+    return _normalized(quaternion)
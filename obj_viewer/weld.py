@@ -0,0 +1,257 @@
+"""Merging of duplicated vertices, done once after a file is loaded.
+
+Many exporters write every corner of every face as a vertex of its
+own, so a closed mesh has several copies of each point; they all have
+to be projected every frame and keep the edges of neighbouring faces
+from being recognized as shared. Welding maps vertices lying within
+a tolerance of each other onto one of them (the first in the file) and
+drops the vertices no face refers to.
+
+Nearby vertices are found with a hash grid of cells twice as large as
+the tolerance, so that rounding can't put two vertices within it more
+than one cell apart: every vertex is compared with those in its own
+and the neighbouring cells, and the pairs that really lie within the
+tolerance are joined into groups by a union-find. No two vertices
+within the tolerance are ever kept apart; vertices farther apart may
+end up merged through chains of neighbours.
+"""
+import itertools
+import math
+from array import array
+
+from obj_viewer.constants import WELD_TOLERANCE
+from obj_viewer.mesh import Mesh
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Bumped whenever welding may give different results, so that cached
+# welded meshes are not reused.
+WELD_REVISION = 2
+
+# The neighbouring cells each cell is compared with; the others are
+# compared with it from their side.
+_NEIGHBOURS = [offset
+               for offset in itertools.product((-1, 0, 1), repeat = 3)
+               if offset > (0, 0, 0)]
+
+
+def weld_vertices(mesh, tolerance = WELD_TOLERANCE):
+    """Return a new Mesh with the vertices of mesh within tolerance of
+    each other merged and the unused ones dropped, its faces referring
+    to the remaining vertices, which are kept in the order they first
+    appear in.
+    """
+    if numpy is not None:
+        coordinates, indices = _weld_numpy(mesh, tolerance)
+    else:
+        remap, kept = _weld(mesh, tolerance)
+        coordinates = array('d')
+        for v in kept:
+            coordinates.extend(mesh.coordinates[3 * v:3 * v + 3])
+        indices = array('i', [remap[v] for v in mesh.face_indices])
+    return Mesh(coordinates, texcoords = mesh.texcoords,
+                normals = mesh.normals, face_offsets = mesh.face_offsets,
+                face_indices = indices)
+
+
+def _weld(mesh, tolerance):
+    """Return the new index of every vertex (-1 for unused ones) and
+    the old indices of the vertices kept, in their new order.
+    """
+    coordinates = mesh.coordinates
+    used = sorted(set(mesh.face_indices))
+    size = 2.0 * tolerance
+    limit = tolerance * tolerance
+    # The vertex each one is merged into, for the union-find; the first
+    # vertex of every group is its root.
+    target = array('i', range(mesh.vertex_count))
+    # Copies of the same point are merged right away; only the first
+    # of them is looked for in the grid, which keeps the number of
+    # pairs in a cell down.
+    points = {}
+    cells = {}
+    for v in used:
+        point = tuple(coordinates[3 * v:3 * v + 3])
+        earlier = points.setdefault(point, v)
+        if earlier != v:
+            target[v] = earlier
+            continue
+        key = tuple([int(math.floor(c / size)) for c in point])
+        cells.setdefault(key, []).append(v)
+
+    def find(v):
+        while target[v] != v:
+            target[v] = target[target[v]]
+            v = target[v]
+        return v
+
+    def join(first, second):
+        for u in first:
+            ux, uy, uz = coordinates[3 * u:3 * u + 3]
+            for v in second:
+                dx = coordinates[3 * v] - ux
+                dy = coordinates[3 * v + 1] - uy
+                dz = coordinates[3 * v + 2] - uz
+                if dx * dx + dy * dy + dz * dz <= limit:
+                    u_root = find(u)
+                    v_root = find(v)
+                    if u_root < v_root:
+                        target[v_root] = u_root
+                    elif v_root < u_root:
+                        target[u_root] = v_root
+
+    for (i, j, k), members in cells.items():
+        for n in range(1, len(members)):
+            join(members[n:n + 1], members[:n])
+        for di, dj, dk in _NEIGHBOURS:
+            others = cells.get((i + di, j + dj, k + dk))
+            if others:
+                join(members, others)
+    remap = array('i', [-1]) * mesh.vertex_count
+    kept = []
+    for v in used:
+        if find(v) == v:
+            remap[v] = len(kept)
+            kept.append(v)
+    for v in used:
+        remap[v] = remap[target[v]]
+    return remap, kept
+
+
+def _weld_numpy(mesh, tolerance):
+    points = numpy.frombuffer(mesh.coordinates, dtype = float).reshape(-1, 3)
+    indices = numpy.frombuffer(mesh.face_indices, dtype = numpy.intc)
+    # The vertices that are used, in their order in the file.
+    used = numpy.flatnonzero(numpy.bincount(indices,
+                                            minlength = len(points)))
+    groups = _group_numpy(points[used], tolerance)
+    survivors = used[groups == numpy.arange(len(used))]
+    target = numpy.arange(len(points))
+    target[used] = used[groups]
+    remap = numpy.empty(len(points), dtype = numpy.intc)
+    remap[survivors] = numpy.arange(len(survivors), dtype = numpy.intc)
+    coordinates = array('d')
+    coordinates.frombytes(points[survivors].tobytes())
+    welded = array('i')
+    welded.frombytes(remap[target[indices]].tobytes())
+    return coordinates, welded
+
+
+def _group_numpy(points, tolerance):
+    """Return the index of the first point of the group every point
+    is merged into, as _weld does.
+    """
+    # Copies of the same point, which come together once sorted, are
+    # merged right away; only one of them is looked for in the grid,
+    # which keeps the number of pairs in a cell down.
+    order = numpy.lexsort(points.T[::-1])
+    copies = numpy.zeros(len(points), dtype = bool)
+    copies[1:] = (points[order[1:]] == points[order[:-1]]).all(axis = 1)
+    firsts = [order[:-1][copies[1:]]]
+    seconds = [order[1:][copies[1:]]]
+    order = order[~copies]
+    # Sort the rest by their cells, x first.
+    cells = numpy.floor(points[order] /
+                        (2.0 * tolerance)).astype(numpy.int64)
+    by_cell = numpy.lexsort(cells.T[::-1])
+    order = order[by_cell]
+    cells = cells[by_cell]
+    count = len(order)
+    new_cell = numpy.ones(count, dtype = bool)
+    new_cell[1:] = (cells[1:] != cells[:-1]).any(axis = 1)
+    starts = numpy.flatnonzero(new_cell)
+    sizes = numpy.diff(numpy.append(starts, count))
+    cells = cells[starts]
+    # The cells are numbered along every axis by the distinct values
+    # taken there; steps[axis][step + 1] maps these numbers to those of
+    # the adjacent values (-1 if no cell takes them).
+    ranks = []
+    steps = []
+    lengths = []
+    for axis in range(3):
+        values, rank = numpy.unique(cells[:, axis], return_inverse = True)
+        adjacent = numpy.flatnonzero(values[1:] == values[:-1] + 1)
+        following = numpy.full(len(values), -1)
+        following[adjacent] = adjacent + 1
+        preceding = numpy.full(len(values), -1)
+        preceding[adjacent + 1] = adjacent
+        ranks.append(rank.ravel())
+        steps.append((preceding, numpy.arange(len(values)), following))
+        lengths.append(len(values))
+    # A single key per cell, in the order of the cells: the rows (pairs
+    # of x and y numbers, which come sorted) are numbered as well, so
+    # that it can't overflow.
+    _, height, depth = lengths
+    rows = ranks[0] * height + ranks[1]
+    rows = rows[numpy.diff(rows, prepend = -1) != 0]
+
+    def key(x, y, z):
+        row = x * height + y
+        found = numpy.minimum(numpy.searchsorted(rows, row), len(rows) - 1)
+        valid = (x >= 0) & (y >= 0) & (z >= 0) & (rows[found] == row)
+        return numpy.where(valid, found * depth + z, -1)
+
+    keys = key(*ranks)
+    # Pairs of points from the same cell...
+    crowded = numpy.flatnonzero(sizes > 1)
+    one, other = _pairs(starts[crowded], sizes[crowded], starts[crowded],
+                        sizes[crowded])
+    candidates = [(one[one < other], other[one < other])]
+    # ... and from neighbouring ones.
+    for offset in _NEIGHBOURS:
+        wanted = key(*[steps[axis][step + 1][ranks[axis]]
+                       for axis, step in enumerate(offset)])
+        found = numpy.minimum(numpy.searchsorted(keys, wanted),
+                              len(keys) - 1)
+        matched = (wanted >= 0) & (keys[found] == wanted)
+        candidates.append(_pairs(starts[matched], sizes[matched],
+                                 starts[found[matched]],
+                                 sizes[found[matched]]))
+    one = order[numpy.concatenate([pair[0] for pair in candidates])]
+    other = order[numpy.concatenate([pair[1] for pair in candidates])]
+    difference = points[one] - points[other]
+    close = (difference[:, 0] * difference[:, 0] +
+             difference[:, 1] * difference[:, 1] +
+             difference[:, 2] * difference[:, 2] <= tolerance * tolerance)
+    firsts.append(one[close])
+    seconds.append(other[close])
+    return _components(len(points), numpy.concatenate(firsts),
+                       numpy.concatenate(seconds))
+
+
+def _pairs(first_starts, first_sizes, second_starts, second_sizes):
+    """Return the positions of all the pairs of points, one from each
+    of the matching ranges of the two.
+    """
+    products = first_sizes * second_sizes
+    owners = numpy.repeat(numpy.arange(len(products)), products)
+    steps = (numpy.arange(len(owners)) -
+             numpy.repeat(numpy.cumsum(products) - products, products))
+    widths = second_sizes[owners]
+    return (first_starts[owners] + steps // widths,
+            second_starts[owners] + steps % widths)
+
+
+def _components(count, first, second):
+    """Return the smallest member of the connected component of each
+    of count nodes joined by the edges first[i]-second[i].
+    """
+    labels = numpy.arange(count)
+    while True:
+        # Hook the root of every edge's larger end onto the smaller one
+        # and then let every node point straight to its root.
+        low = numpy.minimum(labels[first], labels[second])
+        hooked = labels.copy()
+        numpy.minimum.at(hooked, labels[first], low)
+        numpy.minimum.at(hooked, labels[second], low)
+        while True:
+            jumped = hooked[hooked]
+            if (jumped == hooked).all():
+                break
+            hooked = jumped
+        if (hooked == labels).all():
+            return labels
+        labels = hooked
@@ -0,0 +1,612 @@
+"""The main window of the viewer."""
+import sys
+
+from PySide import QtGui
+from PySide import QtCore
+
+from obj_viewer.lib import pyside_dynamic
+from obj_viewer.constants import (APP_NAME, EOL, FACTOR_PLUS, FACTOR_MINUS,
+                                  LOD_IDLE_MS, STATS_INTERVAL_MS,
+                                  PICK_INTERVAL_MS, INSTANCE_OFFSET)
+from obj_viewer.loader import ModelExporter, ModelLoader, PickerBuilder
+from obj_viewer.matrices import Rotation, Translation, Scaling
+from obj_viewer.model import Model, frames
+from obj_viewer.profiling import clock, profiler
+from obj_viewer.registry import MeshRegistry
+from obj_viewer.renderer import FrameWorker
+from obj_viewer.scene import HighlightItem
+from obj_viewer.scheduler import TransformQueue
+
+
+class Layout(QtGui.QMainWindow):
+
+    def __init__(self, *args, **kwargs):
+        # super().__init__(*args, **kwargs)
+        super(Layout, self).__init__(*args, **kwargs)
+        pyside_dynamic.loadUi('obj_viewer/gui/layout.ui', self)
+        # TODO: do we really need to remember the current file?
+        self.current_file = None
+        # All the models in the scene; transformations apply to the
+        # active one, self.model. Models of the same file share their
+        # geometry, which is looked up in the registry.
+        self.models = []
+        self.model = None
+        self.registry = MeshRegistry()
+        # While a file is being loaded in the background, a preview
+        # of what has been parsed so far is shown instead of a model.
+        self.loader = None
+        self.preview = None
+        self.progress = None
+        # Whether the model being loaded is added to the scene rather
+        # than replacing the models in it.
+        self.adding = False
+        self.scene = QtGui.QGraphicsScene()
+        self.view.setScene(self.scene)
+        # Interactive transforms may draw a simplified mesh; once they
+        # stop coming, the model is drawn in full detail again.
+        self.idle_timer = QtCore.QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(LOD_IDLE_MS)
+        self.idle_timer.timeout.connect(self.render_full_detail)
+        # Transforms requested before the next frame are composed and
+        # rendered at once.
+        self.transforms = TransformQueue()
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.render_frame)
+        # Frames are projected on a worker thread; only the newest one
+        # that comes back is shown.
+        self.frame_id = 0
+        self.shown_frame = 0
+        # When the frames still on their way were asked for, or rather
+        # when the input leading to them came in (see frame_ready).
+        self.frame_started = {}
+        self.input_time = None
+        self.renderer = FrameWorker(self)
+        self.renderer.ready.connect(self.frame_ready)
+        QtCore.QCoreApplication.instance().aboutToQuit.connect(
+            self.stop_renderer)
+        self.renderer.start()
+        # Frame statistics are only gathered while they are shown,
+        # unless profiling has been enabled for the whole session.
+        self.profiling = profiler.enabled
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.setInterval(STATS_INTERVAL_MS)
+        self.stats_timer.timeout.connect(self.update_stats)
+        # What's under the cursor is looked up at most once every
+        # PICK_INTERVAL_MS, and only while inspecting the model.
+        self.cursor = None
+        self.picker_builder = None
+        self.highlight = HighlightItem()
+        self.scene.addItem(self.highlight)
+        self.pick_timer = QtCore.QTimer(self)
+        self.pick_timer.setSingleShot(True)
+        self.pick_timer.setInterval(PICK_INTERVAL_MS)
+        self.pick_timer.timeout.connect(self.update_pick)
+        self.view.viewport().setMouseTracking(True)
+        self.view.viewport().installEventFilter(self)
+        self.assign_icons()
+        self.update_transform_controls()
+        self.connect_controls()
+        self.set_view()
+
+    def connect_controls(self):
+        """Connect relevant signals to their slots."""
+        # Generate functions to connect to:
+        rotate_x = self.transformation_clicked(rotate = {'axis': 'x'})
+        rotate_y = self.transformation_clicked(rotate = {'axis': 'y'})
+        rotate_z = self.transformation_clicked(rotate = {'axis': 'z'})
+        transl_x = self.transformation_clicked(translate = {'axis': 'x'})
+        transl_y = self.transformation_clicked(translate = {'axis': 'y'})
+        transl_z = self.transformation_clicked(translate = {'axis': 'z'})
+        scale_up = self.transformation_clicked(scale =
+                                               {'factor': FACTOR_PLUS})
+        scale_down = self.transformation_clicked(scale =
+                                                 {'factor': FACTOR_MINUS})
+        # Main menu:
+        self.openAction.triggered.connect(self.choose_file)
+        self.addModelAction.triggered.connect(self.add_model_clicked)
+        self.addInstanceAction.triggered.connect(self.add_instance_clicked)
+        self.nextInstanceAction.triggered.connect(self.next_instance_clicked)
+        self.exportAction.triggered.connect(self.export_clicked)
+        self.quitAction.triggered.connect(QtCore.QCoreApplication.instance().quit)
+        self.resetAction.triggered.connect(self.reset_clicked)
+        self.rotateXAction.triggered.connect(rotate_x)
+        self.rotateYAction.triggered.connect(rotate_y)
+        self.rotateZAction.triggered.connect(rotate_z)
+        self.translateXAction.triggered.connect(transl_x)
+        self.translateYAction.triggered.connect(transl_y)
+        self.translateZAction.triggered.connect(transl_z)
+        self.scaleUpAction.triggered.connect(scale_up)
+        self.scaleDownAction.triggered.connect(scale_down)
+        self.cullingAction.toggled.connect(self.culling_toggled)
+        self.filledAction.toggled.connect(self.filled_toggled)
+        self.statsAction.toggled.connect(self.stats_toggled)
+        self.pickFacesAction.toggled.connect(self.inspect_toggled)
+        self.pickVerticesAction.toggled.connect(self.inspect_toggled)
+        # Left panel (application controls):
+        self.loadButton.clicked.connect(self.choose_file)
+        self.quitButton.clicked.connect(QtCore.QCoreApplication.instance().quit)
+        # Right panel (model transformation):
+        self.resetButton.clicked.connect(self.reset_clicked)
+        self.rotateXButton.clicked.connect(rotate_x)
+        self.rotateYButton.clicked.connect(rotate_y)
+        self.rotateZButton.clicked.connect(rotate_z)
+        self.translateXButton.clicked.connect(transl_x)
+        self.translateYButton.clicked.connect(transl_y)
+        self.translateZButton.clicked.connect(transl_z)
+        self.scaleUpButton.clicked.connect(scale_up)
+        self.scaleDownButton.clicked.connect(scale_down)
+
+    def assign_icons(self):
+        path = 'obj_viewer/gui/images/'
+        # Main menu:
+        self.openAction.setIcon(QtGui.QIcon(path + 'open.png'))
+        self.quitAction.setIcon(QtGui.QIcon(path + 'quit.png'))
+        self.resetAction.setIcon(QtGui.QIcon(path + 'reset.png'))
+        self.rotateMenu.setIcon(QtGui.QIcon(path + 'rotate_x.png'))
+        self.rotateXAction.setIcon(QtGui.QIcon(path + 'rotate_x.png'))
+        self.rotateYAction.setIcon(QtGui.QIcon(path + 'rotate_y.png'))
+        self.rotateZAction.setIcon(QtGui.QIcon(path + 'rotate_z.png'))
+        self.translateMenu.setIcon(QtGui.QIcon(path + 'translate_x.png'))
+        self.translateXAction.setIcon(QtGui.QIcon(path + 'translate_x.png'))
+        self.translateYAction.setIcon(QtGui.QIcon(path + 'translate_y.png'))
+        self.translateZAction.setIcon(QtGui.QIcon(path + 'translate_z.png'))
+        self.scaleUpAction.setIcon(QtGui.QIcon(path + 'scale_up.png'))
+        self.scaleDownAction.setIcon(QtGui.QIcon(path + 'scale_down.png'))
+        self.pickFacesAction.setIcon(QtGui.QIcon(path + 'face.png'))
+        self.pickVerticesAction.setIcon(QtGui.QIcon(path + 'vertex.png'))
+        
+        self.loadButton.setIcon(QtGui.QIcon(path + 'open.png'))
+        self.quitButton.setIcon(QtGui.QIcon(path + 'quit.png'))
+        self.resetButton.setIcon(QtGui.QIcon(path + 'reset.png'))
+        self.rotateXButton.setIcon(QtGui.QIcon(path + 'rotate_x.png'))
+        self.rotateYButton.setIcon(QtGui.QIcon(path + 'rotate_y.png'))
+        self.rotateZButton.setIcon(QtGui.QIcon(path + 'rotate_z.png'))
+        self.translateXButton.setIcon(QtGui.QIcon(path + 'translate_x.png'))
+        self.translateYButton.setIcon(QtGui.QIcon(path + 'translate_y.png'))
+        self.translateZButton.setIcon(QtGui.QIcon(path + 'translate_z.png'))
+        self.scaleUpButton.setIcon(QtGui.QIcon(path + 'scale_up.png'))
+        self.scaleDownButton.setIcon(QtGui.QIcon(path + 'scale_down.png'))
+
+    def set_view(self, filename = None, add = False):
+        """Paint either a blank scene (if no filename has been
+        specified) or start loading the model stored in the file in
+        the background; the model is painted once it's loaded. The
+        scene itself is kept; only the items of the previous models are
+        removed, unless the model is added to them. Files whose meshes
+        are in use already are not loaded again.
+        """
+        if filename is None:
+            filename = self.current_file
+        if filename is not None:
+            self.cancel_loading()
+            self.transforms.clear()
+            known = self.registry.get(filename)
+            if not add:
+                self.remove_models()
+            if known is not None:
+                self.add_model(*known)
+                return
+            self.adding = add
+            self.loader = ModelLoader(filename, self)
+            self.loader.progressed.connect(self.loading_progressed)
+            self.loader.previewed.connect(self.loading_previewed)
+            self.loader.loaded.connect(self.loading_finished)
+            self.loader.failed.connect(self.loading_failed)
+            self.loader.finished.connect(self.loader.deleteLater)
+            self.progress = QtGui.QProgressDialog('Loading %s...' % filename,
+                                                  'Cancel', 0, 1000, self)
+            self.progress.setWindowTitle(APP_NAME)
+            self.progress.setMinimumDuration(500)
+            self.progress.canceled.connect(self.cancel_loading)
+            self.loader.start()
+        self.update_transform_controls()
+        self.view.show()
+
+    def remove_models(self):
+        """Take both the models and the preview off the scene."""
+        self.remove_preview()
+        for model in self.models:
+            model.remove()
+        self.models = []
+        self.model = None
+        self.picker_builder = None
+        self.update_pick()
+
+    def add_model(self, mesh, levels, placement = None):
+        """Add a model of the mesh to the scene and make it the active
+        one; its placement is the identity unless given.
+        """
+        model = Model(self.scene, mesh = mesh, levels = levels)
+        model.culling = self.cullingAction.isChecked()
+        model.filled = self.filledAction.isChecked()
+        if placement is not None:
+            model.placement = placement
+        self.models.append(model)
+        self.select_model(model)
+        self.request_frame()
+
+    def select_model(self, model):
+        """Make the model the one transformations apply to."""
+        # Transformations still waiting for the next frame belong to
+        # the previously active model.
+        pending = self.transforms.take()
+        if pending is not None and self.model is not None:
+            self.model.transform(pending, render = False)
+        self.model = model
+        for other in self.models:
+            other.set_active(other is model)
+        if model.picker is None:
+            # Instances of the same mesh can share their picker.
+            for other in self.models:
+                if other.mesh is model.mesh and other.picker is not None:
+                    model.picker = other.picker
+                    break
+        if self.inspecting():
+            self.build_picker()
+        self.update_pick()
+        self.update_matrix()
+        self.update_transform_controls()
+        if pending is not None:
+            # Nothing else would show where they have left the old one.
+            self.request_frame()
+
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        self.close_progress()
+        self.remove_preview()
+
+    def remove_preview(self):
+        if self.preview is not None:
+            self.preview.remove()
+            self.preview = None
+
+    def close_progress(self):
+        if self.progress is not None:
+            progress = self.progress
+            self.progress = None
+            progress.canceled.disconnect(self.cancel_loading)
+            progress.reset()
+            progress.hide()
+
+    def loading_progressed(self, done, total):
+        if self.sender() is self.loader and self.progress is not None:
+            self.progress.setValue(1000 * done // max(total, 1))
+
+    def loading_previewed(self, mesh):
+        if self.sender() is not self.loader:
+            return
+        if self.preview is not None:
+            self.preview.remove()
+        self.preview = Model(self.scene, mesh = mesh, levels = [])
+        self.preview.render()
+
+    def loading_finished(self, mesh, levels):
+        """Swap the preview for the loaded model in one go."""
+        if self.sender() is not self.loader:
+            return
+        self.registry.add(self.loader.filename, mesh, levels)
+        self.loader = None
+        self.close_progress()
+        if self.adding:
+            self.remove_preview()
+        else:
+            self.remove_models()
+        self.add_model(mesh, levels)
+
+    def loading_failed(self, message):
+        if self.sender() is not self.loader:
+            return
+        self.loader = None
+        self.close_progress()
+        if self.adding:
+            self.remove_preview()
+        else:
+            self.remove_models()
+        self.update_transform_controls()
+        self.show_error(message)
+
+    def show_error(self, message):
+        err = QtGui.QMessageBox(self)
+        err.setWindowTitle('Oops!')
+        err.setText(message)
+        err.exec()
+        sys.stderr.write(message + EOL)
+
+    def update_transform_controls(self):
+        """Either enable or disable the model transformation controls
+        (e.g. the rotation buttons) based on whether there's a model
+        to apply them to.
+        """
+        if self.model is not None:
+            self.infoBox.setEnabled(True)
+            self.resetButton.setEnabled(True)
+            self.rotationBox.setEnabled(True)
+            self.scalingBox.setEnabled(True)
+            self.translationBox.setEnabled(True)
+            self.modelMenu.setEnabled(True)
+            self.exportAction.setEnabled(True)
+            self.loadButton.setDefault(False)
+        else:
+            self.infoBox.setEnabled(False)
+            self.resetButton.setEnabled(False)
+            self.rotationBox.setEnabled(False)
+            self.scalingBox.setEnabled(False)
+            self.translationBox.setEnabled(False)
+            self.modelMenu.setEnabled(False)
+            self.exportAction.setEnabled(False)
+            self.loadButton.setDefault(True)
+
+    def ask_file(self):
+        """Show a dialog that enables the user to choose a model file;
+        return its name or None if the dialog has been cancelled.
+        """
+        dialog = QtGui.QFileDialog(self)
+        dialog.setFileMode(QtGui.QFileDialog.ExistingFile)
+        dialog.setNameFilter("Models (*.obj *.mesh);;Wavefront OBJ (*.obj);;"
+                             "Binary mesh (*.mesh)")
+        if dialog.exec_():
+            return dialog.selectedFiles()[0]
+        return None
+
+    def choose_file(self):
+        """Let the user choose a file to load, then set the view
+        accordingly.
+        """
+        filename = self.ask_file()
+        if filename is not None:
+            self.current_file = filename
+            self.set_view(self.current_file)
+
+    def add_model_clicked(self):
+        """Let the user choose a file and add its model to the scene."""
+        filename = self.ask_file()
+        if filename is not None:
+            self.set_view(filename, add = True)
+
+    def add_instance_clicked(self):
+        """Add another instance of the active model next to it."""
+        if self.model is not None:
+            placement = self.model.placement.then(
+                Translation('x', INSTANCE_OFFSET))
+            self.add_model(self.model.mesh, self.model.levels, placement)
+
+    def next_instance_clicked(self):
+        if len(self.models) > 1:
+            position = self.models.index(self.model)
+            self.select_model(self.models[(position + 1) % len(self.models)])
+
+    def export_clicked(self):
+        """Ask for a file to export the model into, as it is transformed
+        now, and write it in the background.
+        """
+        dialog = QtGui.QFileDialog(self)
+        dialog.setAcceptMode(QtGui.QFileDialog.AcceptSave)
+        dialog.setNameFilters(["Wavefront OBJ (*.obj)",
+                               "Binary mesh (*.mesh)"])
+        dialog.setDefaultSuffix('obj')
+        dialog.filterSelected.connect(
+            lambda name: dialog.setDefaultSuffix(
+                'mesh' if '*.mesh' in name else 'obj'))
+        if not dialog.exec_() or self.model is None:
+            return
+        exporter = ModelExporter(self.model.mesh, self.model.current_mod,
+                                 dialog.selectedFiles()[0], self)
+        exporter.exported.connect(self.export_finished)
+        exporter.failed.connect(self.show_error)
+        exporter.finished.connect(exporter.deleteLater)
+        exporter.start()
+
+    def export_finished(self, filename):
+        print('The model has been exported into %s.' % filename)
+
+    def reset_clicked(self):
+        self.transforms.clear()
+        self.model.reset(render = False)
+        self.request_frame()
+        self.update_matrix()
+
+    def culling_toggled(self, checked):
+        for model in self.models:
+            model.culling = checked
+        self.request_frame()
+
+    def filled_toggled(self, checked):
+        for model in self.models:
+            model.filled = checked
+        self.request_frame()
+
+    def transformation_clicked(self, rotate = None,
+                               translate = None, scale = None):
+        if rotate is not None:
+            matrix = Rotation(**rotate)
+        elif translate is not None:
+            matrix = Translation(**translate)
+        elif scale is not None:
+            matrix = Scaling(**scale)
+        def transform():
+            if self.input_time is None:
+                self.input_time = clock()
+            self.transforms.push(matrix)
+            if not self.frame_timer.isActive():
+                self.frame_timer.start(self.transforms.delay())
+        return transform
+
+    def render_frame(self):
+        matrix = self.transforms.take()
+        if matrix is None or self.model is None:
+            return
+        self.model.transform(matrix, render = False)
+        self.request_frame(interactive = True)
+        self.idle_timer.start()
+        self.update_matrix()
+
+    def render_full_detail(self):
+        if self.model is not None:
+            self.request_frame()
+
+    def request_frame(self, interactive = False):
+        """Have the worker project the models as they are transformed
+        now; the result is shown by frame_ready.
+        """
+        if not self.models:
+            return
+        self.frame_id += 1
+        self.frame_started[self.frame_id] = (self.input_time
+                                             if self.input_time is not None
+                                             else clock())
+        self.input_time = None
+        self.renderer.submit(self.frame_id, tuple(self.models),
+                             frames(self.models, interactive))
+
+    def frame_ready(self, frame_id, models, geometries):
+        """Show a frame computed by the worker, unless it is out of
+        date: newer frames have already been shown or the models it
+        belongs to have changed in the meantime.
+        """
+        started = self.frame_started.pop(frame_id, None)
+        if models != tuple(self.models) or frame_id <= self.shown_frame:
+            return
+        # The frames asked for before this one will never be shown.
+        for older in [i for i in self.frame_started if i < frame_id]:
+            del self.frame_started[older]
+        self.shown_frame = frame_id
+        for model, geometry in zip(models, geometries):
+            model.present(geometry)
+        if started is not None:
+            profiler.record('frame', started, clock() - started)
+        # The model may have moved under the cursor.
+        if self.inspecting():
+            self.pick_timer.start()
+
+    def stats_toggled(self, checked):
+        profiler.enabled = checked or self.profiling
+        self.statsLabel.setVisible(checked)
+        if checked:
+            self.update_stats()
+            self.stats_timer.start()
+        else:
+            self.stats_timer.stop()
+
+    def update_stats(self):
+        """Show the rolling statistics of the stages of a frame; the
+        frame itself is timed from the input to swapping it in.
+        """
+        lines = ['ms: p50 / p95 / max']
+        for stage in ('frame', 'compose', 'normals', 'project', 'sort',
+                      'scene', 'swap', 'paint'):
+            statistics = profiler.statistics(stage)
+            if statistics is not None:
+                lines.append('%s: %.1f / %.1f / %.1f' % (
+                    stage, 1000 * statistics['p50'],
+                    1000 * statistics['p95'], 1000 * statistics['max']))
+        self.statsLabel.setText(EOL.join(lines))
+
+    def stop_renderer(self):
+        self.renderer.stop()
+        self.renderer.wait()
+
+    def inspecting(self):
+        return (self.pickFacesAction.isChecked() or
+                self.pickVerticesAction.isChecked())
+
+    def inspect_toggled(self, checked):
+        self.pickLabel.setVisible(self.inspecting())
+        if self.inspecting():
+            self.build_picker()
+        self.update_pick()
+
+    def build_picker(self):
+        """Start building the picker of the model in the background,
+        unless it exists or is being built already.
+        """
+        if (self.model is None or self.model.picker is not None or
+                self.picker_builder is not None):
+            return
+        self.picker_builder = PickerBuilder(self.model.mesh, self)
+        self.picker_builder.built.connect(self.picker_built)
+        self.picker_builder.failed.connect(self.picker_failed)
+        self.picker_builder.finished.connect(
+            self.picker_builder.deleteLater)
+        self.picker_builder.start()
+
+    def picker_built(self, mesh, picker):
+        if self.sender() is not self.picker_builder:
+            return
+        self.picker_builder = None
+        for model in self.models:
+            if model.mesh is mesh:
+                model.picker = picker
+        # The active model may have changed to another mesh meanwhile.
+        if self.inspecting():
+            self.build_picker()
+        self.update_pick()
+
+    def picker_failed(self, message):
+        if self.sender() is not self.picker_builder:
+            return
+        self.picker_builder = None
+        self.show_error(message)
+
+    def eventFilter(self, watched, event):
+        """Follow the cursor over the view while inspecting the model."""
+        if watched is self.view.viewport():
+            if event.type() == QtCore.QEvent.MouseMove:
+                self.cursor = self.view.mapToScene(event.pos())
+                if self.inspecting() and not self.pick_timer.isActive():
+                    self.pick_timer.start()
+            elif event.type() == QtCore.QEvent.Leave:
+                self.cursor = None
+                self.update_pick()
+        return super(Layout, self).eventFilter(watched, event)
+
+    def update_pick(self):
+        """Highlight what's under the cursor and describe it in the
+        info panel.
+        """
+        model = self.model
+        pick = None
+        if (model is not None and self.inspecting() and
+                self.cursor is not None):
+            pick = model.pick(self.cursor.x(), self.cursor.y())
+        face = vertex = None
+        lines = []
+        if model is not None and model.picker is None and self.inspecting():
+            lines.append('Building the index...')
+        if pick is not None and self.pickFacesAction.isChecked():
+            if pick.face is not None:
+                offsets = model.mesh.face_offsets
+                corners = model.mesh.face_indices[offsets[pick.face]:
+                                                  offsets[pick.face + 1]]
+                face = [model.screen_point(v) for v in corners]
+                lines.append('Face %d: %d vertices' % (pick.face,
+                                                       len(corners)))
+        if pick is not None and self.pickVerticesAction.isChecked():
+            if pick.vertex is not None:
+                vertex = model.screen_point(pick.vertex)
+                lines.append('Vertex %d: (%.3f, %.3f, %.3f)' % (
+                    (pick.vertex,) + tuple(model.mesh.coordinates[
+                        3 * pick.vertex:3 * pick.vertex + 3])))
+        self.highlight.set_highlight(face, vertex)
+        self.pickLabel.setText(EOL.join(lines))
+
+    # TODO: consider subclassing QTableWidget later
+    def update_matrix(self):
+        for r, row in enumerate(self.model.current_mod):
+            for c, num in enumerate(row):
+                if int(num) == num:
+                    self.matrixView.setItem(r, c,
+                                            QtGui.QTableWidgetItem(str(int(num))))
+                else:
+                    self.matrixView.setItem(r, c,
+                                            QtGui.QTableWidgetItem('%.3f' % num))
+
+def main():
+    """Build the whole application."""
+    application = QtGui.QApplication(sys.argv)
+    layout = Layout()
+    layout.show()
+    sys.exit(application.exec_())
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from obj_viewer.batch import collect, output_names, render_files
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SQUARE = 'v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nf 1 2 3 4\n'
+
+
+class OutputNamesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def write(self, *names):
+        filename = self.path(*names)
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as target:
+            target.write(SQUARE)
+        return filename
+
+    def test_single_file(self):
+        self.assertEqual(output_names([self.path('models', 'm.obj')], 'out'),
+                         [os.path.join('out', 'm.png')])
+
+    def test_directories_are_mirrored(self):
+        names = output_names([self.path('a', 'm.obj'),
+                              self.path('b', 'm.obj'),
+                              self.path('b', 'c', 'n.obj')], 'out')
+        self.assertEqual(names, [os.path.join('out', 'a', 'm.png'),
+                                 os.path.join('out', 'b', 'm.png'),
+                                 os.path.join('out', 'b', 'c', 'n.png')])
+
+    def test_extensions_kept_when_needed(self):
+        names = output_names([self.path('chair.obj'),
+                              self.path('chair.mesh'),
+                              self.path('table.obj')], 'out')
+        self.assertEqual(names, [os.path.join('out', 'chair.obj.png'),
+                                 os.path.join('out', 'chair.mesh.png'),
+                                 os.path.join('out', 'table.png')])
+
+    def test_collected_files_get_distinct_names(self):
+        self.write('a', 'm.obj')
+        self.write('b', 'm.obj')
+        self.write('b', 'm.mesh')
+        self.write('chair.obj')
+        names = output_names(collect([self.directory]), 'out')
+        self.assertEqual(len(set(names)), 4)
+
+    def test_same_file_twice_fails(self):
+        filename = self.write('m.obj')
+        other = os.path.join(self.directory, '.', 'm.obj')
+        reported = []
+        results = render_files([filename, other], self.path('out'),
+                               workers = 1, use_cache = False,
+                               report = reported.append)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(reported, results)
+        duplicate = [result for result in results
+                     if result['file'] == other][0]
+        self.assertIn(filename, duplicate['error'])
+        self.assertEqual(duplicate['output'], self.path('out', 'm.png'))
+
+    @unittest.skipIf(numpy is None, 'the rasterizer needs NumPy')
+    def test_render_mirrored(self):
+        files = [self.write('a', 'm.obj'), self.write('b', 'm.obj')]
+        output = self.path('out')
+        results = render_files(files, output, width = 16, height = 16,
+                               workers = 1, use_cache = False)
+        self.assertFalse([result for result in results
+                          if 'error' in result])
+        for name in ('a', 'b'):
+            self.assertTrue(os.path.isfile(os.path.join(output, name,
+                                                         'm.png')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from obj_viewer.binary import HEADER, read_mesh, write_mesh
+from obj_viewer.errors import WrongFileFormatError
+from obj_viewer.matrices import Rotation, Scaling, Translation
+from obj_viewer.mesh import Mesh
+
+
+def sample_mesh():
+    coordinates = array('d', [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0,
+                              0.5, 0.5, 1])
+    faces = [(0, 1, 2, 3), (0, 1, 4), (1, 2, 4), (2, 3, 4), (3, 0, 4)]
+    return Mesh(coordinates, faces, texcoords = array('d', [0, 0, 1, 1]),
+                normals = array('d', [0, 0, 1, 0, 0.6, 0.8]))
+
+
+class BinaryMeshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'model.mesh')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        mesh = sample_mesh()
+        write_mesh(self.filename, mesh)
+        loaded = read_mesh(self.filename)
+        for name in ('coordinates', 'texcoords', 'normals', 'face_offsets',
+                     'face_indices', 'edges'):
+            self.assertEqual(list(getattr(loaded, name)),
+                             list(getattr(mesh, name)), name)
+        # Every section is padded to 8 bytes.
+        self.assertEqual(os.path.getsize(self.filename) % 8, 0)
+
+    def test_empty_mesh(self):
+        write_mesh(self.filename, Mesh(array('d'), []))
+        loaded = read_mesh(self.filename)
+        self.assertEqual(loaded.vertex_count, 0)
+        self.assertEqual(loaded.face_count, 0)
+
+    def test_transformed(self):
+        mesh = sample_mesh()
+        matrix = (Rotation('y', degrees = 30) * Scaling(2) *
+                  Translation('z', 0.5))
+        # Tiny chunks, so that the vertices are written in several.
+        write_mesh(self.filename, mesh, matrix, chunk = 2)
+        loaded = read_mesh(self.filename)
+        for i in range(mesh.vertex_count):
+            expected = matrix.transform_point(
+                *mesh.coordinates[3 * i:3 * i + 3])
+            for a, b in zip(loaded.coordinates[3 * i:3 * i + 3], expected):
+                self.assertAlmostEqual(a, b)
+        self.assertEqual(list(loaded.face_indices), list(mesh.face_indices))
+        for i in range(0, len(mesh.normals), 3):
+            length = sum(c * c for c in loaded.normals[i:i + 3])
+            self.assertAlmostEqual(length, 1.0)
+
+    def test_invalid_files(self):
+        write_mesh(self.filename, sample_mesh())
+        with open(self.filename, 'rb') as source:
+            data = source.read()
+        broken = os.path.join(self.directory, 'broken.mesh')
+        for contents in (b'', data[:HEADER.size - 1], b'X' + data[1:],
+                         data[:HEADER.size + 20], data[:-8]):
+            with open(broken, 'wb') as target:
+                target.write(contents)
+            self.assertRaises(WrongFileFormatError, read_mesh, broken)
+
+    def test_out_of_range_indices(self):
+        mesh = sample_mesh()
+        mesh.face_indices[2] = mesh.vertex_count
+        write_mesh(self.filename, mesh)
+        self.assertRaises(WrongFileFormatError, read_mesh, self.filename)
+
+    def test_out_of_range_edges(self):
+        mesh = sample_mesh()
+        for value in (mesh.vertex_count, -1):
+            mesh.edges[3] = value
+            write_mesh(self.filename, mesh)
+            self.assertRaises(WrongFileFormatError, read_mesh,
+                              self.filename)
+
+    def test_decreasing_offsets(self):
+        mesh = sample_mesh()
+        # Still starting at 0 and ending at the number of indices.
+        mesh.face_offsets[1], mesh.face_offsets[2] = (
+            mesh.face_offsets[2], mesh.face_offsets[1])
+        write_mesh(self.filename, mesh)
+        self.assertRaises(WrongFileFormatError, read_mesh, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
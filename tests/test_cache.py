@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from obj_viewer import cache
+from obj_viewer.cache import MeshCache
+from obj_viewer.mesh import Mesh
+
+
+def sample_mesh():
+    return Mesh(array('d', [0, 0, 0, 1, 0, 0, 0, 1, 0]), [(0, 1, 2)])
+
+
+class MeshCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'model.obj')
+        with open(self.source, 'w') as target:
+            target.write('v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n')
+        self.cache = MeshCache(os.path.join(self.directory, 'cache'),
+                               min_file_size = 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.load(self.source))
+        self.cache.store(self.source, sample_mesh())
+        mesh = self.cache.load(self.source)
+        self.assertEqual(list(mesh.face_indices), [0, 1, 2])
+        self.assertIsNone(self.cache.load(self.source, 'other'))
+
+    def test_failed_store_leaves_nothing(self):
+        def write_mesh(filename, mesh):
+            with open(filename, 'wb') as target:
+                target.write(b'partial')
+            raise IOError('disk full')
+
+        original = cache.write_mesh
+        cache.write_mesh = write_mesh
+        try:
+            self.cache.store(self.source, sample_mesh())
+        finally:
+            cache.write_mesh = original
+        self.assertEqual(os.listdir(self.cache.directory), [])
+        self.assertIsNone(self.cache.load(self.source))
+
+
+if __name__ == '__main__':
+    unittest.main()
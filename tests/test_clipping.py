@@ -0,0 +1,140 @@
+import random
+import unittest
+from array import array
+
+from obj_viewer import pipeline
+from obj_viewer.matrices import OrthogonalProjection, Rotation
+from obj_viewer.mesh import Mesh
+from obj_viewer.pipeline import front_faces, project_vertices, wireframe
+
+VIEWPORT = (10, 20, 300, 200)
+
+
+def clip(lines, viewport):
+    if pipeline.numpy is None:
+        return pipeline._clip(lines, viewport)
+    segments = pipeline.numpy.array(lines, dtype = float).reshape(-1, 4)
+    return pipeline._clip_numpy(segments, viewport).ravel().tolist()
+
+
+def two_squares():
+    """A square facing the viewer next to one facing away."""
+    coordinates = array('d', [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0,
+                              2, 0, 0, 3, 0, 0, 3, 1, 0, 2, 1, 0])
+    return Mesh(coordinates, [(0, 1, 2, 3), (4, 7, 6, 5)])
+
+
+class ClipTest(unittest.TestCase):
+
+    def assertInside(self, lines, viewport):
+        left, top, width, height = viewport
+        for i in range(0, len(lines), 4):
+            x0, y0, x1, y1 = lines[i:i + 4]
+            for x, y in ((x0, y0), (x1, y1)):
+                self.assertTrue(left - 1e-9 <= x <= left + width + 1e-9)
+                self.assertTrue(top - 1e-9 <= y <= top + height + 1e-9)
+
+    def test_inside_kept(self):
+        lines = [20, 30, 100, 150, 10, 20, 310, 220]
+        self.assertEqual(clip(lines, VIEWPORT), lines)
+
+    def test_outside_dropped(self):
+        lines = [0, 0, 5, 300, 400, 30, 500, 40, -10, 300, 400, 250,
+                 # Crossing the corner region without entering.
+                 0, 30, 5, 10]
+        self.assertEqual(clip(lines, VIEWPORT), [])
+
+    def test_crossing_clipped(self):
+        clipped = clip([0, 120, 320, 120, 160, 0, 160, 240], VIEWPORT)
+        self.assertEqual(clipped, [10, 120, 310, 120, 160, 20, 160, 220])
+
+    def test_random_segments(self):
+        generator = random.Random(1)
+        for _ in range(500):
+            segment = [generator.uniform(-200, 500) for _ in range(4)]
+            clipped = clip(segment, VIEWPORT)
+            self.assertInside(clipped, VIEWPORT)
+            if not clipped:
+                continue
+            # The clipped segment lies on the original one, in the same
+            # direction.
+            x0, y0, x1, y1 = segment
+            dx, dy = x1 - x0, y1 - y0
+            length = dx * dx + dy * dy
+            previous = -1e-9
+            for x, y in (clipped[0:2], clipped[2:4]):
+                t = ((x - x0) * dx + (y - y0) * dy) / length
+                self.assertTrue(previous <= t <= 1 + 1e-9)
+                self.assertAlmostEqual((x - x0) * dy - (y - y0) * dx, 0,
+                                       places = 6)
+                previous = t - 1e-9
+            # Its midpoint is inside, and so is every point of it.
+            middle = [(a + b) / 2 for a, b in zip(segment[0:2],
+                                                 segment[2:4])]
+            if (VIEWPORT[0] < middle[0] < VIEWPORT[0] + VIEWPORT[2] and
+                    VIEWPORT[1] < middle[1] < VIEWPORT[1] + VIEWPORT[3]):
+                self.assertTrue(clipped)
+
+    def test_wireframe_clipped(self):
+        mesh = two_squares()
+        matrix = OrthogonalProjection(60, 40, 50)
+        self.assertInside(wireframe(mesh, matrix, False, VIEWPORT),
+                          VIEWPORT)
+
+
+class CullingTest(unittest.TestCase):
+
+    def test_front_faces(self):
+        mesh = two_squares()
+        matrix = OrthogonalProjection()
+        projected = project_vertices(mesh.coordinates, matrix)
+        self.assertEqual(list(front_faces(mesh, projected)), [True, False])
+        turned = Rotation('y', degrees = 180) * matrix
+        projected = project_vertices(mesh.coordinates, turned)
+        self.assertEqual(list(front_faces(mesh, projected)), [False, True])
+
+    def test_wireframe_culled(self):
+        mesh = two_squares()
+        matrix = OrthogonalProjection()
+        lines = wireframe(mesh, matrix, True)
+        self.assertEqual(len(lines), 4 * 4)
+        xs = lines[0::2]
+        # Only the edges of the first square, which lies at x <= 1.
+        self.assertTrue(max(xs) <= matrix.transform_point(1, 0, 0)[0])
+        self.assertEqual(len(wireframe(mesh, matrix, False)), 8 * 4)
+
+    def test_shared_edges_kept(self):
+        # A folded pair of faces: the edge they share is drawn as long
+        # as either faces the viewer.
+        coordinates = array('d', [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0])
+        mesh = Mesh(coordinates, [(0, 1, 2), (0, 3, 2)])
+        lines = wireframe(mesh, OrthogonalProjection(), True)
+        self.assertEqual(len(lines), 3 * 4)
+
+
+@unittest.skipIf(pipeline.numpy is None, 'NumPy is not available')
+class PurePythonClipTest(ClipTest):
+    """The same tests without NumPy."""
+
+    def setUp(self):
+        self.numpy = pipeline.numpy
+        pipeline.numpy = None
+
+    def tearDown(self):
+        pipeline.numpy = self.numpy
+
+
+@unittest.skipIf(pipeline.numpy is None, 'NumPy is not available')
+class PurePythonCullingTest(CullingTest):
+    """The same tests without NumPy."""
+
+    def setUp(self):
+        self.numpy = pipeline.numpy
+        pipeline.numpy = None
+
+    def tearDown(self):
+        pipeline.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from obj_viewer.binary import read_mesh
+from obj_viewer.export import export_mesh
+from obj_viewer.matrices import Identity, Rotation, Scaling, Translation
+from obj_viewer.mesh import Mesh
+from obj_viewer.parser import parse_obj
+
+
+def sample_mesh():
+    coordinates = array('d', [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0,
+                              0.5, 0.5, 1.25, -0.125, 1e-3, 123456.75])
+    faces = [(0, 1, 2, 3), (0, 1, 4), (1, 2, 4), (2, 3, 4), (3, 0, 4),
+             (5, 0, 3), (5, 4, 1, 0, 2)]
+    return Mesh(coordinates, faces,
+                texcoords = array('d', [0, 0, 1, 0.5, 0.25, 1]),
+                normals = array('d', [0, 0, 1, 0, 0.6, 0.8]))
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, name, mesh, transformation, chunk):
+        filename = os.path.join(self.directory, name)
+        export_mesh(filename, mesh, transformation, chunk)
+        if name.endswith('.obj'):
+            return parse_obj(filename, workers = 1)
+        return read_mesh(filename)
+
+    def assertClose(self, first, second):
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            self.assertAlmostEqual(a, b, delta = 1e-12 * max(1, abs(b)))
+
+    def test_round_trip(self):
+        mesh = sample_mesh()
+        for name in ('model.obj', 'model.mesh'):
+            # Small chunks, so that everything is written in several.
+            for chunk in (1, 2, 1000):
+                exported = self.export(name, mesh, Identity(), chunk)
+                self.assertEqual(exported.coordinates, mesh.coordinates)
+                self.assertEqual(exported.texcoords, mesh.texcoords)
+                self.assertEqual(exported.normals, mesh.normals)
+                self.assertEqual(exported.face_offsets, mesh.face_offsets)
+                self.assertEqual(exported.face_indices, mesh.face_indices)
+
+    def test_binary_is_exact(self):
+        mesh = sample_mesh()
+        exported = self.export('model.mesh', mesh, Identity(), 2)
+        self.assertEqual(exported.coordinates, mesh.coordinates)
+        self.assertEqual(exported.edges, mesh.edges)
+
+    def test_text_is_exact(self):
+        generator = random.Random(1)
+        coordinates = array('d', [generator.uniform(-1e3, 1e3) / 3
+                                  for _ in range(300)] + [0.1, 1e-300, -0.0])
+        mesh = Mesh(coordinates, [(v, v + 1, v + 2)
+                                  for v in range(0, 99, 3)])
+        exported = self.export('model.obj', mesh, Identity(), 7)
+        self.assertEqual(exported.coordinates, mesh.coordinates)
+
+    def test_transformed(self):
+        mesh = sample_mesh()
+        matrix = (Rotation('x', degrees = -30) * Scaling(1.5) *
+                  Translation('y', 2))
+        expected = array('d')
+        for i in range(mesh.vertex_count):
+            expected.extend(matrix.transform_point(
+                *mesh.coordinates[3 * i:3 * i + 3]))
+        for name in ('model.obj', 'model.mesh'):
+            exported = self.export(name, mesh, matrix, 4)
+            self.assertClose(exported.coordinates, expected)
+            self.assertEqual(exported.face_indices, mesh.face_indices)
+            # Normals are only rotated, so they stay unit vectors.
+            for i in range(0, len(exported.normals), 3):
+                self.assertAlmostEqual(sum(c * c for c in
+                                           exported.normals[i:i + 3]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import random
+import unittest
+from array import array
+
+from obj_viewer import pipeline
+from obj_viewer.matrices import Identity, OrthogonalProjection, Rotation
+from obj_viewer.mesh import Mesh
+from obj_viewer.model import Model
+from obj_viewer.pipeline import filled
+
+
+def random_mesh(generator, count):
+    coordinates = array('d', [generator.uniform(-1, 1)
+                              for _ in range(9 * count)])
+    faces = [(3 * f, 3 * f + 1, 3 * f + 2) for f in range(count)]
+    return Mesh(coordinates, faces)
+
+
+def depths(mesh, matrix):
+    """The mean z of the corners of every face after the matrix."""
+    result = []
+    for face in mesh.faces:
+        result.append(sum(matrix.transform_point(
+            *mesh.coordinates[3 * v:3 * v + 3])[2] for v in face) /
+            len(face))
+    return result
+
+
+class FilledTest(unittest.TestCase):
+
+    def test_back_to_front(self):
+        generator = random.Random(1)
+        mesh = random_mesh(generator, 50)
+        view = OrthogonalProjection()
+        transformation = Rotation('x', degrees = 30)
+        _, sizes, shades, order = filled(mesh, transformation, view)
+        self.assertEqual(list(sizes), [3] * 50)
+        self.assertEqual(len(shades), 50)
+        found = depths(mesh, transformation * view)
+        self.assertEqual(sorted(order), list(range(50)))
+        self.assertEqual([found[f] for f in order], sorted(found))
+
+    def test_previous_order_reused(self):
+        generator = random.Random(2)
+        mesh = random_mesh(generator, 200)
+        view = OrthogonalProjection()
+        transformation = Identity()
+        order = filled(mesh, transformation, view)[-1]
+        for _ in range(10):
+            transformation = transformation * Rotation('y', degrees = 7)
+            resorted = filled(mesh, transformation, view, False, order)
+            fresh = filled(mesh, transformation, view)
+            self.assertEqual(list(resorted[-1]), list(fresh[-1]))
+            self.assertEqual(resorted[0], fresh[0])
+            order = resorted[-1]
+
+    def test_order_of_another_mesh_ignored(self):
+        generator = random.Random(3)
+        mesh = random_mesh(generator, 20)
+        view = OrthogonalProjection()
+        stale = list(range(7))
+        order = filled(mesh, Identity(), view, False, stale)[-1]
+        self.assertEqual(sorted(order), list(range(20)))
+
+    def test_culling(self):
+        coordinates = array('d', [0, 0, 0, 1, 0, 0, 0, 1, 0,
+                                  0, 0, 1, 0, 1, 1, 1, 0, 1])
+        mesh = Mesh(coordinates, [(0, 1, 2), (3, 4, 5)])
+        view = OrthogonalProjection()
+        coordinates, sizes, _, order = filled(mesh, Identity(), view, True)
+        # Only the first triangle faces the viewer; both are sorted.
+        self.assertEqual(list(sizes), [3])
+        self.assertEqual(sorted(order), [0, 1])
+        self.assertEqual(coordinates[:2],
+                         list(view.transform_point(0, 0, 0)[:2]))
+
+    def test_model_keeps_the_order(self):
+        generator = random.Random(4)
+        mesh = random_mesh(generator, 30)
+        model = Model(None, mesh = mesh, levels = [])
+        model.filled = True
+        kind, _ = model.frame()()
+        self.assertEqual(kind, 'faces')
+        first = model.face_orders[mesh]
+        model.transform(Rotation('x', degrees = 5), render = False)
+        model.frame()()
+        self.assertEqual(sorted(model.face_orders[mesh]), sorted(first))
+
+
+@unittest.skipIf(pipeline.numpy is None, 'NumPy is not available')
+class PurePythonFilledTest(FilledTest):
+    """The same tests without NumPy."""
+
+    def setUp(self):
+        self.numpy = pipeline.numpy
+        pipeline.numpy = None
+
+    def tearDown(self):
+        pipeline.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
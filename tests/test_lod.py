@@ -0,0 +1,94 @@
+import math
+import unittest
+from array import array
+
+from obj_viewer import lod
+from obj_viewer.lod import build_levels, cluster
+from obj_viewer.mesh import Mesh
+from obj_viewer.model import Model
+
+
+def rippled_grid(side):
+    coordinates = array('d')
+    for row in range(side + 1):
+        for column in range(side + 1):
+            x = float(column) / side
+            z = float(row) / side
+            coordinates.extend((x, 0.1 * math.sin(7 * x) * math.cos(5 * z),
+                                z))
+    faces = []
+    for row in range(side):
+        for column in range(side):
+            first = row * (side + 1) + column
+            faces.append((first, first + 1, first + side + 2,
+                          first + side + 1))
+    return Mesh(coordinates, faces)
+
+
+def triangle_set(coordinates, triangles):
+    """The triangles as sets of rounded corners, whatever the numbering
+    of the vertices.
+    """
+    corners = [tuple(round(c, 9) for c in coordinates[3 * v:3 * v + 3])
+               for v in triangles]
+    return sorted(tuple(sorted(corners[t:t + 3]))
+                  for t in range(0, len(corners), 3))
+
+
+class LevelsTest(unittest.TestCase):
+
+    def test_levels_fit_their_budgets(self):
+        mesh = rippled_grid(40)
+        budget = 200
+        levels = build_levels(mesh, budget)
+        self.assertTrue(levels)
+        counts = [len(level.triangles) // 3 for level in levels]
+        self.assertTrue(counts[0] <= budget)
+        # Coarsest first, each finer than the one before and all of
+        # them coarser than the mesh.
+        self.assertEqual(counts, sorted(set(counts)))
+        self.assertTrue(counts[-1] < len(mesh.triangles) // 3)
+        for level in levels:
+            self.assertTrue(min(level.face_indices) >= 0)
+            self.assertTrue(max(level.face_indices) < level.vertex_count)
+
+    def test_small_mesh_has_no_levels(self):
+        mesh = rippled_grid(5)
+        self.assertEqual(build_levels(mesh, len(mesh.triangles) // 3), [])
+
+    def test_clusters_lie_within_the_mesh(self):
+        mesh = rippled_grid(20)
+        coordinates, _ = cluster(mesh, 4)
+        for i in range(3):
+            values = mesh.coordinates[i::3]
+            self.assertTrue(min(values) - 1e-12 <= min(coordinates[i::3]))
+            self.assertTrue(max(coordinates[i::3]) <= max(values) + 1e-12)
+
+    def test_detail_for_budget(self):
+        mesh = rippled_grid(40)
+        model = Model(None, mesh = mesh)
+        model.triangle_budget = 200
+        model.levels = build_levels(mesh, 200)
+        self.assertIs(model.detail_for_budget(), model.levels[0])
+        model.triangle_budget = len(mesh.triangles) // 3
+        self.assertIs(model.detail_for_budget(), mesh)
+
+
+@unittest.skipIf(lod.numpy is None, 'NumPy is not available')
+class PurePythonClusterTest(unittest.TestCase):
+
+    def test_same_as_numpy(self):
+        mesh = rippled_grid(30)
+        for resolution in (2, 5, 13):
+            expected = triangle_set(*cluster(mesh, resolution))
+            numpy = lod.numpy
+            lod.numpy = None
+            try:
+                found = triangle_set(*cluster(mesh, resolution))
+            finally:
+                lod.numpy = numpy
+            self.assertEqual(found, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
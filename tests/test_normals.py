@@ -0,0 +1,110 @@
+import unittest
+from array import array
+
+from obj_viewer import model as model_module
+from obj_viewer import pipeline
+from obj_viewer.matrices import Rotation, Scaling, Translation
+from obj_viewer.mesh import Mesh
+from obj_viewer.model import Model
+from obj_viewer.pipeline import transform_normals
+
+
+def pyramid():
+    coordinates = array('d', [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0,
+                              0.5, 0.5, 1])
+    return Mesh(coordinates, [(0, 3, 2, 1), (0, 1, 4), (1, 2, 4),
+                              (2, 3, 4), (3, 0, 4)])
+
+
+def as_list(normals):
+    return [float(value) for value in
+            (normals.ravel() if hasattr(normals, 'ravel') else normals)]
+
+
+class TransformNormalsTest(unittest.TestCase):
+
+    def test_only_the_rotation_counts(self):
+        mesh = pyramid()
+        rotation = Rotation('y', degrees = 40)
+        expected = as_list(transform_normals(mesh.face_normals, rotation))
+        for other in (rotation * Scaling(3) * Translation('x', 2),
+                      Scaling(0.5) * rotation):
+            found = as_list(transform_normals(mesh.face_normals, other))
+            for a, b in zip(found, expected):
+                self.assertAlmostEqual(a, b)
+
+    def test_rotated_normals(self):
+        mesh = pyramid()
+        normals = as_list(transform_normals(mesh.face_normals,
+                                            Rotation('x', degrees = 90)))
+        # The base faced down (-z); a quarter turn around x takes -z to
+        # y in the row-vector convention of the matrices.
+        expected = Rotation('x', degrees = 90).transform_point(0, 0, -1)
+        for a, b in zip(normals[:3], expected):
+            self.assertAlmostEqual(a, b)
+
+
+class NormalCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.original = model_module.transform_normals
+
+        def counting(normals, transformation):
+            self.calls.append(transformation)
+            return self.original(normals, transformation)
+
+        model_module.transform_normals = counting
+        self.mesh = pyramid()
+        self.model = Model(None, mesh = self.mesh, levels = [])
+        self.model.filled = True
+
+    def tearDown(self):
+        model_module.transform_normals = self.original
+
+    def frame(self, transformation = None):
+        if transformation is not None:
+            self.model.transform(transformation, render = False)
+        return self.model.frame()()
+
+    def test_reused_after_translation_and_scaling(self):
+        self.frame()
+        self.assertEqual(len(self.calls), 1)
+        cached = self.model.normal_cache[self.mesh][1]
+        self.frame(Translation('x', 0.5))
+        self.frame(Scaling(2))
+        self.assertEqual(len(self.calls), 1)
+        self.assertIs(self.model.normal_cache[self.mesh][1], cached)
+
+    def test_dropped_after_rotation(self):
+        self.frame()
+        self.frame(Rotation('y', degrees = 30))
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.model.normal_cache[self.mesh][0],
+                         self.model.placement.rotation)
+
+    def test_shades_match_fresh_normals(self):
+        self.frame()
+        self.frame(Translation('y', 1))
+        _, (_, _, shades) = self.frame(Rotation('z', degrees = 25))
+        self.model.normal_cache.clear()
+        _, (_, _, fresh) = self.frame()
+        self.assertEqual(list(shades), list(fresh))
+
+
+@unittest.skipIf(pipeline.numpy is None, 'NumPy is not available')
+class PurePythonNormalCacheTest(NormalCacheTest):
+    """The same tests without NumPy."""
+
+    def setUp(self):
+        self.numpy = pipeline.numpy
+        pipeline.numpy = None
+        super(PurePythonNormalCacheTest, self).setUp()
+
+    def tearDown(self):
+        super(PurePythonNormalCacheTest, self).tearDown()
+        pipeline.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
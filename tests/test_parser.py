@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from obj_viewer import parser
+from obj_viewer.errors import WrongFileFormatError
+from obj_viewer.parser import parse_obj
+
+
+class ParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def parse(self, text, workers = 1):
+        filename = os.path.join(self.directory, 'model.obj')
+        with open(filename, 'w') as target:
+            target.write(text)
+        return parse_obj(filename, workers = workers)
+
+    def assertFaces(self, mesh, faces):
+        self.assertEqual([list(face) for face in mesh.faces], faces)
+
+    def test_round_trip(self):
+        coordinates = [0.0, 0.0, 0.0, 1.5, 0.0, 0.0, 1.5, 2.0, 0.0,
+                       0.0, 2.0, -0.25]
+        faces = [[0, 1, 2], [0, 2, 3], [3, 2, 1, 0]]
+        lines = ['v %r %r %r' % tuple(coordinates[i:i + 3])
+                 for i in range(0, len(coordinates), 3)]
+        lines.extend('f ' + ' '.join(str(v + 1) for v in face)
+                     for face in faces)
+        mesh = self.parse('\n'.join(lines) + '\n')
+        self.assertEqual(list(mesh.coordinates), coordinates)
+        self.assertFaces(mesh, faces)
+        self.assertEqual(list(mesh.face_offsets), [0, 3, 6, 10])
+
+    def test_mixed_face_sizes(self):
+        mesh = self.parse('v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nv 2 2 0\n'
+                          'f 1 2 3\nf 1 2 3 4\nf 2 3\nf 1 2 3 4 5\n'
+                          'f 4 5 1\n')
+        self.assertFaces(mesh, [[0, 1, 2], [0, 1, 2, 3], [1, 2],
+                                [0, 1, 2, 3, 4], [3, 4, 0]])
+
+    def test_corner_forms(self):
+        mesh = self.parse('v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\n'
+                          'vt 0 0\nvt 1 0\nvt 1 1 0\nvn 0 0 1\n'
+                          'f 1/1 2/2 3/3\nf 1/1/1 3/3/1 4/1/1\n'
+                          'f 2//1 3//1 4//1 1//1\n')
+        self.assertFaces(mesh, [[0, 1, 2], [0, 2, 3], [1, 2, 3, 0]])
+        self.assertEqual(list(mesh.texcoords), [0, 0, 1, 0, 1, 1])
+        self.assertEqual(list(mesh.normals), [0, 0, 1])
+
+    def test_relative_indices(self):
+        mesh = self.parse('v 0 0 0\nv 1 0 0\nv 1 1 0\n'
+                          'f 1 2 3\nf -3 -2 -1\nf 3 2 1 \n'
+                          'v 0 1 0\nf -1 1 2 3\n')
+        self.assertFaces(mesh, [[0, 1, 2], [0, 1, 2], [2, 1, 0],
+                                [3, 0, 1, 2]])
+
+    def test_comments_and_other_lines(self):
+        mesh = self.parse('# a square\no square\nv 0 0 0\nv 1 0 0\n'
+                          '  v 1 1 0   \n\tv 0 1 0\ng side\n'
+                          's off\nf 1 2 3 # the first half\n'
+                          'f 1 3 4#the second half\n\n  f 1 2 3 4\n')
+        self.assertEqual(mesh.vertex_count, 4)
+        self.assertFaces(mesh, [[0, 1, 2], [0, 2, 3], [0, 1, 2, 3]])
+
+    def test_invalid_files(self):
+        for text in ('v 0 0\n', 'v 0 0 0\nf 1 x 1\n', 'v 0 0 0\nf \n',
+                     'v 0 0 0\nf 1 1 2\n', 'v 0 0 0\nf 0 1 1\n',
+                     'v 0 0 0\nf -2 1 1\n', 'v 0 0 0\nf 1 f 1\n',
+                     'v 0 0 0\nf 1 1 1\nf 1 2 1 1\n'):
+            self.assertRaises(WrongFileFormatError, self.parse, text)
+
+    def test_parallel_parsing(self):
+        lines = ['v %d %d 0' % (i % 7, i // 7) for i in range(700)]
+        for i in range(1, 600):
+            if i % 3:
+                lines.append('f %d %d %d' % (i, i + 1, i + 7))
+            else:
+                lines.append('f -1 -2 %d %d' % (i, i + 1))
+            if i % 100 == 0:
+                lines.append('v 0 0 %d' % i)
+        text = '\n'.join(lines) + '\n'
+        serial = self.parse(text)
+        threshold = parser.PARALLEL_PARSE_THRESHOLD
+        parser.PARALLEL_PARSE_THRESHOLD = 0
+        try:
+            parallel = self.parse(text, workers = 2)
+        finally:
+            parser.PARALLEL_PARSE_THRESHOLD = threshold
+        self.assertEqual(parallel.coordinates, serial.coordinates)
+        self.assertEqual(parallel.face_offsets, serial.face_offsets)
+        self.assertEqual(parallel.face_indices, serial.face_indices)
+
+
+if __name__ == '__main__':
+    unittest.main()
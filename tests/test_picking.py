@@ -0,0 +1,170 @@
+import math
+import random
+import unittest
+from array import array
+
+from obj_viewer import picking
+from obj_viewer.matrices import Identity, Rotation, Scaling, Translation
+from obj_viewer.mesh import Mesh
+from obj_viewer.picking import BVH, Picker
+
+
+def random_mesh(generator, count):
+    coordinates = array('d', [generator.uniform(-1, 1)
+                              for _ in range(3 * count)])
+    faces = []
+    for _ in range(count):
+        size = generator.choice((3, 3, 4, 5))
+        faces.append(tuple(generator.sample(range(count), size)))
+    return Mesh(coordinates, faces)
+
+
+def random_line(generator):
+    origin = tuple(generator.uniform(-1.5, 1.5) for _ in range(3))
+    direction = tuple(generator.uniform(-1, 1) for _ in range(3))
+    return origin, direction
+
+
+class BVHTest(unittest.TestCase):
+
+    def test_intersect_against_all_triangles(self):
+        generator = random.Random(1)
+        for _ in range(30):
+            mesh = random_mesh(generator, generator.randint(5, 60))
+            bvh = BVH(mesh.coordinates, mesh.triangles, leaf_size = 2)
+            for _ in range(20):
+                origin, direction = random_line(generator)
+                hits = [(bvh._hit(triangle, origin, direction), triangle)
+                        for triangle in range(len(mesh.triangles) // 3)]
+                hits = [(t, triangle) for t, triangle in hits
+                        if t is not None]
+                found = bvh.intersect(origin, direction)
+                if not hits:
+                    self.assertIsNone(found)
+                    continue
+                # Triangles sharing an edge may be hit at the same t, so
+                # only the distance is compared.
+                self.assertIsNotNone(found)
+                self.assertEqual(found[1], min(hits)[0])
+                self.assertIn((found[1], found[0]), hits)
+
+    def test_nearest_vertex_against_all_vertices(self):
+        generator = random.Random(2)
+        for _ in range(30):
+            mesh = random_mesh(generator, generator.randint(5, 60))
+            bvh = BVH(mesh.coordinates, mesh.triangles, leaf_size = 2)
+            used = sorted(set(mesh.triangles))
+            for _ in range(20):
+                origin, direction = random_line(generator)
+                radius = generator.uniform(0, 0.3)
+                distances = [
+                    (picking._distance(mesh.coordinates[3 * v:3 * v + 3],
+                                       origin, direction), v)
+                    for v in used]
+                within = [pair for pair in distances if pair[0] <= radius]
+                found = bvh.nearest_vertex(origin, direction, radius)
+                if not within:
+                    self.assertIsNone(found)
+                else:
+                    self.assertIn(found, [v for distance, v in within
+                                          if distance == min(within)[0]])
+
+    def test_empty_mesh(self):
+        bvh = BVH(array('d'), array('i'))
+        self.assertIsNone(bvh.intersect((0, 0, 0), (0, 0, 1)))
+        self.assertIsNone(bvh.nearest_vertex((0, 0, 0), (0, 0, 1), 1.0))
+
+
+class PickerTest(unittest.TestCase):
+
+    def test_square(self):
+        mesh = Mesh(array('d', [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0]),
+                    [(0, 1, 2, 3)])
+        picker = Picker(mesh)
+        pick = picker.pick(Identity(), 0.8, 0.3)
+        self.assertEqual(pick.face, 0)
+        self.assertEqual(pick.vertex, 1)
+        for a, b in zip(pick.point, (0.8, 0.3, 0)):
+            self.assertAlmostEqual(a, b)
+        # Beside the square, only the corner within the radius counts.
+        pick = picker.pick(Identity(), 1.05, 1.02, radius = 0.1)
+        self.assertIsNone(pick.face)
+        self.assertEqual(pick.vertex, 2)
+        self.assertIsNone(picker.pick(Identity(), 1.5, 1.5, radius = 0.1))
+
+    def test_against_all_faces(self):
+        generator = random.Random(3)
+        for _ in range(20):
+            mesh = random_mesh(generator, generator.randint(5, 40))
+            picker = Picker(mesh)
+            matrix = (Translation('x', generator.uniform(-1, 1)) *
+                      Scaling(generator.uniform(0.5, 3)) *
+                      Rotation('x', degrees = generator.uniform(0, 360)) *
+                      Rotation('y', degrees = generator.uniform(0, 360)))
+            screen = [matrix.transform_point(
+                          *mesh.coordinates[3 * v:3 * v + 3])
+                      for v in range(mesh.vertex_count)]
+            used = set(mesh.face_indices)
+            for _ in range(20):
+                x, y = generator.uniform(-2, 2), generator.uniform(-2, 2)
+                pick = picker.pick(matrix, x, y, radius = 0.2)
+                # The faces under the point, by the depth of the point
+                # on them (nearer to the viewer is larger z).
+                covering = []
+                for triangle in range(len(mesh.triangles) // 3):
+                    corners = [screen[v] for v in
+                               mesh.triangles[3 * triangle:3 * triangle + 3]]
+                    depth = _depth(corners, x, y)
+                    if depth is not None:
+                        covering.append(
+                            (depth, mesh.triangle_faces[triangle]))
+                if covering:
+                    nearest = max(covering)[0]
+                    self.assertIn(pick.face, [face for depth, face
+                                              in covering
+                                              if abs(depth - nearest) <
+                                              1e-9])
+                    continue
+                distances = [(math.hypot(sx - x, sy - y), v)
+                             for v, (sx, sy, _) in enumerate(screen)
+                             if v in used]
+                within = [pair for pair in distances if pair[0] <= 0.2]
+                if not within:
+                    self.assertIsNone(pick)
+                else:
+                    self.assertIsNone(pick.face)
+                    self.assertAlmostEqual(
+                        math.hypot(screen[pick.vertex][0] - x,
+                                   screen[pick.vertex][1] - y),
+                        min(within)[0])
+
+
+def _depth(corners, x, y):
+    """Return the z of the screen point (x, y) on the triangle with the
+    given screen corners, or None if it lies outside of it.
+    """
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = corners
+    area = (bx - ax) * (cy - ay) - (cx - ax) * (by - ay)
+    if area == 0:
+        return None
+    u = ((x - ax) * (cy - ay) - (cx - ax) * (y - ay)) / area
+    v = ((bx - ax) * (y - ay) - (x - ax) * (by - ay)) / area
+    if u < 0 or v < 0 or u + v > 1:
+        return None
+    return az + u * (bz - az) + v * (cz - az)
+
+
+@unittest.skipIf(picking.numpy is None, 'NumPy is not available')
+class PurePythonBVHTest(BVHTest):
+    """The same tests with the tree built without NumPy."""
+
+    def setUp(self):
+        self.numpy = picking.numpy
+        picking.numpy = None
+
+    def tearDown(self):
+        picking.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
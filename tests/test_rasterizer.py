@@ -0,0 +1,86 @@
+import random
+import unittest
+
+from obj_viewer import rasterizer
+
+numpy = rasterizer.numpy
+
+
+def reference(width, height, corners, colors):
+    """Draw the triangles one pixel at a time."""
+    frame = rasterizer.FrameBuffer(width, height)
+    for (p, q, r), color in zip(corners, colors):
+        area = ((q[0] - p[0]) * (r[1] - p[1]) -
+                (r[0] - p[0]) * (q[1] - p[1]))
+        if area == 0:
+            continue
+        for y in range(height):
+            for x in range(width):
+                cx, cy = x + 0.5, y + 0.5
+                weights = []
+                for (ax, ay, _), (bx, by, _) in ((q, r), (r, p), (p, q)):
+                    weights.append(((by - ay) * (cx - ax) -
+                                    (bx - ax) * (cy - ay)) / -area)
+                if min(weights) < 0:
+                    continue
+                depth = sum(w * corner[2]
+                            for w, corner in zip(weights, (p, q, r)))
+                if depth > frame.depth[y, x]:
+                    frame.depth[y, x] = depth
+                    frame.color[y, x] = color
+    return frame
+
+
+@unittest.skipIf(numpy is None, 'the rasterizer needs NumPy')
+class DrawTest(unittest.TestCase):
+
+    def test_against_every_pixel(self):
+        generator = random.Random(1)
+        width, height = 23, 17
+        for _ in range(10):
+            corners = []
+            for _ in range(generator.randint(1, 8)):
+                if generator.random() < 0.5:
+                    # A long, thin triangle across the frame.
+                    x, y = generator.uniform(-5, 5), generator.uniform(-5, 5)
+                    u, v = (generator.uniform(20, 30),
+                            generator.uniform(15, 25))
+                    d = generator.uniform(0.2, 2)
+                    triangle = [(x, y), (u, v), (u + d, v - d)]
+                else:
+                    triangle = [(generator.uniform(-5, 28),
+                                 generator.uniform(-5, 22))
+                                for _ in range(3)]
+                corners.append([(x, y, generator.uniform(-1, 1))
+                                for x, y in triangle])
+            colors = numpy.array([[generator.randrange(256)
+                                   for _ in range(3)]
+                                  for _ in corners], dtype = numpy.uint8)
+            frame = rasterizer.FrameBuffer(width, height)
+            rasterizer._draw(frame, numpy.array(corners), colors)
+            expected = reference(width, height, corners, colors)
+            numpy.testing.assert_array_equal(frame.color, expected.color)
+            numpy.testing.assert_allclose(frame.depth, expected.depth)
+
+    def test_small_batches(self):
+        generator = random.Random(2)
+        corners = numpy.array([[(generator.uniform(0, 40),
+                                 generator.uniform(0, 30),
+                                 generator.uniform(-1, 1))
+                                for _ in range(3)] for _ in range(20)])
+        colors = numpy.arange(60, dtype = numpy.uint8).reshape(20, 3)
+        whole = rasterizer.FrameBuffer(40, 30)
+        rasterizer._draw(whole, corners, colors)
+        batch = rasterizer.RASTER_BATCH_FRAGMENTS
+        rasterizer.RASTER_BATCH_FRAGMENTS = 50
+        try:
+            split = rasterizer.FrameBuffer(40, 30)
+            rasterizer._draw(split, corners, colors)
+        finally:
+            rasterizer.RASTER_BATCH_FRAGMENTS = batch
+        numpy.testing.assert_array_equal(split.color, whole.color)
+        numpy.testing.assert_array_equal(split.depth, whole.depth)
+
+
+if __name__ == '__main__':
+    unittest.main()
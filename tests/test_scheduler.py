@@ -0,0 +1,56 @@
+import unittest
+
+from obj_viewer.matrices import Identity, Rotation, Scaling, Translation
+from obj_viewer.scheduler import TransformQueue
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TransformQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.queue = TransformQueue(max_frame_rate = 20, clock = self.clock)
+
+    def test_burst_composed_into_one(self):
+        steps = [Rotation('x'), Translation('y', 0.5), Scaling(2),
+                 Rotation('z', degrees = 45)]
+        for step in steps:
+            self.queue.push(step)
+        self.assertEqual(len(self.queue), 1)
+        expected = Identity()
+        for step in steps:
+            expected = expected * step
+        for a, b in zip(self.queue.take().cells, expected.cells):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual(len(self.queue), 0)
+        self.assertIsNone(self.queue.take())
+
+    def test_clear(self):
+        self.queue.push(Rotation('x'))
+        self.queue.clear()
+        self.assertEqual(len(self.queue), 0)
+        self.assertIsNone(self.queue.take())
+
+    def test_frame_rate_limited(self):
+        # Nothing has been drawn yet.
+        self.assertEqual(self.queue.delay(), 0)
+        self.queue.push(Rotation('x'))
+        self.queue.take()
+        # In whole milliseconds, give or take rounding.
+        self.assertAlmostEqual(self.queue.delay(), 50, delta = 1)
+        self.clock.now += 0.02
+        self.assertAlmostEqual(self.queue.delay(), 30, delta = 1)
+        self.clock.now += 0.1
+        self.assertEqual(self.queue.delay(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import math
+import random
+import unittest
+
+from obj_viewer.constants import TRS_RENORMALIZE_INTERVAL
+from obj_viewer.errors import IncompatibleTransformationError
+from obj_viewer.matrices import (AffineMatrix, Identity, Rotation, Scaling,
+                                 Translation)
+from obj_viewer.transform import TRS
+
+
+def random_steps(generator, count):
+    steps = []
+    for _ in range(count):
+        kind = generator.randrange(3)
+        if kind == 0:
+            steps.append(Rotation(generator.choice('xyz'),
+                                  degrees = generator.uniform(-180, 180)))
+        elif kind == 1:
+            steps.append(Translation(generator.choice('xyz'),
+                                     generator.uniform(-2, 2)))
+        else:
+            steps.append(Scaling(generator.uniform(0.5, 2)))
+    return steps
+
+
+class TRSTest(unittest.TestCase):
+
+    def assertMatrixEqual(self, first, second, places = 9):
+        for a, b in zip(first.cells, second.cells):
+            self.assertAlmostEqual(a, b, places)
+
+    def test_identity(self):
+        self.assertMatrixEqual(TRS().matrix(), Identity())
+
+    def test_composition_equals_matrix_product(self):
+        generator = random.Random(1)
+        for _ in range(50):
+            steps = random_steps(generator, 6)
+            placement = TRS()
+            product = Identity()
+            for step in steps:
+                placement = placement.then(step)
+                product = product * step
+            self.assertMatrixEqual(placement.matrix(), product)
+
+    def test_composing_two_trs(self):
+        generator = random.Random(2)
+        first = TRS()
+        second = TRS()
+        for step in random_steps(generator, 5):
+            first = first.then(step)
+        for step in random_steps(generator, 5):
+            second = second.then(step)
+        self.assertMatrixEqual(first.then(second).matrix(),
+                               first.matrix() * second.matrix())
+
+    def test_from_matrix_round_trip(self):
+        generator = random.Random(3)
+        for _ in range(50):
+            product = Identity()
+            for step in random_steps(generator, 6):
+                product = product * step
+            self.assertMatrixEqual(TRS.from_matrix(product).matrix(),
+                                   product)
+
+    def test_incompatible_matrices(self):
+        mirror = AffineMatrix((-1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0))
+        shear = AffineMatrix((1, 0.5, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0))
+        stretch = AffineMatrix((2, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0))
+        for matrix in (mirror, shear, stretch, Scaling(-1)):
+            self.assertRaises(IncompatibleTransformationError,
+                              TRS.from_matrix, matrix)
+
+    def test_translations_and_scalings_keep_the_rotation(self):
+        placement = TRS().then(Rotation('y', degrees = 30))
+        for step in (Translation('x', 0.5), Scaling(2), Scaling(0.25)):
+            self.assertEqual(placement.then(step).rotation,
+                             placement.rotation)
+
+    def test_no_drift(self):
+        placement = TRS()
+        step = Rotation('x', degrees = 7) * Rotation('z', degrees = 11)
+        for _ in range(10 * TRS_RENORMALIZE_INTERVAL + 3):
+            placement = placement.then(step)
+        length = math.sqrt(sum(c * c for c in placement.rotation))
+        self.assertAlmostEqual(length, 1.0, 12)
+        # The matrix stays a rotation: its rows are orthonormal.
+        cells = placement.matrix().cells
+        rows = [cells[0:3], cells[3:6], cells[6:9]]
+        for i in range(3):
+            for j in range(3):
+                self.assertAlmostEqual(sum(a * b for a, b in
+                                           zip(rows[i], rows[j])),
+                                       1.0 if i == j else 0.0, 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
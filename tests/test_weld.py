@@ -0,0 +1,117 @@
+import random
+import unittest
+from array import array
+
+from obj_viewer import weld
+from obj_viewer.mesh import Mesh
+from obj_viewer.weld import weld_vertices
+
+TOLERANCE = 1e-6
+
+
+def welded(coordinates, faces, tolerance = TOLERANCE):
+    mesh = weld_vertices(Mesh(array('d', coordinates), faces), tolerance)
+    return list(mesh.coordinates), [list(face) for face in mesh.faces]
+
+
+def groups(coordinates, used, tolerance):
+    """The first vertex of the group of every used vertex, found by
+    comparing all the pairs.
+    """
+    first = dict((v, v) for v in used)
+    for a in used:
+        for b in used:
+            distance = sum((coordinates[3 * a + i] -
+                            coordinates[3 * b + i]) ** 2 for i in range(3))
+            if a < b and distance <= tolerance * tolerance:
+                low, high = sorted((first[a], first[b]))
+                for v in first:
+                    if first[v] == high:
+                        first[v] = low
+    return first
+
+
+class WeldTest(unittest.TestCase):
+
+    def test_duplicates_merged(self):
+        coordinates, faces = welded([0, 0, 0, 1, 0, 0, 0, 1, 0,
+                                     1, 0, 0, 0, 1, 0, 1, 1, 0],
+                                    [(0, 1, 2), (3, 5, 4)])
+        self.assertEqual(coordinates, [0, 0, 0, 1, 0, 0, 0, 1, 0, 1, 1, 0])
+        self.assertEqual(faces, [[0, 1, 2], [1, 3, 2]])
+
+    def test_unused_vertices_dropped(self):
+        coordinates, faces = welded([5, 5, 5, 0, 0, 0, 1, 0, 0, 0, 1, 0],
+                                    [(1, 2, 3)])
+        self.assertEqual(coordinates, [0, 0, 0, 1, 0, 0, 0, 1, 0])
+        self.assertEqual(faces, [[0, 1, 2]])
+
+    def test_distant_vertices_kept(self):
+        coordinates, faces = welded([0, 0, 0, 3 * TOLERANCE, 0, 0,
+                                     0, 1, 0], [(0, 1, 2)])
+        self.assertEqual(len(coordinates), 9)
+
+    def test_pair_across_cell_boundaries(self):
+        # Just below and just above a corner of the grid, on different
+        # sides of the cell boundaries along both x and y.
+        for scale in (1.0, 2.0, 0.5):
+            t = TOLERANCE * scale
+            coordinates = [t - 1e-9, 0.5 * t - 1e-9, 0,
+                           t + 1e-9, 0.5 * t + 1e-9, 0, 0, 1, 0]
+            for corner in ((0, 0), (1, 0), (0, 1), (1, 1)):
+                shifted = list(coordinates)
+                for axis, step in enumerate(corner):
+                    shifted[axis] += step * TOLERANCE
+                    shifted[axis + 3] += step * TOLERANCE
+                _, faces = welded(shifted, [(0, 1, 2)])
+                self.assertEqual(faces, [[0, 0, 1]])
+
+    def test_chains_merged(self):
+        step = 0.9 * TOLERANCE
+        coordinates = []
+        for i in range(5):
+            coordinates.extend((i * step, 0, 0))
+        coordinates.extend((0, 1, 0))
+        _, faces = welded(coordinates, [(0, 1, 5), (2, 3, 4)])
+        self.assertEqual(faces, [[0, 0, 1], [0, 0, 0]])
+
+    def test_against_all_pairs(self):
+        generator = random.Random(1)
+        for _ in range(50):
+            coordinates = []
+            for _ in range(generator.randint(1, 40)):
+                if coordinates and generator.random() < 0.5:
+                    v = generator.randrange(len(coordinates) // 3)
+                    coordinates.extend(
+                        c + generator.uniform(-1.5, 1.5) * TOLERANCE
+                        for c in coordinates[3 * v:3 * v + 3])
+                else:
+                    coordinates.extend(generator.uniform(-5, 5) * TOLERANCE
+                                       for _ in range(3))
+            count = len(coordinates) // 3
+            faces = [tuple(generator.randrange(count) for _ in range(3))
+                     for _ in range(count)]
+            used = sorted(set(v for face in faces for v in face))
+            first = groups(coordinates, used, TOLERANCE)
+            kept = [v for v in used if first[v] == v]
+            expected = ([c for v in kept
+                         for c in coordinates[3 * v:3 * v + 3]],
+                        [[kept.index(first[v]) for v in face]
+                         for face in faces])
+            self.assertEqual(welded(coordinates, faces), expected)
+
+
+@unittest.skipIf(weld.numpy is None, 'NumPy is not available')
+class PurePythonWeldTest(WeldTest):
+    """The same tests without NumPy."""
+
+    def setUp(self):
+        self.numpy = weld.numpy
+        weld.numpy = None
+
+    def tearDown(self):
+        weld.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()